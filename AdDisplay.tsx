@@ -33,11 +33,33 @@ async function fetchAdvertisements(placementArea: string): Promise<Advertisement
     }
 }
 
-async function trackAdImpression(adId: number): Promise<void> {
-    try {
-        await fetch(`http://localhost:5000/api/advertisements/advertisements/${adId}/track-impression`, { method: 'POST' });
-    } catch (error) {
-        console.error("Error tracking ad impression:", error);
+// Impressions from every AdDisplay on the page are queued and reported in one batched POST
+const pendingImpressions: number[] = [];
+let impressionFlushTimer: ReturnType<typeof setTimeout> | null = null;
+
+function flushAdImpressions(): void {
+    if (impressionFlushTimer !== null) {
+        clearTimeout(impressionFlushTimer);
+        impressionFlushTimer = null;
+    }
+    if (pendingImpressions.length === 0) return;
+    const adIds = pendingImpressions.splice(0, pendingImpressions.length);
+    fetch(`http://localhost:5000/api/advertisements/advertisements/track-impressions`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ad_ids: adIds }),
+        keepalive: true, // Lets the request outlive the page when flushed on pagehide
+    }).catch(error => console.error("Error tracking ad impressions:", error));
+}
+
+if (typeof window !== 'undefined') {
+    window.addEventListener('pagehide', flushAdImpressions);
+}
+
+function trackAdImpression(adId: number): void {
+    pendingImpressions.push(adId);
+    if (impressionFlushTimer === null) {
+        impressionFlushTimer = setTimeout(flushAdImpressions, 1000); // Collect all ads rendered on this page view
     }
 }
 
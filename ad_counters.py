@@ -0,0 +1,129 @@
+# Buffered ad impression/click counters, flushed to the database in coalesced batches
+import atexit
+import logging
+import os
+import threading
+
+from sqlalchemy import bindparam, func, update
+
+from src.models.advertisement import Advertisement
+
+logger = logging.getLogger(__name__)
+
+
+class AdCounterBuffer:
+    """Aggregates ad events in memory and writes them as atomic increments.
+
+    Recording an event is a dict update under a lock. A background thread
+    flushes the coalesced per-ad deltas every `flush_interval` seconds (or
+    sooner once `max_pending` ads are buffered) with a single executemany of
+    `UPDATE advertisements SET impressions = impressions + :n ...`, so
+    concurrent workers never overwrite each other's counts. Pending deltas are
+    flushed again on shutdown.
+    """
+
+    def __init__(self, flush_interval=5.0, max_pending=5000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._app = None
+        self._db = None
+
+    def init_app(self, app, db):
+        self._app = app
+        self._db = db
+        self.flush_interval = float(app.config.get("AD_COUNTER_FLUSH_INTERVAL", self.flush_interval))
+        self.max_pending = int(app.config.get("AD_COUNTER_MAX_PENDING", self.max_pending))
+        atexit.register(self.close)
+
+    def record(self, ad_id, impressions=0, clicks=0):
+        with self._lock:
+            counts = self._pending.get(ad_id)
+            if counts is None:
+                self._pending[ad_id] = [impressions, clicks]
+            else:
+                counts[0] += impressions
+                counts[1] += clicks
+            pending = len(self._pending)
+        self._ensure_worker()
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def record_impression(self, ad_id, count=1):
+        self.record(ad_id, impressions=count)
+
+    def record_click(self, ad_id, count=1):
+        self.record(ad_id, clicks=count)
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so each worker process starts its own flusher
+        if self._app is None or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="ad-counter-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write all buffered deltas; returns the number of ads updated"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self._app is None:
+            return 0
+
+        table = Advertisement.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("ad_id"))
+            .values(
+                impressions=func.coalesce(table.c.impressions, 0) + bindparam("impression_delta"),
+                clicks=func.coalesce(table.c.clicks, 0) + bindparam("click_delta")
+            )
+        )
+        rows = [
+            {"ad_id": ad_id, "impression_delta": counts[0], "click_delta": counts[1]}
+            for ad_id, counts in pending.items()
+        ]
+        with self._app.app_context():
+            try:
+                self._db.session.execute(statement, rows)
+                self._db.session.commit()
+            except Exception:
+                self._db.session.rollback()
+                logger.exception("Failed to flush ad counters for %d ads; will retry", len(rows))
+                self._requeue(pending)
+                return 0
+            finally:
+                self._db.session.remove()
+        return len(rows)
+
+    def _requeue(self, pending):
+        with self._lock:
+            for ad_id, (impressions, clicks) in pending.items():
+                counts = self._pending.setdefault(ad_id, [0, 0])
+                counts[0] += impressions
+                counts[1] += clicks
+
+    def close(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+
+ad_counter_buffer = AdCounterBuffer()
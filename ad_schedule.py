@@ -0,0 +1,89 @@
+# In-memory index of currently live advertisements per placement area
+import threading
+import time
+from datetime import datetime
+
+from src.models.advertisement import Advertisement
+
+
+class AdScheduleIndex:
+    """Serves live ads per placement area without touching the database.
+
+    The index holds the serialized ads whose [start_date, end_date] window
+    contains "now", grouped by placement_area in date_created DESC order, and
+    remembers the next moment that set changes: the earliest upcoming
+    start_date or the earliest end_date of a live ad. It is rebuilt only when
+    that boundary is crossed, when an ad is written in this process
+    (invalidate()), or after `max_age` seconds to pick up writes made by other
+    workers.
+    """
+
+    def __init__(self, max_age=60):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._by_area = {}
+        self._all = []
+        self._target_urls = {}
+        self._next_start = None
+        self._next_end = None
+        self._built_at = None
+
+    def invalidate(self):
+        self._built_at = None
+
+    def _is_stale(self, now):
+        if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+            return True
+        if self._next_start is not None and now >= self._next_start:
+            return True
+        return self._next_end is not None and now > self._next_end
+
+    def rebuild(self, session, now=None):
+        now = now or datetime.utcnow()
+        ads = (session.query(Advertisement)
+               .filter(Advertisement.is_active == True, Advertisement.end_date >= now)
+               .order_by(Advertisement.date_created.desc())
+               .all())
+        by_area = {}
+        live = []
+        target_urls = {}
+        next_start = None
+        next_end = None
+        for ad in ads:
+            if ad.start_date > now:
+                if next_start is None or ad.start_date < next_start:
+                    next_start = ad.start_date
+                continue
+            if next_end is None or ad.end_date < next_end:
+                next_end = ad.end_date
+            ad_dict = ad.to_dict()
+            live.append(ad_dict)
+            by_area.setdefault(ad.placement_area, []).append(ad_dict)
+            target_urls[ad.id] = ad.target_url
+
+        with self._lock:
+            self._by_area = by_area
+            self._all = live
+            self._target_urls = target_urls
+            self._next_start = next_start
+            self._next_end = next_end
+            self._built_at = time.monotonic()
+
+    def live_ads(self, session, placement_area=None, now=None):
+        """Serialized live ads, optionally for one placement area"""
+        now = now or datetime.utcnow()
+        if self._is_stale(now):
+            self.rebuild(session, now)
+        if placement_area:
+            return list(self._by_area.get(placement_area, ()))
+        return list(self._all)
+
+    def target_url(self, ad_id):
+        """Target URL of a live ad, or None if it is not in the index or the index is out of date"""
+        built_at = self._built_at
+        if built_at is None or time.monotonic() - built_at > self.max_age:
+            return None # Invalidated by a write, possibly a delete: callers fall back to the database
+        return self._target_urls.get(ad_id)
+
+
+ad_schedule_index = AdScheduleIndex()
@@ -3,11 +3,14 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required # Assuming admin/staff role for ad management
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.models.advertisement import Advertisement
+from src.services.ad_counters import ad_counter_buffer
+from src.services.ad_schedule import ad_schedule_index
+from src.services.db_routing import read_only # Routes read-only views to replicas
 
 # Placeholder for db.session, will be properly linked from main.py
 class DBPlaceholder:
@@ -25,7 +28,7 @@ def create_advertisement():
     data = request.get_json()
     required_fields = ["title", "advertiser_name", "image_url", "target_url", "placement_area", "start_date", "end_date"]
     if not all(field in data for field in required_fields):
-        return jsonify({"message": f"Missing required fields: {", ".join(required_fields)}"}), 400
+        return jsonify({"message": f"Missing required fields: {', '.join(required_fields)}"}), 400
 
     try:
         start_date = datetime.fromisoformat(data["start_date"])
@@ -49,18 +52,24 @@ def create_advertisement():
     if db_placeholder.session:
         db_placeholder.session.add(new_ad)
         db_placeholder.session.commit()
+        ad_schedule_index.invalidate()
         return jsonify({"message": "Advertisement created successfully", "advertisement": new_ad.to_dict()}), 201
     else:
         print(f"Simulating advertisement creation: {new_ad.to_dict()}")
         return jsonify({"message": "Advertisement creation simulated (DB not fully initialized)", "advertisement": new_ad.to_dict()}), 201
 
 @advertisement_bp.route("/advertisements", methods=["GET"])
+@read_only
 def get_advertisements():
     placement_area = request.args.get("placement_area")
     active_only = request.args.get("active_only", "true").lower() == "true"
     now = datetime.utcnow()
 
-    if db_placeholder.session:
+    if db_placeholder.session and active_only:
+        # Hot path for AdDisplay: served from the in-memory schedule, no DB round trip
+        results = ad_schedule_index.live_ads(db_placeholder.session, placement_area, now)
+        return jsonify({"message": "Advertisements retrieved successfully", "advertisements": results}), 200
+    elif db_placeholder.session:
         query = Advertisement.query
         if placement_area:
             query = query.filter_by(placement_area=placement_area)
@@ -83,6 +92,7 @@ def get_advertisements():
         return jsonify({"message": "Advertisements retrieval simulated (DB not fully initialized)", "advertisements": simulated_ads}), 200
 
 @advertisement_bp.route("/advertisements/<int:ad_id>", methods=["GET"])
+@read_only
 def get_advertisement_detail(ad_id):
     if db_placeholder.session:
         ad = Advertisement.query.get(ad_id)
@@ -121,6 +131,7 @@ def update_advertisement(ad_id):
             return jsonify({"message": "Start date must be before end date"}), 400
 
         db_placeholder.session.commit()
+        ad_schedule_index.invalidate()
         return jsonify({"message": "Advertisement updated successfully", "advertisement": ad.to_dict()}), 200
     else:
         print(f"Simulating update for ad ID: {ad_id}")
@@ -136,21 +147,37 @@ def delete_advertisement(ad_id):
 
         db_placeholder.session.delete(ad)
         db_placeholder.session.commit()
+        ad_schedule_index.invalidate()
         return jsonify({"message": "Advertisement deleted successfully"}), 200
     else:
         print(f"Simulating delete for ad ID: {ad_id}")
         return jsonify({"message": "Ad deletion simulated (DB not fully initialized)"}), 200
 
+# Impressions and clicks are buffered in-process and flushed as batched
+# atomic increments (see src/services/ad_counters.py) instead of a
+# read-modify-write commit per event.
+MAX_BATCH_IMPRESSIONS = 100
+
+def _unknown_ad_ids(ad_ids):
+    """The ids in ad_ids that name no advertisement; live ads are answered from the schedule index"""
+    unchecked = {ad_id for ad_id in ad_ids if ad_schedule_index.target_url(ad_id) is None}
+    if not unchecked:
+        return []
+    found = {row[0] for row in db_placeholder.session.query(Advertisement.id).filter(Advertisement.id.in_(unchecked))}
+    return sorted(unchecked - found)
+
 @advertisement_bp.route("/advertisements/<int:ad_id>/track-click", methods=["POST"])
 def track_ad_click(ad_id):
     if db_placeholder.session:
-        ad = Advertisement.query.get(ad_id)
-        if not ad:
-            return jsonify({"message": "Advertisement not found"}), 404
-        ad.clicks = (ad.clicks or 0) + 1
-        db_placeholder.session.commit()
+        target_url = ad_schedule_index.target_url(ad_id)
+        if target_url is None:
+            row = db_placeholder.session.query(Advertisement.target_url).filter(Advertisement.id == ad_id).first()
+            if not row:
+                return jsonify({"message": "Advertisement not found"}), 404
+            target_url = row[0]
+        ad_counter_buffer.record_click(ad_id)
         # In a real app, you might redirect to ad.target_url or return a 204 No Content
-        return jsonify({"message": "Click tracked successfully", "target_url": ad.target_url}), 200 
+        return jsonify({"message": "Click tracked successfully", "target_url": target_url}), 200 
     else:
         print(f"Simulating click tracking for ad ID: {ad_id}")
         return jsonify({"message": "Click tracking simulated", "target_url": "http://example.com/simulated-target"}), 200
@@ -159,13 +186,36 @@ def track_ad_click(ad_id):
 def track_ad_impression(ad_id):
     # This would typically be called via JS when an ad is displayed
     if db_placeholder.session:
-        ad = Advertisement.query.get(ad_id)
-        if not ad:
+        if _unknown_ad_ids([ad_id]):
             return jsonify({"message": "Advertisement not found"}), 404
-        ad.impressions = (ad.impressions or 0) + 1
-        db_placeholder.session.commit()
-        return jsonify({"message": "Impression tracked successfully"}), 200
+        ad_counter_buffer.record_impression(ad_id)
+        return jsonify({"message": "Impression tracked successfully"}), 202
     else:
         print(f"Simulating impression tracking for ad ID: {ad_id}")
         return jsonify({"message": "Impression tracking simulated"}), 200
 
+@advertisement_bp.route("/advertisements/track-impressions", methods=["POST"])
+def track_ad_impressions_batch():
+    """Record every impression shown on a page in one request: {"ad_ids": [1, 2, 2]}"""
+    data = request.get_json(silent=True) or {}
+    ad_ids = data.get("ad_ids")
+    if not isinstance(ad_ids, list) or not ad_ids:
+        return jsonify({"message": "ad_ids must be a non-empty list"}), 400
+    if len(ad_ids) > MAX_BATCH_IMPRESSIONS:
+        return jsonify({"message": f"At most {MAX_BATCH_IMPRESSIONS} impressions per request"}), 400
+    if not all(isinstance(ad_id, int) and not isinstance(ad_id, bool) for ad_id in ad_ids):
+        return jsonify({"message": "ad_ids must contain integer advertisement IDs"}), 400
+
+    if db_placeholder.session:
+        unknown = _unknown_ad_ids(ad_ids)
+        if unknown:
+            return jsonify({"message": "Advertisement not found", "ad_ids": unknown}), 404
+        counts = {}
+        for ad_id in ad_ids:
+            counts[ad_id] = counts.get(ad_id, 0) + 1
+        for ad_id, count in counts.items():
+            ad_counter_buffer.record_impression(ad_id, count)
+        return jsonify({"message": "Impressions tracked successfully", "tracked": len(ad_ids)}), 202
+    else:
+        print(f"Simulating batch impression tracking for ad IDs: {ad_ids}")
+        return jsonify({"message": "Batch impression tracking simulated", "tracked": len(ad_ids)}), 200
@@ -1,6 +1,5 @@
 # Auth Routes (User Registration and Login)
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
 import jwt # PyJWT for token generation
 import datetime
 import os
@@ -9,6 +8,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.models.user import User
+from src.services.password_hashing import password_hasher, HashingPoolSaturated
 # from main import db, app # db and app will be imported from main.py to avoid circular imports
 
 # Placeholder for db and app.config, will be properly linked from main.py
@@ -23,6 +23,13 @@ app_config_placeholder = AppConfigPlaceholder()
 
 auth_bp = Blueprint("auth_bp", __name__)
 
+@auth_bp.errorhandler(HashingPoolSaturated)
+def hashing_pool_saturated(e):
+    # Shed load instead of queueing behind a burst of logins; clients retry shortly
+    response = jsonify({"message": "Authentication service is busy, please retry shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 @auth_bp.route("/register", methods=["POST"])
 def register_user():
     data = request.get_json()
@@ -34,7 +41,7 @@ def register_user():
     if User.query.filter_by(email=email).first():
         return jsonify({"message": "User already exists with this email"}), 409 # Conflict
 
-    hashed_password = generate_password_hash(data["password"], method=	ext_style_placeholder="pbkdf2:sha256") # Explicitly state hashing method
+    hashed_password = password_hasher.hash(data["password"]) # Method/cost from PASSWORD_HASH_METHOD
     new_user = User(email=email, password_hash=hashed_password, full_name=data.get("full_name"))
     
     # The actual db object will be used here once linked from main.py
@@ -75,9 +82,14 @@ def login_user():
     email = data["email"].lower()
     user = User.query.filter_by(email=email).first()
 
-    if not user or not user.check_password(data["password"]):
+    if not user or not password_hasher.verify(user.password_hash, data["password"]):
         return jsonify({"message": "Invalid email or password"}), 401
 
+    # Upgrade hashes made with an older method or cost while the plaintext is at hand
+    if db_placeholder.session and password_hasher.needs_rehash(user.password_hash):
+        user.password_hash = password_hasher.hash(data["password"])
+        db_placeholder.session.commit()
+
     # Generate token
     token = jwt.encode({
         "user_id": user.id,
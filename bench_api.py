@@ -0,0 +1,252 @@
+# API benchmark driver (run with `python -m src.bench_api --database sqlite:////tmp/bench.db`)
+# Replays a seeded mixed workload (search, detail, ads, impressions, login) through the Flask test client and
+# reports latency percentiles, throughput and SQL statements per request, optionally against a JSON baseline.
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (operation, share of requests)
+WORKLOAD = [
+    ("search", 30),
+    ("search_text", 8),
+    ("facets", 4),
+    ("detail", 25),
+    ("ads", 15),
+    ("impressions", 13),
+    ("login", 5),
+]
+
+SEARCH_TERMS = ["sea views", "pool", "apartment cape town", "farm", "garden", "sandton", "solar", "townhouse durban"]
+
+# A regression is flagged when p95 grows by more than the tolerance and by at least this much
+MIN_REGRESSION_MS = 2.0
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Workload:
+    """Deterministic request generator over the ids present in the seeded database"""
+
+    def __init__(self, seed, listing_ids, ad_ids, emails):
+        self.rng = random.Random(seed)
+        self.listing_ids = listing_ids
+        self.ad_ids = ad_ids
+        self.emails = emails
+        # Detail views follow a Zipf-like popularity: a few listings get most of the traffic
+        self.listing_weights = [1 / (rank + 1) ** 0.9 for rank in range(len(listing_ids))]
+
+    def _search_args(self):
+        from src.services.bench_data import CITIES, PROPERTY_TYPES, TIERS
+
+        rng = self.rng
+        args = {"page": rng.choices([1, 2, 3, 10], weights=[70, 15, 10, 5])[0]}
+        if rng.random() < 0.5:
+            province = rng.choice(list(CITIES))
+            if rng.random() < 0.7:
+                args["city"] = rng.choice(CITIES[province])[0]
+            else:
+                args["province"] = province
+        if rng.random() < 0.4:
+            args["property_type"] = rng.choice(list(PROPERTY_TYPES))
+        if rng.random() < 0.3:
+            low = rng.choice([500000, 1000000, 2000000])
+            args["min_price"] = low
+            args["max_price"] = low * rng.choice([2, 3])
+        if rng.random() < 0.2:
+            args["bedrooms"] = rng.randint(1, 4)
+        if rng.random() < 0.05:
+            args["listing_tier"] = rng.choice([tier for tier, _ in TIERS])
+        if rng.random() < 0.3:
+            args["fields"] = "card"
+        return args
+
+    def next_request(self):
+        """(operation, method, path, query args, json body)"""
+        rng = self.rng
+        operation = rng.choices([name for name, _ in WORKLOAD], weights=[share for _, share in WORKLOAD])[0]
+        if operation == "search":
+            return operation, "GET", "/api/listings/listings", self._search_args(), None
+        if operation == "search_text":
+            return operation, "GET", "/api/listings/listings", {"search": rng.choice(SEARCH_TERMS)}, None
+        if operation == "facets":
+            args = {key: value for key, value in self._search_args().items() if key in ("city", "property_type")}
+            return operation, "GET", "/api/listings/facets", args, None
+        if operation == "detail":
+            listing_id = rng.choices(self.listing_ids, weights=self.listing_weights)[0]
+            return operation, "GET", f"/api/listings/listings/{listing_id}", {}, None
+        if operation == "ads":
+            from src.services.bench_data import PLACEMENT_AREAS
+            return operation, "GET", "/api/advertisements/advertisements", {"placement_area": rng.choice(PLACEMENT_AREAS)[0]}, None
+        if operation == "impressions":
+            return operation, "POST", "/api/advertisements/advertisements/track-impressions", {}, {"ad_ids": rng.sample(self.ad_ids, min(3, len(self.ad_ids)))}
+        from src.services.bench_data import BENCH_PASSWORD
+        return operation, "POST", "/api/auth/login", {}, {"email": rng.choice(self.emails), "password": BENCH_PASSWORD}
+
+
+def load_app(database_url, cache):
+    from src.main import create_app
+    return create_app({
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "RESPONSE_CACHE_ENABLED": cache,
+        "AD_COUNTER_FLUSH_INTERVAL": 1.0,
+    })
+
+
+def run(app, requests, seed, threads, warmup):
+    from sqlalchemy import event
+    from src.models.user import db, User
+    from src.models.listing import Listing
+    from src.models.advertisement import Advertisement
+    from src.services.bench_data import BENCH_EMAIL_DOMAIN
+
+    with app.app_context():
+        listing_ids = [row.id for row in db.session.query(Listing.id).order_by(Listing.id)]
+        ad_ids = [row.id for row in db.session.query(Advertisement.id).order_by(Advertisement.id)]
+        emails = [row.email for row in db.session.query(User.email).filter(User.email.like(f"%@{BENCH_EMAIL_DOMAIN}")).order_by(User.id)]
+        engine = db.engine
+    if not listing_ids or not ad_ids or not emails:
+        raise SystemExit("The database has no benchmark data; run with --seed-data first")
+
+    local = threading.local()
+
+    def count_statement(*_):
+        local.statements = getattr(local, "statements", 0) + 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    samples = []
+    samples_lock = threading.Lock()
+
+    def worker(worker_index, count, record):
+        workload = Workload(seed * 1000 + worker_index, listing_ids, ad_ids, emails)
+        client = app.test_client()
+        results = []
+        for _ in range(count):
+            operation, method, path, args, body = workload.next_request()
+            local.statements = 0
+            started = time.perf_counter()
+            response = client.open(path, method=method, query_string=args, json=body)
+            elapsed = time.perf_counter() - started
+            results.append((operation, elapsed, local.statements, response.status_code))
+        if record:
+            with samples_lock:
+                samples.extend(results)
+
+    try:
+        # Warm-up builds the in-process indexes and fills caches; it is not measured
+        worker(-1, warmup, False)
+        per_thread = [requests // threads + (1 if index < requests % threads else 0) for index in range(threads)]
+        pool = [threading.Thread(target=worker, args=(index, count, True)) for index, count in enumerate(per_thread)]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        wall_time = time.perf_counter() - started
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+    return summarize(samples, wall_time)
+
+
+def summarize(samples, wall_time):
+    report = {"requests": len(samples), "wall_seconds": round(wall_time, 3),
+              "throughput_rps": round(len(samples) / wall_time, 1) if wall_time else 0.0, "operations": {}}
+    by_operation = {}
+    for operation, elapsed, statements, status in samples:
+        by_operation.setdefault(operation, []).append((elapsed, statements, status))
+    for operation, rows in sorted(by_operation.items()):
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in rows)
+        report["operations"][operation] = {
+            "requests": len(rows),
+            "errors": sum(1 for _, _, status in rows if status >= 400),
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "sql_per_request": round(sum(statements for _, statements, _ in rows) / len(rows), 2),
+        }
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """Regressions of the report against a baseline: slower p95 beyond tolerance or more SQL per request"""
+    regressions = []
+    for operation, base in baseline.get("operations", {}).items():
+        current = report["operations"].get(operation)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance) and current["p95_ms"] - base["p95_ms"] >= MIN_REGRESSION_MS:
+            regressions.append(f"{operation}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["sql_per_request"] > base["sql_per_request"] + 0.5:
+            regressions.append(f"{operation}: SQL/request {base['sql_per_request']} -> {current['sql_per_request']}")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{operation}: errors {base['errors']} -> {current['errors']}")
+    return regressions
+
+
+def print_report(report):
+    print(f"{report['requests']} requests in {report['wall_seconds']}s ({report['throughput_rps']} req/s)")
+    print(f"{'operation':<14}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL/req':>9}")
+    for operation, stats in report["operations"].items():
+        print(f"{operation:<14}{stats['requests']:>9}{stats['errors']:>8}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['sql_per_request']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-workload API benchmark")
+    parser.add_argument("--database", default=os.environ.get("DATABASE_URL", "sqlite:////tmp/propertysunday_bench.db"))
+    parser.add_argument("--seed-data", action="store_true", help="Generate synthetic data if the database has none")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--listings", type=int, default=10000)
+    parser.add_argument("--ads", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=42, help="Seed for both the data and the request mix")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache to measure the database path")
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--baseline", help="Compare against a JSON report; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative p95 growth against the baseline")
+    args = parser.parse_args()
+
+    app = load_app(args.database, cache=not args.no_cache)
+    if args.seed_data:
+        from src.models.user import db
+        from src.services.bench_data import generate, is_seeded
+        from src.services.migrations import upgrade
+        with app.app_context():
+            db.create_all()
+            upgrade(db.engine)
+            if not is_seeded(db.session):
+                counts = generate(db.session, seed=args.seed, users=args.users, listings=args.listings, ads=args.ads,
+                                  password_method=app.config["PASSWORD_HASH_METHOD"])
+                print(f"Generated {counts}")
+
+    report = run(app, args.requests, args.seed, args.threads, args.warmup)
+    report["config"] = {"database": app.config["SQLALCHEMY_DATABASE_URI"].split("@")[-1], "seed": args.seed,
+                        "threads": args.threads, "response_cache": not args.no_cache}
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("config") != report["config"]:
+            print(f"WARNING baseline was recorded with a different configuration: {baseline.get('config')}")
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# Seeded synthetic data for benchmarks: users, listings across SA provinces/cities, and ads
+# The same seed and sizes always produce the same rows, so benchmark runs are comparable across commits.
+import math
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from src.models.user import User
+from src.models.listing import Listing
+from src.models.advertisement import Advertisement
+from src.services.password_hashing import DEFAULT_METHOD
+
+# Password of every generated user, so the benchmark driver can log in as any of them
+BENCH_PASSWORD = "benchmark-password"
+BENCH_EMAIL_DOMAIN = "bench.propertysunday.test"
+
+# province -> [(city, latitude, longitude, relative share of listings, median house price in rand)]
+CITIES = {
+    "Gauteng": [
+        ("Johannesburg", -26.2041, 28.0473, 14, 1600000),
+        ("Sandton", -26.1076, 28.0567, 6, 3200000),
+        ("Pretoria", -25.7479, 28.2293, 10, 1500000),
+        ("Centurion", -25.8603, 28.1894, 4, 1900000),
+        ("Soweto", -26.2485, 27.8540, 3, 650000),
+    ],
+    "Western Cape": [
+        ("Cape Town", -33.9249, 18.4241, 16, 2900000),
+        ("Stellenbosch", -33.9321, 18.8602, 3, 3600000),
+        ("George", -33.9608, 22.4617, 2, 1800000),
+        ("Paarl", -33.7342, 18.9621, 2, 1900000),
+    ],
+    "KwaZulu-Natal": [
+        ("Durban", -29.8587, 31.0218, 9, 1500000),
+        ("Umhlanga", -29.7277, 31.0827, 3, 3100000),
+        ("Pietermaritzburg", -29.6006, 30.3794, 3, 1100000),
+        ("Ballito", -29.5390, 31.2144, 2, 2600000),
+    ],
+    "Eastern Cape": [
+        ("Gqeberha", -33.9608, 25.6022, 4, 1200000),
+        ("East London", -33.0292, 27.8546, 2, 1000000),
+    ],
+    "Free State": [("Bloemfontein", -29.0852, 26.1596, 3, 1100000)],
+    "Mpumalanga": [("Mbombela", -25.4753, 30.9694, 2, 1300000)],
+    "Limpopo": [("Polokwane", -23.9045, 29.4689, 2, 1100000)],
+    "North West": [("Rustenburg", -25.6676, 27.2421, 1, 950000)],
+    "Northern Cape": [("Kimberley", -28.7282, 24.7499, 1, 850000)],
+}
+
+# property_type -> (share, price factor, bedroom weights for 0..5 bedrooms)
+PROPERTY_TYPES = {
+    "House": (45, 1.0, [0, 2, 20, 45, 25, 8]),
+    "Apartment": (30, 0.55, [5, 35, 45, 13, 2, 0]),
+    "Townhouse": (15, 0.75, [0, 10, 50, 35, 5, 0]),
+    "Vacant Land": (6, 0.45, [100, 0, 0, 0, 0, 0]),
+    "Farm": (4, 2.2, [0, 0, 10, 35, 35, 20]),
+}
+
+TIERS = [("standard", 85), ("premium", 11), ("featured", 4)]
+STATUSES = [("active", 85), ("sold", 8), ("pending", 4), ("rented", 3)]
+SOURCES = [("manual", 70), ("property24", 20), ("privateproperty", 10)]
+PLACEMENT_AREAS = [
+    ("homepage_banner", 3), ("search_results_inline", 4),
+    ("listing_detail_sidebar_top", 3), ("listing_detail_sidebar_bottom", 2), ("listing_detail_footer_banner", 2),
+]
+FEATURES = ["sea views", "a large garden", "a pool", "solar panels", "a backup inverter", "a double garage",
+            "an open-plan kitchen", "24-hour security", "a braai area", "fibre internet", "a study", "a flatlet"]
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+def _cities():
+    for province, cities in CITIES.items():
+        for city, latitude, longitude, share, median_price in cities:
+            yield (province, city, latitude, longitude, median_price), share
+
+
+def _listing_row(rng, user_id, city_choices, now):
+    province, city, latitude, longitude, median_price = _weighted(rng, city_choices)
+    property_type = _weighted(rng, [(name, spec[0]) for name, spec in PROPERTY_TYPES.items()])
+    _, price_factor, bedroom_weights = PROPERTY_TYPES[property_type]
+    bedrooms = rng.choices(range(6), weights=bedroom_weights)[0]
+    # Log-normal prices around the city median, scaled by type and size
+    price = median_price * price_factor * (0.6 + 0.15 * bedrooms) * math.exp(rng.gauss(0, 0.45))
+    tier = _weighted(rng, TIERS)
+    features = rng.sample(FEATURES, 3)
+    posted = now - timedelta(days=365 * rng.random() ** 2) # Skewed towards recent listings
+    is_land = property_type == "Vacant Land"
+    return {
+        "title": f"{bedrooms} bedroom {property_type.lower()} in {city}" if not is_land else f"Vacant land in {city}",
+        "description": f"{property_type} in {city}, {province} with {features[0]}, {features[1]} and {features[2]}.",
+        "price": round(price, -3),
+        "address": f"{rng.randint(1, 250)} {rng.choice(['Main', 'Church', 'Oak', 'Beach', 'Hill', 'Park'])} {rng.choice(['Street', 'Road', 'Avenue', 'Drive'])}",
+        "city": city,
+        "province": province,
+        "postal_code": f"{rng.randint(1, 9999):04d}",
+        "latitude": latitude + rng.gauss(0, 0.05),
+        "longitude": longitude + rng.gauss(0, 0.05),
+        "bedrooms": None if is_land else bedrooms,
+        "bathrooms": None if is_land else max(1.0, bedrooms - rng.choice([0, 0.5, 1])),
+        "property_type": property_type,
+        "area_sqm": int(rng.gauss(60 + 45 * bedrooms, 20)) if not is_land else rng.randint(300, 5000),
+        "user_id": user_id,
+        "source": _weighted(rng, SOURCES),
+        "status": _weighted(rng, STATUSES),
+        "is_charged_listing": tier != "standard",
+        "listing_tier": tier,
+        "payment_status": "completed" if tier != "standard" else None,
+        "tier_expiry_date": now + timedelta(days=rng.randint(-10, 90)) if tier != "standard" else None,
+        "date_posted": posted,
+        "date_updated": posted,
+    }
+
+
+def generate(session, seed=42, users=200, listings=10000, ads=40, batch_size=1000, now=None, password_method=DEFAULT_METHOD):
+    """Insert a synthetic dataset and return the row counts.
+
+    Listings are spread over cities by market share and over users with a
+    Zipf-like skew (a few agencies own most listings); prices are log-normal
+    around each city's median. All users share BENCH_PASSWORD, hashed once
+    with `password_method` (pass the app's PASSWORD_HASH_METHOD so logins
+    don't trigger rehashing).
+    """
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    password_hash = generate_password_hash(BENCH_PASSWORD, method=password_method)
+
+    session.execute(User.__table__.insert(), [
+        {"email": f"user{index}@{BENCH_EMAIL_DOMAIN}", "password_hash": password_hash, "full_name": f"Bench User {index}"}
+        for index in range(users)
+    ])
+    user_ids = [row.id for row in session.query(User.id).filter(User.email.like(f"%@{BENCH_EMAIL_DOMAIN}")).order_by(User.id)]
+    user_weights = [1 / (rank + 1) ** 1.1 for rank in range(len(user_ids))]
+    city_choices = list(_cities())
+
+    for start in range(0, listings, batch_size):
+        count = min(batch_size, listings - start)
+        owners = rng.choices(user_ids, weights=user_weights, k=count)
+        session.execute(Listing.__table__.insert(), [_listing_row(rng, owner, city_choices, now) for owner in owners])
+        session.commit()
+
+    ad_rows = []
+    for index in range(ads):
+        start_date = now - timedelta(days=rng.randint(-5, 30)) # A few ads are scheduled to start later
+        ad_rows.append({
+            "title": f"Bench advert {index}",
+            "advertiser_name": rng.choice(["Bond Originators SA", "HomeLoans Direct", "MoveIt Removals", "SecureHome Alarms", "SunPower Solar"]),
+            "image_url": f"https://cdn.example.com/ads/{index}.jpg",
+            "target_url": f"https://example.com/campaign/{index}",
+            "placement_area": _weighted(rng, PLACEMENT_AREAS),
+            "start_date": start_date,
+            "end_date": start_date + timedelta(days=rng.randint(7, 90)),
+            "is_active": rng.random() < 0.9,
+            "impressions": 0,
+            "clicks": 0,
+        })
+    if ad_rows:
+        session.execute(Advertisement.__table__.insert(), ad_rows)
+    session.commit()
+    return {"users": len(user_ids), "listings": listings, "advertisements": ads}
+
+
+def is_seeded(session):
+    return session.query(User.id).filter(User.email.like(f"%@{BENCH_EMAIL_DOMAIN}")).first() is not None
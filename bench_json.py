@@ -0,0 +1,95 @@
+# JSON encoding and compression benchmark (run with `python -m src.bench_json`)
+# Encodes one 100-listing search page with each JSON provider, then compresses it at several levels,
+# to compare encode time and bytes on the wire and to pick COMPRESS_MIN_BYTES / COMPRESS_GZIP_LEVEL.
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+
+from src.services.json_provider import StdlibJSONProvider, OrjsonProvider, orjson
+
+
+def listing_page(database_url, per_page, fields, seed):
+    """The payload get_listings returns for its first page, built from synthetic data if needed"""
+    from src.main import create_app
+    from src.models.user import db
+    from src.models.listing import Listing
+    from src.services.bench_data import generate, is_seeded
+    from src.services.listing_serializer import listing_query_options, parse_fields, serialize_listings
+    from src.services.migrations import upgrade
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": database_url})
+    with app.app_context():
+        db.create_all()
+        upgrade(db.engine)
+        if not is_seeded(db.session):
+            generate(db.session, seed=seed, users=20, listings=max(per_page, 500), ads=0)
+        fields = parse_fields(fields)
+        listings = (Listing.query.options(*listing_query_options(fields))
+                    .order_by(Listing.date_posted.desc(), Listing.id.desc()).limit(per_page).all())
+        page = {"message": "Listings retrieved successfully", "listings": serialize_listings(listings, fields),
+                "next_cursor": "x" * 40, "total": 500}
+    return app, page
+
+
+def time_call(function, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON encode and compression benchmark for a listing page")
+    parser.add_argument("--database", default=None, help="Database URI with listings (default: a temporary seeded SQLite file)")
+    parser.add_argument("--per-page", type=int, default=100)
+    parser.add_argument("--fields", default=None, help="Field projection as in ?fields= (default: full listings)")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app, page = listing_page(args.database or f"sqlite:///{os.path.join(directory, 'bench_json.db')}",
+                                 args.per_page, args.fields, args.seed)
+
+    providers = [("flask default", DefaultJSONProvider(app)), ("stdlib", StdlibJSONProvider(app))]
+    if orjson is not None:
+        providers.append(("orjson", OrjsonProvider(app)))
+    else:
+        print("orjson is not installed; skipping it")
+
+    print(f"Encoding a {len(page['listings'])}-listing page ({args.rounds} rounds)")
+    print(f"{'provider':<15}{'median ms':>11}{'bytes':>10}")
+    body = None
+    for name, provider in providers:
+        with app.app_context():
+            elapsed, encoded = time_call(lambda: provider.response(page).get_data(), args.rounds)
+        body = encoded
+        print(f"{name:<15}{elapsed:>11.2f}{len(encoded):>10}")
+
+    codecs = [(f"gzip -{level}", lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0)) for level in (1, 5, 9)]
+    try:
+        import brotli
+        codecs += [(f"brotli q{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality)) for quality in (4, 11)]
+    except ImportError:
+        print("brotli is not installed; skipping it")
+
+    print(f"\nCompressing the {providers[-1][0]} body")
+    print(f"{'encoding':<15}{'median ms':>11}{'bytes':>10}{'ratio':>8}")
+    print(f"{'identity':<15}{0:>11.2f}{len(body):>10}{1:>8.0%}")
+    for name, compress in codecs:
+        elapsed, compressed = time_call(lambda: compress(body), args.rounds)
+        print(f"{name:<15}{elapsed:>11.2f}{len(compressed):>10}{len(compressed) / len(body):>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Password hashing micro-benchmark (run with `python -m src.bench_password_hashing`)
+# Measures per-hash cost of candidate methods and login throughput/shedding through the hashing pool,
+# to pick PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS and PASSWORD_HASH_MAX_QUEUE for a deployment.
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from src.services.password_hashing import PasswordHasher, HashingPoolSaturated
+
+DEFAULT_METHODS = ["pbkdf2:sha256:260000", "pbkdf2:sha256:600000", "scrypt:16384:8:1", "scrypt:32768:8:1"]
+
+
+def time_method(method, rounds):
+    """Median milliseconds to hash and to verify one password in this process"""
+    hash_times = []
+    verify_times = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        password_hash = generate_password_hash("correct horse battery staple", method=method)
+        hash_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        check_password_hash(password_hash, "correct horse battery staple")
+        verify_times.append(time.perf_counter() - started)
+    return statistics.median(hash_times) * 1000, statistics.median(verify_times) * 1000
+
+
+def run_load(method, workers, max_queue, clients, seconds):
+    """Hammer the pool with `clients` threads doing verifies; returns (ok, rejected, latencies)"""
+    hasher = PasswordHasher(method=method, max_workers=workers, max_queue=max_queue)
+    password_hash = generate_password_hash("correct horse battery staple", method=method)
+    hasher.verify(password_hash, "correct horse battery staple") # Warm up the worker processes
+    deadline = time.monotonic() + seconds
+    results = {"ok": 0, "rejected": 0, "latencies": []}
+    lock = threading.Lock()
+
+    def client():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                hasher.verify(password_hash, "correct horse battery staple")
+            except HashingPoolSaturated:
+                with lock:
+                    results["rejected"] += 1
+                time.sleep(0.01) # A rejected client backs off briefly, as it would on a 503
+                continue
+            with lock:
+                results["ok"] += 1
+                results["latencies"].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    hasher.shutdown()
+    return results["ok"], results["rejected"], sorted(results["latencies"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Password hashing cost and pool throughput benchmark")
+    parser.add_argument("--method", action="append", dest="methods", help="Hash method to measure (repeatable)")
+    parser.add_argument("--rounds", type=int, default=5, help="Hashes per method for the per-hash timing")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--max-queue", type=int, default=None)
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent simulated logins")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each load run")
+    args = parser.parse_args()
+    methods = args.methods or DEFAULT_METHODS
+    max_queue = args.max_queue or args.workers * 4
+
+    print(f"{'method':<24}{'hash ms':>10}{'verify ms':>11}")
+    for method in methods:
+        hash_ms, verify_ms = time_method(method, args.rounds)
+        print(f"{method:<24}{hash_ms:>10.1f}{verify_ms:>11.1f}")
+
+    print(f"\nLoad: {args.clients} clients, {args.workers} workers, max queue {max_queue}, {args.seconds:.0f}s per method")
+    print(f"{'method':<24}{'logins/s':>10}{'rejected':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for method in methods:
+        ok, rejected, latencies = run_load(method, args.workers, max_queue, args.clients, args.seconds)
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0.0
+        print(f"{method:<24}{ok / args.seconds:>10.1f}{rejected:>10}{p50:>9.1f}{p99:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Cold-start benchmark (run with `python -m src.bench_startup`)
+# Starts fresh interpreters and times importing the app, create_app() and the first request,
+# which is what an autoscaled worker or a test process pays before it can serve.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_PROBE = """
+import json, time
+started = time.perf_counter()
+from src.main import create_app
+imported = time.perf_counter()
+app = create_app({"SQLALCHEMY_DATABASE_URI": %(database)r})
+created = time.perf_counter()
+response = app.test_client().get(%(path)r)
+served = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": created - imported,
+                  "first_request": served - created, "status": response.status_code}))
+"""
+
+
+def measure(database, path, runs):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE % {"database": database, "path": path}],
+            cwd=root, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Application cold-start benchmark")
+    parser.add_argument("--database", default="sqlite://", help="Database URI for the probe app (default: in-memory SQLite)")
+    parser.add_argument("--path", default="/metrics", help="First request to serve; use an API path to include DB warm-up")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = measure(args.database, args.path, args.runs)
+    print(f"{'phase':<15}{'median ms':>11}{'max ms':>9}")
+    for phase in ("import", "create_app", "first_request"):
+        values = [sample[phase] * 1000 for sample in samples]
+        print(f"{phase:<15}{statistics.median(values):>11.1f}{max(values):>9.1f}")
+    totals = [sum(sample[phase] for phase in ("import", "create_app", "first_request")) * 1000 for sample in samples]
+    print(f"{'total':<15}{statistics.median(totals):>11.1f}{max(totals):>9.1f}  (first request HTTP {samples[-1]['status']})")
+
+
+if __name__ == "__main__":
+    main()
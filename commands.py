@@ -0,0 +1,237 @@
+# Flask CLI commands (run with `flask --app src.main <command>`)
+# Heavy modules are imported inside each command so they are only loaded when that command runs.
+import click
+from flask.cli import with_appcontext
+
+@click.command("ingest-feed")
+@click.argument("feed_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--source", required=True, help="Feed provider, stored as Listing.source (e.g. privateproperty, property24)")
+@click.option("--format", "feed_format", type=click.Choice(["ndjson", "csv", "xml"]), default=None, help="Defaults to the file extension")
+@click.option("--user-id", type=int, required=True, help="Account that owns imported listings")
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+@with_appcontext
+def ingest_feed_command(feed_path, source, feed_format, user_id, batch_size):
+    """Stream an external listing feed into the listings table."""
+    from src.models.user import db
+    from src.services.feed_ingest import FEED_FORMATS, ingest_feed
+
+    feed_format = feed_format or feed_path.rsplit(".", 1)[-1].lower()
+    if feed_format not in FEED_FORMATS:
+        raise click.UsageError(f"Cannot tell the feed format from {feed_path!r}; pass --format {'|'.join(FEED_FORMATS)}")
+    mode = "rb" if feed_format == "xml" else "r"
+    with open(feed_path, mode, **({} if mode == "rb" else {"encoding": "utf-8", "newline": ""})) as stream:
+        stats = ingest_feed(
+            db.session, stream, feed_format, source, user_id, batch_size=batch_size,
+            on_batch=lambda stats: click.echo(f"{stats.read} rows read, {stats.rows_per_second:.0f} rows/s")
+        )
+    click.echo(f"Done: {stats.to_dict()}")
+
+@click.command("dedupe-listings")
+@with_appcontext
+def dedupe_listings_command():
+    """Recompute duplicate-listing links across the whole listings table."""
+    from src.models.user import db
+    from src.services.listing_dedup import dedupe_all
+
+    click.echo(f"Done: {dedupe_all(db.session)}")
+
+@click.command("sweep-tier-expiry")
+@click.option("--loop", is_flag=True, help="Keep running, sweeping every --interval seconds")
+@click.option("--interval", type=int, default=60, show_default=True)
+@click.option("--chunk-size", type=click.IntRange(min=1), default=500, show_default=True)
+@with_appcontext
+def sweep_tier_expiry_command(loop, interval, chunk_size):
+    """Downgrade paid listings whose tier has expired (safe to run from several workers)."""
+    import time
+    from src.models.user import db
+    from src.services.tier_sweeper import sweep_expired_tiers
+
+    while True:
+        click.echo(f"Swept: {sweep_expired_tiers(db.session, chunk_size=chunk_size)}")
+        if not loop:
+            break
+        db.session.remove()
+        time.sleep(interval)
+
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Create missing tables and apply pending migrations (run once per deploy, not per worker)."""
+    from src.models.user import db
+    from src.services.migrations import upgrade
+
+    db.create_all()
+    applied = upgrade(db.engine)
+    click.echo(f"Database initialized; applied migrations: {applied}" if applied else "Database initialized; schema is up to date")
+
+@click.command("db-upgrade")
+@click.option("--status", is_flag=True, help="Only list pending migrations")
+@click.option("--target", type=int, default=None, help="Stop after this migration version")
+@with_appcontext
+def db_upgrade_command(status, target):
+    """Apply pending schema migrations (tables, indexes) in order."""
+    from src.models.user import db
+    from src.services.migrations import pending_migrations, upgrade
+
+    if status:
+        for version, description, _ in pending_migrations(db.engine):
+            click.echo(f"pending {version}: {description}")
+        return
+    applied = upgrade(db.engine, target=target)
+    click.echo(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+
+@click.command("check-query-plans")
+@click.option("--verbose", is_flag=True, help="Print every statement and its plan")
+@with_appcontext
+def check_query_plans_command(verbose):
+    """EXPLAIN the SQL behind the listing endpoints; exits 1 if any query regressed to a full scan."""
+    from flask import current_app
+    from src.services.query_plans import check_query_plans
+
+    results = check_query_plans(current_app)
+    for result in results:
+        click.echo(f"{'ok  ' if result['ok'] else 'FAIL'} {result['name']} ({result['url']}, HTTP {result['status']})")
+        for statement in result["statements"]:
+            if verbose or statement["unexpected"]:
+                click.echo(f"     {' '.join(statement['sql'].split())}")
+                for line in statement["plan"]:
+                    click.echo(f"       {line}")
+            for table in statement["full_scans"]:
+                if table in result["allowed"]:
+                    click.echo(f"     allowed full scan of {table}: {result['allowed'][table]}")
+    if not all(result["ok"] for result in results):
+        raise SystemExit(1)
+
+@click.command("render-images")
+@click.option("--all", "render_all", is_flag=True, help="Re-render every image, e.g. after changing the variant sizes")
+@with_appcontext
+def render_images_command(render_all):
+    """Render listing photo variants left unfinished (worker restarts, failures)."""
+    from src.models.user import db
+    from src.models.listing_image import ListingImage
+    from src.services.image_pipeline import image_pipeline, render_variants
+
+    query = ListingImage.query if render_all else ListingImage.query.filter(ListingImage.status != "ready")
+    image_ids = [image_id for (image_id,) in query.with_entities(ListingImage.id).order_by(ListingImage.id)]
+    for image_id in image_ids:
+        image = db.session.get(ListingImage, image_id)
+        try:
+            render_variants(image_pipeline.directory(image.content_hash), f"original.{image.original_format}", image_pipeline.max_pixels)
+            ok = True
+        except Exception as e:
+            click.echo(f"Image {image_id} failed: {e!r}")
+            ok = False
+        image_pipeline.mark_rendered(image_id, ok=ok)
+    click.echo(f"Rendered {len(image_ids)} images")
+
+@click.command("build-static")
+@click.option("--min-size", type=int, default=1024, show_default=True, help="Smaller files are not worth compressing")
+@click.option("--no-brotli", is_flag=True, help="Only write .gz variants")
+@with_appcontext
+def build_static_command(min_size, no_brotli):
+    """Precompress the frontend build in the static folder (.gz and .br next to each text asset)."""
+    from flask import current_app
+    from src.services.static_assets import precompress
+
+    compressed, before, after = precompress(current_app.static_folder, min_size=min_size, use_brotli=not no_brotli)
+    click.echo(f"Compressed {compressed} files: {before} -> {after} bytes with gzip" + (f" ({after / before:.0%})" if before else ""))
+
+@click.command("export-listings")
+@click.option("--format", "export_format", type=click.Choice(["csv", "ndjson"]), default="csv", show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False, writable=True), default="-", help="File to write (default: stdout)")
+@click.option("--user-id", type=int, default=None, help="Only this account's listings (default: all listings)")
+@click.option("--fields", default=None, help="Comma-separated fields or a preset such as 'card' (default: every column)")
+@click.option("--chunk-size", type=int, default=5000, show_default=True, help="Rows fetched from the cursor at a time")
+@with_appcontext
+def export_listings_command(export_format, output, user_id, fields, chunk_size):
+    """Stream listings to CSV or NDJSON in constant memory, e.g. for portal feeds."""
+    from src.models.user import db
+    from src.services.listing_export import export_fields, export_result, export_chunks
+
+    try:
+        fields = export_fields(fields)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--fields")
+    result = export_result(db.session, fields, user_id=user_id, chunk_size=chunk_size)
+    with click.open_file(output, "wb") as stream:
+        for chunk in export_chunks(result, fields, export_format):
+            stream.write(chunk)
+
+@click.command("send-search-digests")
+@click.option("--max-listings", type=int, default=20, show_default=True, help="Listings shown per saved search")
+@click.option("--dry-run", is_flag=True, help="Print the digests without marking their matches as notified")
+@with_appcontext
+def send_search_digests_command(max_listings, dry_run):
+    """Write one digest per user of queued saved-search matches to stdout as NDJSON, for the mailer.
+
+    Run it on the digest schedule (e.g. daily from cron); matches are only marked notified once printed.
+    """
+    from flask import current_app
+    from src.models.user import db
+    from src.services.search_percolator import send_digests
+
+    def send(user_id, digest):
+        click.echo(current_app.json.dumps(digest))
+
+    sent = send_digests(db.session, send, max_listings=max_listings, mark_notified=not dry_run)
+    click.echo(f"{sent} digests", err=True)
+
+@click.command("process-payment-events")
+@click.option("--loop", is_flag=True, help="Keep running, polling the queue every --interval seconds")
+@click.option("--interval", type=float, default=2, show_default=True)
+@click.option("--batch-size", type=int, default=100, show_default=True)
+@click.option("--purge-days", type=int, default=30, show_default=True, help="Forget finished events older than this")
+@with_appcontext
+def process_payment_events_command(loop, interval, batch_size, purge_days):
+    """Apply journaled payment notifications to transactions and listings (safe to run from several workers)."""
+    import time
+    from src.models.user import db
+    from src.services.payment_gateway import payment_gateway
+    from src.services.payment_queue import payment_queue
+    from src.services.payment_worker import process_payment_events
+
+    gateway = payment_gateway()
+    payment_queue.purge(purge_days)
+    while True:
+        result = process_payment_events(db.session, payment_queue, gateway, batch_size=batch_size)
+        if result["batches"] or not loop:
+            click.echo(f"Processed: {result}; queue: {payment_queue.stats()}")
+        if not loop:
+            break
+        db.session.remove()
+        time.sleep(interval)
+
+@click.command("fake-payment-notify")
+@click.argument("reference")
+@click.option("--status", type=click.Choice(["COMPLETE", "FAILED", "CANCELLED"]), default="COMPLETE", show_default=True)
+@click.option("--amount", default=None, help="Amount paid (default: the transaction amount)")
+@with_appcontext
+def fake_payment_notify_command(reference, status, amount):
+    """Post a signed notification for a pending transaction to this app's webhook (PAYMENT_GATEWAY=fake only)."""
+    from flask import current_app
+    from werkzeug.datastructures import MultiDict
+    from src.models.payment_transaction import PaymentTransaction
+    from src.services.payment_gateway import payment_gateway
+
+    gateway = payment_gateway()
+    if gateway.name != "fake":
+        raise click.UsageError("Set PAYMENT_GATEWAY=fake to simulate gateway notifications")
+    transaction = PaymentTransaction.query.filter_by(reference=reference).first()
+    if transaction is None:
+        raise click.BadParameter(f"No transaction {reference}", param_hint="REFERENCE")
+    response = current_app.test_client().post(f"/api/payments/notify/{gateway.name}", data=MultiDict(gateway.notification(transaction, status, amount)))
+    click.echo(f"HTTP {response.status_code}: {response.get_json()}")
+
+def register_commands(app):
+    app.cli.add_command(ingest_feed_command)
+    app.cli.add_command(dedupe_listings_command)
+    app.cli.add_command(sweep_tier_expiry_command)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(render_images_command)
+    app.cli.add_command(build_static_command)
+    app.cli.add_command(export_listings_command)
+    app.cli.add_command(send_search_digests_command)
+    app.cli.add_command(process_payment_events_command)
+    app.cli.add_command(fake_payment_notify_command)
@@ -0,0 +1,98 @@
+# Environment-driven app settings shared by the dev server, gunicorn and CLI commands
+import os
+
+# Database Configuration
+DB_USERNAME = 'propsundayuser'
+DB_PASSWORD = 'f22adada45a6e5426994cdeb06c01583' # Retrieved from db_credentials.txt
+DB_HOST = 'localhost'
+DB_PORT = '3307' # Updated port
+DB_NAME = 'propertysunday'
+
+
+def _flag(value):
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+def engine_options(database_uri, environ=os.environ):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database.
+
+    Pool sizes are per worker process: with W gunicorn workers MySQL sees up to
+    W * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections, which gunicorn.conf.py
+    keeps within DB_CONNECTION_BUDGET. A worker runs GUNICORN_THREADS request
+    threads, so by default its pool holds one connection per thread and no
+    overflow: more would only sit idle against max_connections. DB_POOL_RECYCLE should be shorter than the server's
+    wait_timeout so idle connections are replaced before MySQL drops them, and
+    pre-ping catches the ones dropped anyway ("MySQL server has gone away").
+    DB_STATEMENT_TIMEOUT_MS bounds every SELECT on the server side.
+    """
+    if database_uri.startswith("sqlite"):
+        return {} # SQLite pools are per file/thread and take none of these options
+
+    statement_timeout_ms = int(environ.get("DB_STATEMENT_TIMEOUT_MS", "5000"))
+    options = {
+        "pool_size": int(environ.get("DB_POOL_SIZE") or environ.get("GUNICORN_THREADS", "4")),
+        "max_overflow": int(environ.get("DB_MAX_OVERFLOW", "0")),
+        "pool_timeout": float(environ.get("DB_POOL_TIMEOUT", "10")), # Seconds to wait for a free connection before erroring
+        "pool_recycle": int(environ.get("DB_POOL_RECYCLE", "280")),
+        "pool_pre_ping": _flag(environ.get("DB_POOL_PRE_PING", "true")),
+        "pool_use_lifo": True, # Reuse warm connections so surplus ones go idle and get recycled
+    }
+    if database_uri.startswith("mysql"):
+        options["connect_args"] = {
+            "connect_timeout": int(environ.get("DB_CONNECT_TIMEOUT", "5")),
+            # Socket-level backstop for statements the server-side limit doesn't cover (writes, DDL)
+            "read_timeout": int(environ.get("DB_READ_TIMEOUT", "30")),
+            "write_timeout": int(environ.get("DB_WRITE_TIMEOUT", "30")),
+        }
+        if statement_timeout_ms > 0:
+            options["connect_args"]["init_command"] = f"SET SESSION max_execution_time={statement_timeout_ms}"
+    elif database_uri.startswith("postgresql") and statement_timeout_ms > 0:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout_ms}"}
+    return options
+
+
+def app_config(environ=os.environ):
+    """Default Flask config read from the environment; create_app(config) overrides any of it"""
+    database_uri = environ.get('DATABASE_URL', f"mysql+pymysql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}") # e.g. sqlite:///bench.db for local benchmarks
+    return {
+        'SECRET_KEY': environ.get('FLASK_SECRET_KEY', 'default_super_secret_key_for_dev_!@#$%^&*()'),
+        'JWT_SECRET_KEY': environ.get('JWT_SECRET_KEY', 'default_jwt_secret_key_for_dev_!@#$%^&*()'), # For JWT
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options(database_uri, environ), # DB_POOL_SIZE, DB_POOL_RECYCLE, DB_STATEMENT_TIMEOUT_MS, ...
+        'AD_COUNTER_FLUSH_INTERVAL': float(environ.get('AD_COUNTER_FLUSH_INTERVAL', '5')), # Seconds between counter flushes
+        'RESPONSE_CACHE_TTL': int(environ.get('RESPONSE_CACHE_TTL', '60')), # Upper bound on staleness across workers
+        'RESPONSE_CACHE_REDIS_URL': environ.get('RESPONSE_CACHE_REDIS_URL'), # Shared cache backend; required to cache listings with several workers
+        'WEB_CONCURRENCY': int(environ.get('WEB_CONCURRENCY', '1')), # Worker processes serving the app; gunicorn.conf.py sets it
+        'PASSWORD_HASH_METHOD': environ.get('PASSWORD_HASH_METHOD', 'scrypt'), # werkzeug's default, e.g. pbkdf2:sha256:600000; other hashes are converted on login
+        'PASSWORD_HASH_WORKERS': int(environ.get('PASSWORD_HASH_WORKERS', '2')), # Hashing processes per app worker
+        'PASSWORD_HASH_MAX_QUEUE': int(environ.get('PASSWORD_HASH_MAX_QUEUE', '16')), # In-flight hashes before logins get 503
+        'METRICS_SLOW_QUERY_MS': float(environ.get('METRICS_SLOW_QUERY_MS', '200')), # Statements slower than this are logged with their shape
+        'METRICS_TRACE_SAMPLE_RATE': float(environ.get('METRICS_TRACE_SAMPLE_RATE', '0')), # Fraction of requests logged as full SQL traces
+        'DATABASE_REPLICA_URIS': [uri.strip() for uri in environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()], # Read-only endpoints round-robin over these
+        'REPLICA_RETRY_INTERVAL': float(environ.get('REPLICA_RETRY_INTERVAL', '30')), # Seconds a failed replica is skipped before it is re-probed
+        'REPLICA_STICKY_SECONDS': int(environ.get('REPLICA_STICKY_SECONDS', '5')), # Reads stay on the primary this long after a client writes
+        'IMAGE_STORAGE_DIR': environ.get('IMAGE_STORAGE_DIR'), # Listing photos; defaults to static/media/images
+        'IMAGE_WORKERS': int(environ.get('IMAGE_WORKERS', '2')), # Variant-rendering processes per app worker
+        'IMAGE_MAX_QUEUE': int(environ.get('IMAGE_MAX_QUEUE', '32')), # Pending renders before uploads get 503
+        'IMAGE_MAX_UPLOAD_BYTES': int(environ.get('IMAGE_MAX_UPLOAD_BYTES', str(15 * 1024 * 1024))),
+        'ADMIN_USER_IDS': [int(user_id) for user_id in environ.get('ADMIN_USER_IDS', '').split(',') if user_id.strip()], # Accounts allowed full-table exports
+        'EXPORT_CHUNK_SIZE': int(environ.get('EXPORT_CHUNK_SIZE', '1000')), # Rows fetched from the export cursor at a time
+        'SAVED_SEARCH_LIMIT': int(environ.get('SAVED_SEARCH_LIMIT', '25')), # Saved searches per account
+        'FEATURED_SEARCH_SLOTS': int(environ.get('FEATURED_SEARCH_SLOTS', '3')), # Promoted listings shown above the first page of search results
+        'PAYMENT_GATEWAY': environ.get('PAYMENT_GATEWAY', 'payfast'), # payfast, or fake for local development
+        'PAYFAST_MERCHANT_ID': environ.get('PAYFAST_MERCHANT_ID'), # Required unless PAYFAST_SANDBOX; the sandbox defaults to PayFast's public test merchant
+        'PAYFAST_MERCHANT_KEY': environ.get('PAYFAST_MERCHANT_KEY'),
+        'PAYFAST_PASSPHRASE': environ.get('PAYFAST_PASSPHRASE'), # Secret salt of checkout and ITN signatures; required unless PAYFAST_SANDBOX
+        'PAYFAST_SANDBOX': _flag(environ.get('PAYFAST_SANDBOX', 'false')), # Test payments against sandbox.payfast.co.za
+        'PAYFAST_VALID_NETWORKS': [network.strip() for network in environ.get('PAYFAST_VALID_NETWORKS', '').split(',') if network.strip()], # Overrides PayFast's published ITN source ranges
+        'PAYMENT_TRUSTED_PROXIES': int(environ.get('PAYMENT_TRUSTED_PROXIES', '0')), # Reverse proxies in front of the app that append X-Forwarded-For
+        'PAYMENT_RETURN_URL': environ.get('PAYMENT_RETURN_URL'), # Where the gateway sends the buyer afterwards
+        'PAYMENT_CANCEL_URL': environ.get('PAYMENT_CANCEL_URL'),
+        'PAYMENT_NOTIFY_URL': environ.get('PAYMENT_NOTIFY_URL'), # Public URL of /api/payments/notify/<gateway>
+        'PAYMENT_QUEUE_PATH': environ.get('PAYMENT_QUEUE_PATH'), # SQLite journal of notifications; defaults to instance/payment_events.sqlite3
+        'PAYMENT_EVENT_MAX_ATTEMPTS': int(environ.get('PAYMENT_EVENT_MAX_ATTEMPTS', '8')), # Failed notifications are retried with backoff this many times
+        'COMPRESS_MIN_BYTES': int(environ.get('COMPRESS_MIN_BYTES', '1024')), # Smaller responses are sent uncompressed
+        'COMPRESS_GZIP_LEVEL': int(environ.get('COMPRESS_GZIP_LEVEL', '5')), # 1-9; higher levels cost CPU for little gain on JSON
+        'STATIC_MAX_AGE': int(environ.get('STATIC_MAX_AGE', '3600')), # Browser cache lifetime for unhashed frontend files
+    }
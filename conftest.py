@@ -0,0 +1,68 @@
+# Shared pytest fixtures: an app on a throwaway SQLite database with the fake payment gateway
+import pytest
+from flask_jwt_extended import create_access_token
+
+from src.main import create_app
+from src.models.user import db, User
+from src.models.listing import Listing
+from src.services.ad_schedule import ad_schedule_index
+from src.services.featured_ranking import featured_ranking
+from src.services.geo_index import listing_geo_index
+from src.services.listing_facets import listing_facet_index
+from src.services.migrations import upgrade
+from src.services.pagination import listing_count_cache
+from src.services.search_index import listing_search_index
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}",
+        "RESPONSE_CACHE_ENABLED": False,
+        "PAYMENT_GATEWAY": "fake",
+        "PAYMENT_QUEUE_PATH": str(tmp_path / "payment_events.sqlite3"),
+        "IMAGE_STORAGE_DIR": str(tmp_path / "media"),
+    })
+    with app.app_context():
+        upgrade(db.engine)
+        # The in-process indexes outlive the app; rebuild them from this test's database on first use
+        for index in (listing_search_index, listing_geo_index, listing_facet_index, featured_ranking):
+            index.invalidate()
+        ad_schedule_index.invalidate()
+        listing_count_cache.clear()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    """Authorization headers for a user id; identities are strings, as the login routes issue them"""
+    def auth_headers(user_id):
+        return {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+    return auth_headers
+
+
+@pytest.fixture
+def other_user(app):
+    user = User("other@example.com", password_hash="unused")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def listing(app):
+    user = User("owner@example.com", password_hash="unused")
+    db.session.add(user)
+    db.session.flush()
+    listing = Listing(title="Two bedroom flat", price=1500000, address="1 Long Street", city="Cape Town",
+                      province="Western Cape", bedrooms=2, property_type="apartment", user_id=user.id, status="active")
+    db.session.add(listing)
+    db.session.commit()
+    return listing
@@ -0,0 +1,156 @@
+# Read-replica routing: read-only views read from replica binds, everything else uses the primary
+import itertools
+import logging
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, text
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = "replica_"
+# Cookie that keeps a client's reads on the primary for a moment after it wrote
+STICKY_COOKIE = "db_primary_until"
+
+
+class RoutingSession(Session):
+    """Session that sends SELECTs issued by read_only views to a replica.
+
+    A session (one per request) pins the replica it first picks, so all reads
+    of a request see one consistent snapshot. Flushes, Core UPDATE/INSERT/
+    DELETE, SELECT ... FOR UPDATE and any statement after the session has
+    written go to the primary, so a view always reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self._flushing) or (clause is not None and not isinstance(clause, Select)):
+            self.info["wrote"] = True
+        elif (bind is None and not self.info.get("wrote") and isinstance(clause, Select)
+              and clause._for_update_arg is None and has_request_context() and g.get("db_read_only")):
+            engine = replica_router.engine_for(self)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """Round-robin over healthy replica binds with a cool-down for failed ones.
+
+    Replicas come from DATABASE_REPLICA_URIS and are registered as
+    SQLALCHEMY_BINDS named replica_0, replica_1, ... A replica whose connection
+    fails is skipped for REPLICA_RETRY_INTERVAL seconds and then re-probed with
+    SELECT 1 before it takes traffic again; with no healthy replica, reads fall
+    back to the primary.
+    """
+
+    def __init__(self):
+        self.bind_keys = []
+        self.retry_interval = 30
+        self.sticky_seconds = 5
+        self._counter = itertools.count()
+        self._down_until = {}
+        self._lock = threading.Lock()
+        self._db = None
+
+    def init_app(self, app, db):
+        """Register replica binds; call before db.init_app(app)"""
+        from src.config import engine_options
+
+        self._db = db
+        self._down_until = {}
+        self.retry_interval = app.config.get("REPLICA_RETRY_INTERVAL", self.retry_interval)
+        self.sticky_seconds = app.config.get("REPLICA_STICKY_SECONDS", self.sticky_seconds)
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        self.bind_keys = []
+        for index, uri in enumerate(app.config.get("DATABASE_REPLICA_URIS") or []):
+            bind_key = f"{REPLICA_BIND_PREFIX}{index}"
+            binds[bind_key] = dict(engine_options(uri), url=uri)
+            self.bind_keys.append(bind_key)
+        app.config["SQLALCHEMY_BINDS"] = binds
+        app.after_request(self._remember_write)
+
+    def _healthy(self, bind_key, engine):
+        down_until = self._down_until.get(bind_key)
+        if down_until is None:
+            return True
+        if time.monotonic() < down_until:
+            return False
+        try:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        except DBAPIError:
+            self.mark_down(bind_key)
+            return False
+        self._down_until.pop(bind_key, None)
+        logger.info("Replica %s is healthy again", bind_key)
+        return True
+
+    def mark_down(self, bind_key):
+        with self._lock:
+            self._down_until[bind_key] = time.monotonic() + self.retry_interval
+        logger.warning("Replica %s marked down for %ss", bind_key, self.retry_interval)
+
+    def fail_over(self, bind_key):
+        """Mark a failed replica down and unpin it from the request's session, so its next statements use the primary"""
+        self.mark_down(bind_key)
+        session = self._db.session
+        session.rollback()
+        session().info.pop("replica", None)
+
+    def engine_for(self, session):
+        """The replica engine pinned to this session, choosing one round-robin on first use"""
+        if not self.bind_keys or not has_app_context():
+            return None
+        engines = self._db.engines
+        bind_key = session.info.get("replica")
+        if bind_key is None:
+            for _ in range(len(self.bind_keys)):
+                candidate = self.bind_keys[next(self._counter) % len(self.bind_keys)]
+                if self._healthy(candidate, engines[candidate]):
+                    bind_key = candidate
+                    break
+            else:
+                return None
+            session.info["replica"] = bind_key
+            g.db_replica = bind_key
+        return engines[bind_key]
+
+    def _remember_write(self, response):
+        # Keep this client's reads on the primary until the replicas have caught up with its write
+        session_registry = self._db.session.registry if self._db else None
+        if session_registry is not None and session_registry.has() and self._db.session().info.get("wrote"):
+            response.set_cookie(STICKY_COOKIE, str(int(time.time() + self.sticky_seconds)), max_age=self.sticky_seconds,
+                                httponly=True, samesite="Lax")
+        return response
+
+
+def read_only(view):
+    """Route a view's SELECTs to a replica, retrying once on the primary if the replica fails"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            sticky = int(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            sticky = False
+        if sticky or not replica_router.bind_keys:
+            return view(*args, **kwargs)
+        g.db_read_only = True
+        try:
+            return view(*args, **kwargs)
+        except DBAPIError as error:
+            bind_key = g.pop("db_replica", None)
+            if bind_key is None or not (isinstance(error, OperationalError) or error.connection_invalidated):
+                raise
+            replica_router.fail_over(bind_key)
+            g.db_read_only = False
+            return view(*args, **kwargs)
+        finally:
+            g.db_read_only = False
+    return wrapper
+
+
+replica_router = ReplicaRouter()
@@ -0,0 +1,157 @@
+# Materialized ranking of paid listings (tier weight x recency decay) per placement, city and province
+import bisect
+import heapq
+import math
+from datetime import datetime
+
+from src.models.listing import Listing
+from src.models.listing_tiers import LISTING_TIERS
+from src.services import listing_events
+
+# Paid tiers that are ranked, their weight, and where they are promoted; tiers without placements are not ranked
+TIER_RANKING = {
+    name: {"weight": tier["ranking_weight"], "placements": tuple(tier["placements"])}
+    for name, tier in LISTING_TIERS.items() if tier["placements"]
+}
+PLACEMENTS = ("search", "homepage")
+# A promotion's weight halves every RECENCY_HALF_LIFE_DAYS after it was bought
+RECENCY_HALF_LIFE_DAYS = 7
+# Listings in other states (sold, rented, pending) are never promoted
+RANKED_STATUSES = (None, "active")
+
+_DECAY_PER_SECOND = math.log(2) / (RECENCY_HALF_LIFE_DAYS * 86400)
+
+
+def rank_key(tier, promoted_at):
+    """Log of the listing's score, up to a constant that is the same for every listing.
+
+    score = weight * 2 ** (-age / half_life), and age = now - promoted_at, so
+    log(score) = log(weight) + decay * promoted_at - decay * now. The last
+    term shifts every listing equally, so ordering by this key gives the same
+    order as ordering by score at any moment: the ranking never needs
+    re-sorting as time passes, only when a listing is promoted or demoted.
+    """
+    return math.log(TIER_RANKING[tier]["weight"]) + _DECAY_PER_SECOND * promoted_at.timestamp()
+
+
+def _text(value):
+    return (value or "").strip().lower()
+
+
+def _names(value):
+    """None for no filter, otherwise the set of normalized names in a name or list of names"""
+    if value is None or value == "":
+        return None
+    return {_text(value)} if isinstance(value, str) else {_text(name) for name in value}
+
+
+class _RankingState:
+    def __init__(self):
+        self.entries = {}  # listing_id -> (sort entry, scopes, city, province, tier_expiry_date)
+        self.lists = {}  # (placement, scope) -> sorted [(-rank key, listing_id), ...]; scope is "all", ("city", c) or ("province", p), normalized
+
+
+class FeaturedRanking(listing_events.ListingIndex):
+    """Paid listings in promotion order, kept as sorted lists per placement and city/province.
+
+    A promotion (upgrade_listing) or demotion (tier sweeper, edits) moves one
+    listing between a handful of lists, so reading the top N for a placement
+    costs O(N) however many listings are paid for. Tiers that have expired but
+    not yet been swept are skipped when read.
+    """
+
+    columns = ("city", "province", "status", "is_charged_listing", "listing_tier", "payment_status",
+               "payment_date", "tier_expiry_date", "date_posted")
+
+    def _new_state(self):
+        return _RankingState()
+
+    def _discard(self, state, listing_id):
+        entry = state.entries.pop(listing_id, None)
+        if entry is None:
+            return
+        sort_entry, scopes = entry[0], entry[1]
+        for scope in scopes:
+            ranked = state.lists[scope]
+            position = bisect.bisect_left(ranked, sort_entry)
+            if position < len(ranked) and ranked[position] == sort_entry:
+                del ranked[position]
+            if not ranked:
+                del state.lists[scope]
+
+    def _apply(self, state, row):
+        self._discard(state, row.id)
+        tier = TIER_RANKING.get(row.listing_tier)
+        if (tier is None or not row.is_charged_listing or row.payment_status != "paid"
+                or row.status not in RANKED_STATUSES):
+            return
+        promoted_at = row.payment_date or row.date_posted
+        if promoted_at is None:
+            return
+        city, province = _text(row.city), _text(row.province)
+        sort_entry = (-rank_key(row.listing_tier, promoted_at), row.id)
+        scopes = []
+        for placement in tier["placements"]:
+            scopes.append((placement, "all"))
+            if city:
+                scopes.append((placement, ("city", city)))
+            if province:
+                scopes.append((placement, ("province", province)))
+        for scope in scopes:
+            bisect.insort(state.lists.setdefault(scope, []), sort_entry)
+        state.entries[row.id] = (sort_entry, scopes, city, province, row.tier_expiry_date)
+
+    def listings_changed(self, listing_ids, chunk_size=500):
+        """Re-read listings changed by a set-based UPDATE (e.g. expired tiers being swept)"""
+        from src.models.user import db
+
+        listing_ids = list(listing_ids)
+        for start in range(0, len(listing_ids), chunk_size):
+            chunk = listing_ids[start:start + chunk_size]
+            rows = self._query(db.session).filter(Listing.id.in_(chunk)).all()
+            with self._lock:
+                for listing_id in set(chunk) - {row.id for row in rows}:
+                    self._discard(self._state, listing_id)
+                for row in rows:
+                    self._apply(self._state, row)
+
+    # Reading
+
+    def ranked_ids(self, session, placement, city=None, province=None, limit=10, offset=0, now=None):
+        """Listing ids in promotion order for a placement, optionally narrowed to cities and/or provinces.
+
+        `city` and `province` are exact names (trimmed and compared
+        case-insensitively), or lists of them whose rankings are merged; an
+        empty list matches nothing. Each name is one list lookup, so the cost
+        does not depend on how many cities have promoted listings. Substring
+        filters are resolved to names first (see listing._featured_scope).
+        """
+        self.ensure_current(session)
+        now = now or datetime.now() # upgrade_listing stores expiry dates in server local time
+        cities, provinces = _names(city), _names(province)
+        with self._lock:
+            state = self._state
+            if cities is not None:
+                sources = [state.lists.get((placement, ("city", name)), []) for name in cities]
+            elif provinces is not None:
+                sources = [state.lists.get((placement, ("province", name)), []) for name in provinces]
+            else:
+                sources = [state.lists.get((placement, "all"), [])]
+            listing_ids = []
+            skipped = 0
+            for _, listing_id in heapq.merge(*sources):
+                _, _, _, listing_province, expiry = state.entries[listing_id]
+                if expiry is not None and expiry <= now:
+                    continue
+                if cities is not None and provinces is not None and listing_province not in provinces:
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                listing_ids.append(listing_id)
+                if len(listing_ids) >= limit:
+                    break
+            return listing_ids
+
+
+featured_ranking = listing_events.register(FeaturedRanking())
@@ -0,0 +1,213 @@
+# Streaming bulk ingest of external listing feeds (NDJSON, CSV, XML)
+import csv
+import hashlib
+import json
+import logging
+import time
+import xml.etree.ElementTree as ElementTree
+
+from sqlalchemy import func, insert, select, update
+
+from src.models.listing import Listing
+from src.models.listing_source_ref import ListingSourceRef
+from src.services import listing_events
+from src.services.listing_validation import normalize_listing_fields, ListingValidationError
+
+logger = logging.getLogger(__name__)
+
+# Keys a feed may use for its own listing reference, in order of preference
+EXTERNAL_ID_KEYS = ("external_id", "listing_id", "reference", "id")
+
+FEED_FORMATS = ("ndjson", "csv", "xml")
+
+
+def read_ndjson(stream):
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            logger.warning("Skipping malformed NDJSON line %d", line_number)
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def read_xml(stream, record_tag="listing"):
+    """Yield one dict per <listing> element, clearing each element once read"""
+    context = ElementTree.iterparse(stream, events=("start", "end"))
+    _, root = next(context)
+    for event, element in context:
+        if event == "end" and element.tag == record_tag:
+            record = {child.tag: (child.text or "").strip() for child in element}
+            record.update(element.attrib)
+            yield record
+            root.clear()
+
+
+def read_feed(stream, feed_format):
+    if feed_format == "ndjson":
+        return read_ndjson(stream)
+    if feed_format == "csv":
+        return read_csv(stream)
+    if feed_format == "xml":
+        return read_xml(stream)
+    raise ValueError(f"Unsupported feed format: {feed_format}")
+
+
+class IngestStats:
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "read": self.read,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "rejected": self.rejected,
+            "elapsed_seconds": round(self.elapsed, 2),
+            "rows_per_second": round(self.rows_per_second, 1)
+        }
+
+
+class FeedIngester:
+    """Upserts feed records into listings in batches keyed on (source, external_id).
+
+    Records are validated with the same rules as create_listing. Each batch
+    costs one lookup of existing refs, one executemany UPDATE for changed
+    listings, multi-row INSERTs of new listings (see _insert_listings) and one
+    executemany INSERT of their refs, followed by a single commit. Rows whose
+    normalized content hash is unchanged are skipped entirely. Memory is
+    bounded by the batch size. Listeners hear about each batch's inserted and
+    updated ids through listing_events.listings_changed once it has been
+    committed.
+    """
+
+    def __init__(self, session, source, user_id, batch_size=1000, on_batch=None):
+        self.session = session
+        self.source = source
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+        self.stats = IngestStats()
+
+    def _normalize(self, record):
+        external_id = next((str(record[key]).strip() for key in EXTERNAL_ID_KEYS if record.get(key) not in (None, "")), None)
+        if external_id is None:
+            raise ListingValidationError("Missing external_id")
+        values = normalize_listing_fields(record)
+        content_hash = hashlib.sha1(json.dumps(values, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return external_id, values, content_hash
+
+    def ingest(self, records):
+        batch = {}
+        for record in records:
+            self.stats.read += 1
+            try:
+                external_id, values, content_hash = self._normalize(record)
+            except ListingValidationError as e:
+                self.stats.rejected += 1
+                if self.stats.rejected <= 20:
+                    logger.warning("Rejected feed row %d: %s", self.stats.read, e)
+                continue
+            batch[external_id] = (values, content_hash) # Later rows for the same listing win
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = {}
+        if batch:
+            self._write_batch(batch)
+        return self.stats
+
+    def _write_batch(self, batch):
+        existing = {
+            ref.external_id: ref
+            for ref in self.session.query(ListingSourceRef.id, ListingSourceRef.external_id, ListingSourceRef.listing_id, ListingSourceRef.content_hash)
+            .filter(ListingSourceRef.source == self.source, ListingSourceRef.external_id.in_(list(batch)))
+        }
+
+        listing_updates = []
+        ref_updates = []
+        new_listings = []
+        for external_id, (values, content_hash) in batch.items():
+            ref = existing.get(external_id)
+            if ref is None:
+                new_listings.append((external_id, content_hash, dict(values, user_id=self.user_id, source=self.source)))
+            elif ref.content_hash == content_hash:
+                self.stats.unchanged += 1
+            else:
+                listing_updates.append(dict(values, id=ref.listing_id))
+                ref_updates.append({"id": ref.id, "content_hash": content_hash})
+
+        try:
+            if listing_updates:
+                self.session.execute(update(Listing), listing_updates)
+                self.session.execute(update(ListingSourceRef), ref_updates)
+            new_ids = self._insert_listings([values for _, _, values in new_listings]) if new_listings else []
+            if new_listings:
+                self.session.execute(ListingSourceRef.__table__.insert(), [
+                    {"source": self.source, "external_id": external_id, "listing_id": listing_id, "content_hash": content_hash}
+                    for (external_id, content_hash, _), listing_id in zip(new_listings, new_ids)
+                ])
+            changed_ids = [values["id"] for values in listing_updates] + new_ids
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        finally:
+            self.session.expunge_all()
+
+        if changed_ids:
+            listing_events.listings_changed(changed_ids) # Cache invalidation, saved-search alerts
+        self.stats.updated += len(listing_updates)
+        self.stats.inserted += len(new_listings)
+        logger.info("Ingested %d rows from %s (%.0f rows/s)", self.stats.read, self.source, self.stats.rows_per_second)
+        if self.on_batch:
+            self.on_batch(self.stats)
+
+    def _insert_listings(self, rows, chunk_size=500):
+        """Insert new listings in multi-row statements; returns their ids in the order of `rows`.
+
+        Where INSERT ... RETURNING can report ids in parameter order
+        (PostgreSQL, SQLite, MariaDB) SQLAlchemy batches the rows into a few
+        statements and returns the ids. MySQL has no RETURNING, so each chunk
+        is one multi-row INSERT: InnoDB gives the rows of such a statement
+        consecutive ids from LAST_INSERT_ID(), which is checked against the
+        table before the ids are used.
+        """
+        dialect = self.session.get_bind(Listing.__mapper__).dialect
+        if dialect.insert_executemany_returning_sort_by_parameter_order:
+            return list(self.session.scalars(insert(Listing).returning(Listing.id, sort_by_parameter_order=True), rows))
+        listing_ids = []
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            first_id = self.session.execute(insert(Listing).values(chunk)).lastrowid
+            chunk_ids = list(range(first_id, first_id + len(chunk)))
+            inserted = self.session.scalar(select(func.count()).select_from(Listing).where(
+                Listing.id.between(chunk_ids[0], chunk_ids[-1]), Listing.source == self.source, Listing.user_id == self.user_id))
+            if inserted != len(chunk):
+                raise RuntimeError(f"Listing ids of a {len(chunk)}-row insert were not consecutive from {first_id}")
+            listing_ids.extend(chunk_ids)
+        return listing_ids
+
+
+def ingest_feed(session, stream, feed_format, source, user_id, batch_size=1000, on_batch=None):
+    """Stream a feed file into the listings table; returns IngestStats"""
+    ingester = FeedIngester(session, source, user_id, batch_size=batch_size, on_batch=on_batch)
+    return ingester.ingest(read_feed(stream, feed_format))
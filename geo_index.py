@@ -0,0 +1,237 @@
+# Geohash cell aggregates over listing coordinates for map clustering
+import math
+
+from src.services import listing_events
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Finest cell size kept in the index (~38m x 19m)
+MAX_PRECISION = 8
+# Cell size used to look up individual points at high zoom (~1.2km x 0.6km)
+POINT_PRECISION = 6
+# From this zoom level on the map endpoint returns points instead of clusters
+POINT_ZOOM = 15
+# Upper bound on cells enumerated for one bounding box before scanning the level instead
+MAX_COVER_CELLS = 4096
+
+
+def geohash_encode(latitude, longitude, precision=MAX_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value_range, value = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """(lat_height, lon_width) in degrees of a geohash cell"""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def zoom_to_precision(zoom):
+    """Pick a cell size that yields a screenful of clusters at a web-map zoom level"""
+    if zoom <= 2:
+        return 1
+    if zoom <= 4:
+        return 2
+    if zoom <= 6:
+        return 3
+    if zoom <= 9:
+        return 4
+    if zoom <= 11:
+        return 5
+    if zoom <= 13:
+        return 6
+    return 7
+
+
+def covering_cells(south, west, north, east, precision):
+    """Geohashes of every cell intersecting the bounding box, or None if there are too many"""
+    height, width = cell_size(precision)
+    rows = int(math.floor((north + 90) / height) - math.floor((south + 90) / height)) + 1
+    cols = int(math.floor((east + 180) / width) - math.floor((west + 180) / width)) + 1
+    if rows * cols > MAX_COVER_CELLS:
+        return None
+    first_lat = (math.floor((south + 90) / height) + 0.5) * height - 90
+    first_lon = (math.floor((west + 180) / width) + 0.5) * width - 180
+    cells = set()
+    for row in range(rows):
+        latitude = min(first_lat + row * height, 90.0 - height / 2)
+        for col in range(cols):
+            longitude = min(first_lon + col * width, 180.0 - width / 2)
+            cells.add(geohash_encode(latitude, longitude, precision))
+    return cells
+
+
+class _Cell:
+    __slots__ = ("count", "lat_sum", "lon_sum", "min_price", "max_price", "stale")
+
+    def __init__(self):
+        self.count = 0
+        self.lat_sum = 0.0
+        self.lon_sum = 0.0
+        self.min_price = None
+        self.max_price = None
+        self.stale = False
+
+
+class _GeoState:
+    def __init__(self):
+        self.points = {}  # listing_id -> (geohash, latitude, longitude, price)
+        self.levels = [dict() for _ in range(MAX_PRECISION + 1)]  # precision -> geohash -> _Cell
+        self.members = {}  # POINT_PRECISION geohash -> set of listing ids
+
+
+class ListingGeoIndex(listing_events.ListingIndex):
+    """Per-geohash-cell aggregates (count, centroid, min/max price) for every precision level.
+
+    Adding or removing a listing touches one cell per level. Min/max prices
+    cannot be decremented, so removing a cell's extreme price marks the cell
+    stale and it is recomputed from its own listings the next time it is read
+    (see _recompute).
+    Only active listings with coordinates are indexed.
+    """
+
+    columns = ("latitude", "longitude", "price", "status")
+
+    def _new_state(self):
+        return _GeoState()
+
+    def _discard(self, state, listing_id):
+        point = state.points.pop(listing_id, None)
+        if point is None:
+            return
+        geohash, latitude, longitude, price = point
+        for precision in range(1, MAX_PRECISION + 1):
+            prefix = geohash[:precision]
+            cell = state.levels[precision].get(prefix)
+            if cell is None:
+                continue
+            cell.count -= 1
+            if cell.count <= 0:
+                del state.levels[precision][prefix]
+                continue
+            cell.lat_sum -= latitude
+            cell.lon_sum -= longitude
+            if price is not None and (price == cell.min_price or price == cell.max_price):
+                cell.stale = True
+        members = state.members.get(geohash[:POINT_PRECISION])
+        if members is not None:
+            members.discard(listing_id)
+            if not members:
+                del state.members[geohash[:POINT_PRECISION]]
+
+    def _apply(self, state, row):
+        self._discard(state, row.id)
+        if row.latitude is None or row.longitude is None or (row.status or "active") != "active":
+            return
+        latitude, longitude = float(row.latitude), float(row.longitude)
+        price = float(row.price) if row.price is not None else None
+        geohash = geohash_encode(latitude, longitude)
+        state.points[row.id] = (geohash, latitude, longitude, price)
+        for precision in range(1, MAX_PRECISION + 1):
+            cell = state.levels[precision].setdefault(geohash[:precision], _Cell())
+            cell.count += 1
+            cell.lat_sum += latitude
+            cell.lon_sum += longitude
+            if price is not None:
+                if cell.min_price is None or price < cell.min_price:
+                    cell.min_price = price
+                if cell.max_price is None or price > cell.max_price:
+                    cell.max_price = price
+        state.members.setdefault(geohash[:POINT_PRECISION], set()).add(row.id)
+
+    def _recompute(self, state, prefix, cell):
+        """Restore a stale cell's price range from the cell's own contents, never the whole index.
+
+        Cells at POINT_PRECISION or finer read the listings of their member
+        set; coarser cells combine their (at most 32) child cells, recomputing
+        stale children first. A listing whose removal made a cell stale also
+        made every finer cell on its path stale, so fresh children are exact.
+        """
+        precision = len(prefix)
+        prices = []
+        if precision >= POINT_PRECISION:
+            for listing_id in state.members.get(prefix[:POINT_PRECISION], ()):
+                geohash, _, _, price = state.points[listing_id]
+                if price is not None and geohash.startswith(prefix):
+                    prices.append(price)
+        else:
+            children = state.levels[precision + 1]
+            for char in _BASE32:
+                child = children.get(prefix + char)
+                if child is None:
+                    continue
+                if child.stale:
+                    self._recompute(state, prefix + char, child)
+                if child.min_price is not None:
+                    prices.extend((child.min_price, child.max_price))
+        cell.min_price = min(prices) if prices else None
+        cell.max_price = max(prices) if prices else None
+        cell.stale = False
+
+    def clusters(self, session, south, west, north, east, zoom):
+        """Aggregated clusters for the cells intersecting the bounding box"""
+        self.ensure_current(session)
+        precision = zoom_to_precision(zoom)
+        cells = covering_cells(south, west, north, east, precision)
+        results = []
+        with self._lock:
+            state = self._state
+            level = state.levels[precision]
+            candidates = level.items() if cells is None else ((key, level[key]) for key in cells if key in level)
+            for geohash, cell in candidates:
+                latitude = cell.lat_sum / cell.count
+                longitude = cell.lon_sum / cell.count
+                if not (south <= latitude <= north and west <= longitude <= east):
+                    continue
+                if cell.stale:
+                    self._recompute(state, geohash, cell)
+                results.append({
+                    "geohash": geohash,
+                    "count": cell.count,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "min_price": cell.min_price,
+                    "max_price": cell.max_price
+                })
+        return results
+
+    def points(self, session, south, west, north, east, limit=500):
+        """Individual listing coordinates inside the bounding box (high zoom only)"""
+        self.ensure_current(session)
+        cells = covering_cells(south, west, north, east, POINT_PRECISION)
+        results = []
+        with self._lock:
+            state = self._state
+            keys = state.members.keys() if cells is None else cells
+            for key in keys:
+                for listing_id in state.members.get(key, ()):
+                    _, latitude, longitude, price = state.points[listing_id]
+                    if south <= latitude <= north and west <= longitude <= east:
+                        results.append({"id": listing_id, "latitude": latitude, "longitude": longitude, "price": price})
+                        if len(results) >= limit:
+                            return results
+        return results
+
+
+listing_geo_index = listing_events.register(ListingGeoIndex())
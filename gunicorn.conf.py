@@ -0,0 +1,70 @@
+# Gunicorn configuration for production: `gunicorn -c gunicorn.conf.py wsgi:app`
+# Every setting can be overridden from the environment; see config.engine_options() for the database pool.
+import multiprocessing
+import os
+
+from src.config import app_config
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+
+# Threaded workers: request threads overlap on DB and network I/O, processes scale across cores.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+
+# Connections this server may hold on the primary database, summed over workers. Leave the rest of MySQL's
+# max_connections (151 by default) for the payment worker, CLI commands and other hosts.
+connection_budget = int(os.environ.get("DB_CONNECTION_BUDGET", "100"))
+_pool = app_config()["SQLALCHEMY_ENGINE_OPTIONS"]
+connections_per_worker = _pool.get("pool_size", 0) + _pool.get("max_overflow", 0) # 0 for SQLite, which has no budget
+if "WEB_CONCURRENCY" in os.environ:
+    workers = int(os.environ["WEB_CONCURRENCY"])
+elif connections_per_worker:
+    workers = max(1, min(multiprocessing.cpu_count() * 2 + 1, connection_budget // connections_per_worker))
+else:
+    workers = multiprocessing.cpu_count() * 2 + 1
+if workers * connections_per_worker > connection_budget:
+    raise RuntimeError(f"{workers} workers x {connections_per_worker} connections (DB_POOL_SIZE + DB_MAX_OVERFLOW) "
+                       f"exceeds DB_CONNECTION_BUDGET={connection_budget}; lower WEB_CONCURRENCY or the pool size")
+os.environ["WEB_CONCURRENCY"] = str(workers) # Read by the app, e.g. to know whether its in-process response cache is shared
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+# On SIGTERM workers stop accepting connections and get this long to finish in-flight requests
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Workers are not recycled by default: a fresh worker reopens its pool and rebuilds the in-process listing
+# indexes from full table reads. Set GUNICORN_MAX_REQUESTS (with jitter) only to contain a memory leak.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# Import the app once in the master so workers fork with it loaded
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    # Any connection the master opened while loading the app must not be shared with forked workers;
+    # close=False leaves them for the master and gives this worker fresh pools.
+    from src.models.user import db
+
+    with server.app.wsgi().app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    # Runs after in-flight requests have drained: persist buffered ad counters and release resources
+    from src.models.user import db
+    from src.services.ad_counters import ad_counter_buffer
+    from src.services.password_hashing import password_hasher
+    from src.services.image_pipeline import image_pipeline
+
+    ad_counter_buffer.close()
+    password_hasher.shutdown()
+    image_pipeline.shutdown() # Waits for queued photo renders so their images are marked ready
+    with server.app.wsgi().app_context():
+        for engine in db.engines.values():
+            engine.dispose()
@@ -0,0 +1,221 @@
+# Listing photo uploads: content-addressed originals on disk, resized JPEG/WebP variants rendered in a process pool
+import atexit
+import hashlib
+import io
+import logging
+import os
+import threading
+
+from flask import abort, send_from_directory
+
+from src.models.listing_image import IMAGE_VARIANTS, IMAGE_VARIANT_FORMATS, ListingImage
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name -> file extension for the uploads we accept
+ACCEPTED_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+JPEG_QUALITY = 80
+WEBP_QUALITY = 75
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class InvalidImageError(ValueError):
+    """Raised for uploads that are not a readable JPEG/PNG/WebP within the size limits"""
+
+
+class ImagePipelineUnavailable(Exception):
+    """Raised when images cannot be processed right now (Pillow missing or the render queue is full)"""
+
+
+def _write_atomic(path, write):
+    # Readers only ever see complete files; concurrent renders of the same hash just replace each other
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(temporary_path)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def _write_bytes(path, data):
+    with open(path, "wb") as stream:
+        stream.write(data)
+
+
+def render_variants(directory, original_name, max_pixels):
+    """Render every variant of one original; runs in a worker process. Returns {filename: file size in bytes}.
+
+    Variants are re-encoded from pixels only, so the original's EXIF (GPS
+    position, camera serial), ICC and XMP metadata are not carried over.
+    """
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    largest_box = max(IMAGE_VARIANTS.values())
+    with Image.open(os.path.join(directory, original_name)) as original:
+        original.draft("RGB", largest_box) # JPEGs decode at a reduced scale when that is still big enough
+        image = ImageOps.exif_transpose(original)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+    sizes = {}
+    # Largest first, so each smaller variant is downscaled from the previous one rather than the full original
+    for variant, box in sorted(IMAGE_VARIANTS.items(), key=lambda item: item[1], reverse=True):
+        image = image.copy()
+        image.thumbnail(box, Image.LANCZOS)
+        for image_format in IMAGE_VARIANT_FORMATS:
+            filename = f"{variant}.{image_format}"
+            if image_format == "webp":
+                save = lambda path: image.save(path, "WEBP", quality=WEBP_QUALITY, method=4)
+            else:
+                save = lambda path: image.save(path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            _write_atomic(os.path.join(directory, filename), save)
+            sizes[filename] = os.path.getsize(os.path.join(directory, filename))
+    return sizes
+
+
+class ImagePipeline:
+    """Stores uploaded originals by SHA-256 and renders their variants in worker processes.
+
+    Files live under IMAGE_STORAGE_DIR as <hash[:2]>/<hash>/original.<ext>
+    next to thumb/card/detail variants in WebP and JPEG. Identical uploads share
+    one directory. At most IMAGE_MAX_QUEUE renders may be pending per app
+    worker; beyond that uploads are refused with ImagePipelineUnavailable rather
+    than queued without bound. When a render finishes the image is marked ready
+    and, for a cover image, the listing's main_image_url points at the card
+    variant so search pages stop downloading full-size originals.
+    """
+
+    def __init__(self, storage_dir=None, max_workers=2, max_queue=32, max_upload_bytes=15 * 1024 * 1024, max_pixels=40_000_000):
+        self.storage_dir = storage_dir
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_upload_bytes = max_upload_bytes
+        self.max_pixels = max_pixels
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._app = None
+
+    def init_app(self, app):
+        self._app = app
+        self.storage_dir = app.config.get("IMAGE_STORAGE_DIR") or os.path.join(app.static_folder, "media", "images")
+        self.max_workers = app.config.get("IMAGE_WORKERS", self.max_workers)
+        self.max_queue = app.config.get("IMAGE_MAX_QUEUE", self.max_queue)
+        self.max_upload_bytes = app.config.get("IMAGE_MAX_UPLOAD_BYTES", self.max_upload_bytes)
+        self.max_pixels = app.config.get("IMAGE_MAX_PIXELS", self.max_pixels)
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        atexit.register(self.shutdown)
+
+    def _get_executor(self):
+        # A pool inherited through fork is unusable, so each worker process creates its own
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    from concurrent.futures import ProcessPoolExecutor # Deferred: only needed once an image is uploaded
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def directory(self, content_hash):
+        return os.path.join(self.storage_dir, content_hash[:2], content_hash)
+
+    def store_original(self, data):
+        """Validate an upload and write it to disk; returns the ListingImage column values"""
+        if len(data) > self.max_upload_bytes:
+            raise InvalidImageError(f"Images may be at most {self.max_upload_bytes // (1024 * 1024)} MB")
+        try:
+            from PIL import Image, UnidentifiedImageError
+        except ImportError:
+            raise ImagePipelineUnavailable("Image processing is not available (Pillow is not installed)")
+
+        try:
+            with Image.open(io.BytesIO(data)) as image: # Reads the header only; pixels are decoded in the worker
+                image_format, (width, height) = image.format, image.size
+        except (UnidentifiedImageError, OSError):
+            raise InvalidImageError("Unrecognized image file")
+        if image_format not in ACCEPTED_FORMATS:
+            raise InvalidImageError("Images must be JPEG, PNG or WebP")
+        if width * height > self.max_pixels:
+            raise InvalidImageError(f"Images may be at most {self.max_pixels // 1_000_000} megapixels")
+
+        content_hash = hashlib.sha256(data).hexdigest()
+        extension = ACCEPTED_FORMATS[image_format]
+        directory = self.directory(content_hash)
+        original_path = os.path.join(directory, f"original.{extension}")
+        if not os.path.exists(original_path):
+            os.makedirs(directory, exist_ok=True)
+            _write_atomic(original_path, lambda path: _write_bytes(path, data))
+        return {"content_hash": content_hash, "original_format": extension, "width": width, "height": height, "byte_size": len(data)}
+
+    def variants_exist(self, content_hash):
+        directory = self.directory(content_hash)
+        return all(os.path.exists(os.path.join(directory, f"{variant}.{image_format}"))
+                   for variant in IMAGE_VARIANTS for image_format in IMAGE_VARIANT_FORMATS)
+
+    def render(self, image):
+        """Queue variant rendering for a committed ListingImage; returns the Future"""
+        if not self._slots.acquire(blocking=False):
+            raise ImagePipelineUnavailable("Too many images are being processed; retry shortly")
+        image_id = image.id
+        try:
+            future = self._get_executor().submit(
+                render_variants, self.directory(image.content_hash), f"original.{image.original_format}", self.max_pixels
+            )
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda done: self._finished(image_id, done))
+        return future
+
+    def _finished(self, image_id, future):
+        self._slots.release()
+        error = future.exception()
+        if error is not None:
+            logger.error("Rendering variants of listing image %s failed: %r", image_id, error)
+        try:
+            with self._app.app_context():
+                self.mark_rendered(image_id, ok=error is None)
+        except Exception:
+            logger.exception("Could not record the render result of listing image %s", image_id)
+
+    def mark_rendered(self, image_id, ok=True):
+        """Record a finished render; a ready cover image becomes the listing's main_image_url"""
+        from src.models.user import db
+        from src.models.listing import Listing
+        from src.services import listing_events
+
+        image = db.session.get(ListingImage, image_id)
+        if image is None: # Deleted while rendering
+            return
+        image.status = "ready" if ok else "failed"
+        listing = db.session.get(Listing, image.listing_id)
+        if ok and image.position == 0 and listing is not None:
+            listing.main_image_url = image.variant_url("card")
+        db.session.commit()
+        if listing is not None:
+            listing_events.listing_saved(listing) # Also refreshes the cached detail page and its image list
+
+    def send(self, path):
+        """Serve a stored variant; its URL contains the content hash, so browsers may cache it forever"""
+        if os.path.basename(path).startswith("original."):
+            abort(404) # Originals are kept as uploaded, metadata included, and are never served
+        response = send_from_directory(self.storage_dir, path, max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+image_pipeline = ImagePipeline()
@@ -0,0 +1,67 @@
+# Flask JSON provider: orjson when installed, with Decimal and datetime encoded the same way either way
+import datetime
+import decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError: # Optional speedup; the stdlib encoder produces equivalent JSON
+    orjson = None
+
+
+def _default(value):
+    """Encodings for types JSON lacks: Decimal as its exact string, dates as ISO 8601"""
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value) # UUIDs, dataclasses, __html__
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's encoder, but with ISO 8601 dates instead of HTTP dates"""
+
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """Encodes responses with orjson, several times faster than json.dumps on listing pages.
+
+    Keys are sorted and output is compact, as with Flask's default provider;
+    non-ASCII text is sent as UTF-8 rather than \\u escapes. Anything orjson
+    rejects (e.g. integers beyond 64 bits) falls back to the stdlib encoder.
+    """
+
+    def _option(self):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self._app.debug and self.compact is None or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _dumps_bytes(self, obj):
+        try:
+            return orjson.dumps(obj, default=_default, option=self._option())
+        except TypeError:
+            return super().dumps(obj).encode("utf-8")
+
+    def dumps(self, obj, **kwargs):
+        if kwargs: # json.dumps-only options such as cls or indent
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Build the body as bytes directly instead of str -> bytes
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+def json_provider_class():
+    return OrjsonProvider if orjson is not None else StdlibJSONProvider
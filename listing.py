@@ -1,15 +1,31 @@
 # Listing Routes (CRUD operations for Listings)
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity # Assuming flask_jwt_extended for JWT
-from sqlalchemy import or_, and_
+from sqlalchemy import select
 import os
 import sys
-from datetime import datetime # Added for payment_date and tier_expiry_date
+from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.models.user import User
 from src.models.listing import Listing
+from src.models.listing_duplicate import ListingDuplicate
+from src.models.listing_image import ListingImage
+from src.services.pagination import keyset_paginate, parse_per_page, listing_count_cache, InvalidCursorError
+from src.services.search_index import listing_search_index
+from src.services.geo_index import listing_geo_index, POINT_ZOOM
+from src.services.listing_facets import listing_facet_index, compute_facets, facet_rows
+from src.services.listing_serializer import parse_fields, listing_query_options, serialize_listings
+from src.services import listing_events
+from src.services.response_cache import response_cache
+from src.services.db_routing import read_only # Routes read-only views to replicas
+from src.services.listing_validation import normalize_listing_fields, ListingValidationError
+from src.services import listing_dedup # Registers duplicate detection on listing writes
+from src.services import search_percolator # Registers saved-search matching on listing writes
+from src.services.featured_ranking import featured_ranking, PLACEMENTS
+from src.services.image_pipeline import image_pipeline, InvalidImageError, ImagePipelineUnavailable
+from src.services.listing_export import EXPORT_FORMATS, export_fields, export_result, export_chunks
 # from main import db # db will be imported from main.py to avoid circular imports
 
 # Placeholder for db.session, will be properly linked from main.py
@@ -76,12 +92,173 @@ class QueryPlaceholder:
         return []
 
 # Assign the placeholder query to Listing if db is not fully initialized
-if not hasattr(Listing, 'query'):
+if 'query' not in dir(Listing): # dir() avoids evaluating Flask-SQLAlchemy's query property, which needs an app context
     Listing.query = QueryPlaceholder(Listing)
 
 
 listing_bp = Blueprint("listing_bp", __name__)
 
+class _ListingResponseCacheInvalidator:
+    """Drops cached list pages and the affected detail page whenever a listing is written"""
+
+    def listing_saved(self, listing):
+        response_cache.invalidate("listings", f"listing:{listing.id}")
+
+    def listing_deleted(self, listing_id):
+        response_cache.invalidate("listings", f"listing:{listing_id}")
+
+    def listings_changed(self, listing_ids):
+        response_cache.invalidate("listings", *(f"listing:{listing_id}" for listing_id in listing_ids))
+
+listing_events.register(_ListingResponseCacheInvalidator())
+
+@listing_bp.errorhandler(ImagePipelineUnavailable)
+def image_pipeline_unavailable(e):
+    response = jsonify({"message": str(e)})
+    response.headers["Retry-After"] = "5"
+    return response, 503
+
+def _featured_scope():
+    """The city/province args as the stored names they are substrings of, for FeaturedRanking.ranked_ids"""
+    scope = {}
+    for facet in ("city", "province"):
+        if request.args.get(facet):
+            scope[facet] = listing_facet_index.values(db_placeholder.session, facet, request.args.get(facet))
+    return scope
+
+def _featured_listings(query, fields, search_text=None):
+    """Promoted listings matching the search, shown above its first page.
+
+    Candidates come from the featured ranking (narrowed to the cities or
+    provinces the filters name) a window at a time. Each window is checked
+    against the search text in the search index and against the remaining
+    filters in SQL, so the cost depends on the number of slots rather than on
+    how many listings match the search.
+    """
+    slots = current_app.config.get("FEATURED_SEARCH_SLOTS", 3)
+    if slots <= 0:
+        return []
+    window = slots * 4
+    scope = _featured_scope()
+    featured_ids = []
+    for attempt in range(3):
+        candidates = featured_ranking.ranked_ids(db_placeholder.session, "search", limit=window, offset=attempt * window, **scope)
+        checked = listing_search_index.matching(db_placeholder.session, search_text, candidates) if search_text else candidates
+        if checked:
+            matching = {row.id for row in query.with_entities(Listing.id).filter(Listing.id.in_(checked))}
+            featured_ids.extend(listing_id for listing_id in checked if listing_id in matching)
+        if len(featured_ids) >= slots or len(candidates) < window:
+            break
+    featured_ids = featured_ids[:slots]
+    if not featured_ids:
+        return []
+    by_id = {listing.id: listing for listing in Listing.query.options(*listing_query_options(fields)).filter(Listing.id.in_(featured_ids))}
+    return serialize_listings([by_id[listing_id] for listing_id in featured_ids if listing_id in by_id], fields)
+
+def _paginated_listings(query, count_key, message, with_featured=False):
+    """Run a listing query in offset (default) or keyset mode based on the request args.
+
+    Keyset mode is opt-in with `pagination=cursor` or a `cursor` token. In that mode
+    totals are skipped unless `include_total=true`, in which case a cached
+    approximate count is returned. `fields=card` (or a comma-separated list)
+    projects the listings down to the named fields. With `with_featured`, the
+    first page also carries the promoted listings that match (`featured`).
+    """
+    try:
+        fields = parse_fields(request.args.get("fields"))
+        per_page = parse_per_page(request.args.get("per_page"))
+    except ValueError as e: # Unknown fields, or per_page outside 1..MAX_PER_PAGE
+        return jsonify({"message": str(e)}), 400
+    cursor = request.args.get("cursor")
+    cursor_mode = request.args.get("pagination") == "cursor" or bool(cursor)
+    page_query = query.options(*listing_query_options(fields))
+
+    if cursor_mode:
+        include_total = request.args.get("include_total", "false").lower() == "true"
+        try:
+            items, next_cursor = keyset_paginate(page_query, Listing, per_page, cursor)
+        except InvalidCursorError:
+            return jsonify({"message": "Invalid cursor"}), 400
+        response = {
+            "message": message,
+            "listings": serialize_listings(items, fields),
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
+        if with_featured and not cursor:
+            response["featured"] = _featured_listings(query, fields)
+        if include_total:
+            response["total_listings"] = listing_count_cache.get_or_count(count_key, query)
+            response["total_is_approximate"] = True
+        return jsonify(response), 200
+
+    page = request.args.get("page", 1, type=int)
+    include_total = request.args.get("include_total", "true").lower() == "true"
+    paginated_listings = page_query.order_by(Listing.date_posted.desc()).paginate(page=page, per_page=per_page, error_out=False, count=include_total)
+    results = serialize_listings(paginated_listings.items, fields)
+    response = {
+        "message": message,
+        "listings": results,
+        "total_pages": paginated_listings.pages if include_total else None,
+        "current_page": paginated_listings.page,
+        "total_listings": paginated_listings.total
+    }
+    if with_featured and page <= 1:
+        response["featured"] = _featured_listings(query, fields)
+    return jsonify(response), 200
+
+
+def _ranked_listings(query, ranked, has_filters, message):
+    """Page through search results in relevance order.
+
+    `ranked` comes from the search index; any other filters are applied in SQL
+    against the ranked ids in chunks, stopping once the requested page (and
+    one more match, for has_more) has been found, so a page costs about as
+    many chunks as it is deep. When the walk stops early the total is
+    estimated from the share of checked ids that matched
+    (`total_is_approximate`). The first page also carries the promoted
+    listings that match the search.
+    """
+    try:
+        fields = parse_fields(request.args.get("fields"))
+        per_page = parse_per_page(request.args.get("per_page"))
+    except ValueError as e: # Unknown fields, or per_page outside 1..MAX_PER_PAGE
+        return jsonify({"message": str(e)}), 400
+    page = max(request.args.get("page", 1, type=int), 1)
+    search_ids = [listing_id for listing_id, _ in ranked]
+    ranked_ids = search_ids
+    total, total_is_approximate = len(search_ids), False
+
+    if has_filters:
+        wanted = page * per_page + 1
+        ranked_ids = []
+        checked = 0
+        while checked < len(search_ids) and len(ranked_ids) < wanted:
+            chunk = search_ids[checked:checked + 500]
+            matching = {row.id for row in query.with_entities(Listing.id).filter(Listing.id.in_(chunk))}
+            ranked_ids.extend(listing_id for listing_id in chunk if listing_id in matching)
+            checked += len(chunk)
+        total = len(ranked_ids)
+        if checked < len(search_ids):
+            total = max(total, round(len(ranked_ids) * len(search_ids) / checked))
+            total_is_approximate = True
+
+    page_ids = ranked_ids[(page - 1) * per_page:page * per_page]
+    page_query = Listing.query.options(*listing_query_options(fields)).filter(Listing.id.in_(page_ids))
+    by_id = {listing.id: listing for listing in page_query} if page_ids else {}
+    results = serialize_listings([by_id[listing_id] for listing_id in page_ids if listing_id in by_id], fields)
+    response = {
+        "message": message,
+        "listings": results,
+        "total_pages": (total + per_page - 1) // per_page,
+        "current_page": page,
+        "total_listings": total,
+        "total_is_approximate": total_is_approximate
+    }
+    if page == 1:
+        response["featured"] = _featured_listings(query, fields, search_text=request.args.get("search"))
+    return jsonify(response), 200
+
 @listing_bp.route("/listings/my-listings", methods=["GET"])
 @jwt_required()
 def get_my_listings():
@@ -89,20 +266,9 @@ def get_my_listings():
     if not current_user_id:
         return jsonify({"message": "Authentication required"}), 401
 
-    page = request.args.get("page", 1, type=int)
-    per_page = request.args.get("per_page", 10, type=int)
-
     if db_placeholder.session: # In a real app, this would be `db.session`
-        query = Listing.query.filter_by(user_id=current_user_id).order_by(Listing.date_posted.desc())
-        paginated_listings = query.paginate(page=page, per_page=per_page, error_out=False)
-        results = [listing.to_dict() for listing in paginated_listings.items]
-        return jsonify({
-            "message": "User listings retrieved successfully",
-            "listings": results,
-            "total_pages": paginated_listings.pages,
-            "current_page": paginated_listings.page,
-            "total_listings": paginated_listings.total
-        }), 200
+        query = Listing.query.filter_by(user_id=current_user_id)
+        return _paginated_listings(query, ("user", current_user_id), "User listings retrieved successfully")
     else:
         print(f"Simulating fetching listings for user_id: {current_user_id}")
         # Simulate some listings for the current user
@@ -127,113 +293,220 @@ def create_listing():
     if not current_user_id:
         return jsonify({"message": "Authentication required"}), 401
 
-    required_fields = ["title", "price", "address"]
-    if not all(field in data for field in required_fields):
-        return jsonify({"message": f"Missing required fields: {', '.join(required_fields)}"}), 400
-    
     try:
-        price = float(data["price"])
-        if price <= 0:
-            return jsonify({"message": "Price must be a positive number"}), 400
-    except ValueError:
-        return jsonify({"message": "Invalid price format"}), 400
+        values = normalize_listing_fields(data or {})
+    except ListingValidationError as e:
+        return jsonify({"message": str(e)}), 400
 
     new_listing = Listing(
-        title=data["title"],
-        price=price,
-        address=data["address"],
         user_id=current_user_id,
-        description=data.get("description"),
-        city=data.get("city"),
-        province=data.get("province"),
-        postal_code=data.get("postal_code"),
-        latitude=data.get("latitude"),
-        longitude=data.get("longitude"),
-        bedrooms=data.get("bedrooms"),
-        bathrooms=data.get("bathrooms"),
-        property_type=data.get("property_type"),
-        area_sqm=data.get("area_sqm"),
-        main_image_url=data.get("main_image_url"),
         source='manual',
-        status=data.get("status", "active"),
-        # Monetization fields
-        is_charged_listing=data.get("is_charged_listing", False),
-        listing_tier=data.get("listing_tier"), # e.g., standard, premium
-        payment_status=data.get("payment_status"),
-        transaction_id=data.get("transaction_id"),
-        payment_date=datetime.fromisoformat(data["payment_date"]) if data.get("payment_date") else None,
-        tier_expiry_date=datetime.fromisoformat(data["tier_expiry_date"]) if data.get("tier_expiry_date") else None
+        **values
+        # Monetization fields (tier, payment status, dates) are only set by activate_tier and the payment worker
     )
 
     if db_placeholder.session: # In a real app, this would be `db.session`
         db_placeholder.session.add(new_listing)
         db_placeholder.session.commit()
+        listing_events.listing_saved(new_listing)
         return jsonify({"message": "Listing created successfully", "listing": new_listing.to_dict()}), 201
     else:
         print(f"Simulating listing creation: {new_listing.to_dict()}")
         return jsonify({"message": "Listing creation simulated (DB not fully initialized)", "listing": new_listing.to_dict()}), 201
 
-@listing_bp.route("/listings", methods=["GET"])
-def get_listings():
-    page = request.args.get("page", 1, type=int)
-    per_page = request.args.get("per_page", 10, type=int)
-    
+# Query args that narrow get_listings and facet results; anything else (fields, page, cache-busters) does not
+LISTING_FILTER_ARGS = ("city", "province", "property_type", "min_price", "max_price", "bedrooms", "listing_tier", "search", "collapse_duplicates")
+
+def _filter_args():
+    """The LISTING_FILTER_ARGS the request actually filters by"""
+    return [key for key in LISTING_FILTER_ARGS if request.args.get(key)
+            and (key != "collapse_duplicates" or request.args.get(key).lower() == "true")]
+
+def _listing_filters():
+    """SQL filters for the get_listings query args; returns (filters, None) or (None, error response)"""
     filters = []
     if request.args.get("city"):
         filters.append(Listing.city.ilike(f"%{request.args.get('city')}%" ) )
     if request.args.get("province"):
-        filters.append(Listing.province.ilike(f"%{request.args.get('province')}%" ) )
+        province = request.args.get("province")
+        if db_placeholder.session:
+            # There are only a handful of provinces, so the substring is resolved to the stored values and the
+            # IN uses ix_listings_province_date_posted; a value first written by another worker is picked up on its refresh
+            filters.append(Listing.province.in_(listing_facet_index.values(db_placeholder.session, "province", province)))
+        else:
+            filters.append(Listing.province.ilike(f"%{province}%"))
     if request.args.get("property_type"):
         filters.append(Listing.property_type == request.args.get("property_type"))
     if request.args.get("min_price"):
         try:
             filters.append(Listing.price >= float(request.args.get("min_price")))
         except ValueError:
-            return jsonify({"message": "Invalid min_price format"}), 400
+            return None, (jsonify({"message": "Invalid min_price format"}), 400)
     if request.args.get("max_price"):
         try:
             filters.append(Listing.price <= float(request.args.get("max_price")))
         except ValueError:
-            return jsonify({"message": "Invalid max_price format"}), 400
+            return None, (jsonify({"message": "Invalid max_price format"}), 400)
     if request.args.get("bedrooms"):
         try:
             filters.append(Listing.bedrooms == int(request.args.get("bedrooms")))
         except ValueError:
-            return jsonify({"message": "Invalid bedrooms format"}), 400
+            return None, (jsonify({"message": "Invalid bedrooms format"}), 400)
     if request.args.get("listing_tier"):
         filters.append(Listing.listing_tier == request.args.get("listing_tier"))
-    
+    if request.args.get("collapse_duplicates", "false").lower() == "true":
+        # Only show the canonical listing of each group of cross-source duplicates
+        filters.append(~Listing.id.in_(select(ListingDuplicate.listing_id)))
+    return filters, None
+
+@listing_bp.route("/listings", methods=["GET"])
+@response_cache.cached(lambda: ["listings"], lowercase_args=("city", "province", "search"))
+@read_only
+def get_listings():
+    filters, error = _listing_filters()
+    if error:
+        return error
+
     search_query = request.args.get("search")
-    if search_query:
-        search_term = f"%{search_query}%"
-        filters.append(or_(Listing.title.ilike(search_term), Listing.description.ilike(search_term)))
 
     if db_placeholder.session: # In a real app, this would be `db.session`
         query = Listing.query
         if filters:
             query = query.filter(*filters) 
-            
-        query = query.order_by(Listing.date_posted.desc())
-        paginated_listings = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        results = [listing.to_dict() for listing in paginated_listings.items]
-        return jsonify({
-            "message": "Listings retrieved successfully",
-            "listings": results,
-            "total_pages": paginated_listings.pages,
-            "current_page": paginated_listings.page,
-            "total_listings": paginated_listings.total
-        }), 200
+
+        if search_query:
+            ranked = listing_search_index.search(db_placeholder.session, search_query)
+            return _ranked_listings(query, ranked, bool(filters), "Listings retrieved successfully")
+
+        count_key = ("search",) + tuple((key, request.args.get(key)) for key in _filter_args())
+        return _paginated_listings(query, count_key, "Listings retrieved successfully", with_featured=True)
     else:
         print(f"Simulating fetching listings with filters: {filters}")
         return jsonify({"message": "Listing retrieval simulated (DB not fully initialized)", "listings": []}), 200
 
+@listing_bp.route("/facets", methods=["GET"])
+@response_cache.cached(lambda: ["listings"], lowercase_args=("city", "province", "search"))
+@read_only
+def get_listing_facets():
+    """Counts by city, province, property_type, bedrooms, price band and status for the get_listings filters"""
+    filters, error = _listing_filters()
+    if error:
+        return error
+
+    if db_placeholder.session: # In a real app, this would be `db.session`
+        city = request.args.get("city")
+        other_args = [key for key in _filter_args() if key != "city"]
+        if not other_args and not (city and ("%" in city or "_" in city)):
+            # Unfiltered and city-only facets come from the incrementally maintained counters
+            facets = listing_facet_index.facets(db_placeholder.session, city)
+            return jsonify(dict(facets, message="Facets retrieved successfully")), 200
+
+        query = Listing.query.filter(*filters)
+        search_query = request.args.get("search")
+        listing_ids = None
+        if search_query:
+            listing_ids = [listing_id for listing_id, _ in listing_search_index.search(db_placeholder.session, search_query)]
+        facets = compute_facets(facet_rows(query, listing_ids))
+        return jsonify(dict(facets, message="Facets retrieved successfully")), 200
+    else:
+        print(f"Simulating facet counts with filters: {filters}")
+        return jsonify({"message": "Facet retrieval simulated (DB not fully initialized)", "total_listings": 0, "facets": {}}), 200
+
+@listing_bp.route("/export", methods=["GET"])
+@jwt_required()
+@read_only
+def export_listings():
+    """Stream listings as CSV or NDJSON: ?format=csv|ndjson&fields=...&scope=mine|all plus the search filters.
+
+    Owners export their own listings; users listed in ADMIN_USER_IDS may pass scope=all for the whole table.
+    """
+    current_user_id = get_jwt_identity()
+    if not current_user_id:
+        return jsonify({"message": "Authentication required"}), 401
+    export_format = request.args.get("format", "csv").lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"message": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    scope = request.args.get("scope", "mine").lower()
+    if scope not in ("mine", "all"):
+        return jsonify({"message": "scope must be 'mine' or 'all'"}), 400
+    if scope == "all" and int(current_user_id) not in current_app.config.get("ADMIN_USER_IDS", ()): # Identities are strings, the ids ints
+        return jsonify({"message": "Forbidden: exporting all listings requires an admin account"}), 403
+    try:
+        fields = export_fields(request.args.get("fields"))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    filters, error = _listing_filters()
+    if error:
+        return error
+
+    if db_placeholder.session: # In a real app, this would be `db.session`
+        # Executed here so the query runs on a read replica; the rows are fetched while the response streams
+        result = export_result(db_placeholder.session, fields, filters, user_id=None if scope == "all" else current_user_id,
+                               chunk_size=current_app.config.get("EXPORT_CHUNK_SIZE", 1000))
+        filename = f"listings-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+        return Response(stream_with_context(export_chunks(result, fields, export_format)), mimetype=EXPORT_FORMATS[export_format],
+                        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"})
+    else:
+        print(f"Simulating {export_format} export for user_id: {current_user_id}, scope: {scope}")
+        return jsonify({"message": "Listing export simulated (DB not fully initialized)"}), 200
+
+@listing_bp.route("/featured", methods=["GET"])
+@response_cache.cached(lambda: ["listings"], lowercase_args=("city", "province"))
+@read_only
+def get_featured_listings():
+    """Promoted listings in ranking order: ?placement=homepage|search&city=&province=&limit=12&offset=0&fields=card"""
+    placement = request.args.get("placement", "homepage")
+    if placement not in PLACEMENTS:
+        return jsonify({"message": f"placement must be one of: {', '.join(PLACEMENTS)}"}), 400
+    try:
+        fields = parse_fields(request.args.get("fields", "card"))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    limit = min(max(request.args.get("limit", 12, type=int), 1), 50)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+
+    if db_placeholder.session: # In a real app, this would be `db.session`
+        featured_ids = featured_ranking.ranked_ids(db_placeholder.session, placement, limit=limit, offset=offset, **_featured_scope())
+        by_id = {listing.id: listing for listing in Listing.query.options(*listing_query_options(fields)).filter(Listing.id.in_(featured_ids))} if featured_ids else {}
+        listings = serialize_listings([by_id[listing_id] for listing_id in featured_ids if listing_id in by_id], fields)
+        return jsonify({"message": "Featured listings retrieved successfully", "listings": listings}), 200
+    else:
+        print(f"Simulating featured listings for placement: {placement}")
+        return jsonify({"message": "Featured listing retrieval simulated (DB not fully initialized)", "listings": []}), 200
+
+@listing_bp.route("/map", methods=["GET"])
+@read_only
+def get_listing_map():
+    """Clusters (or individual points at high zoom) for a bounding box: ?bbox=west,south,east,north&zoom=12"""
+    try:
+        west, south, east, north = (float(value) for value in request.args.get("bbox", "").split(","))
+    except ValueError:
+        return jsonify({"message": "bbox must be west,south,east,north in decimal degrees"}), 400
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        return jsonify({"message": "Invalid bbox bounds"}), 400
+    zoom = request.args.get("zoom", type=int)
+    if zoom is None or not 0 <= zoom <= 22:
+        return jsonify({"message": "zoom must be an integer between 0 and 22"}), 400
+
+    if db_placeholder.session: # In a real app, this would be `db.session`
+        if zoom >= POINT_ZOOM:
+            points = listing_geo_index.points(db_placeholder.session, south, west, north, east)
+            return jsonify({"message": "Map points retrieved successfully", "zoom": zoom, "points": points}), 200
+        clusters = listing_geo_index.clusters(db_placeholder.session, south, west, north, east, zoom)
+        return jsonify({"message": "Map clusters retrieved successfully", "zoom": zoom, "clusters": clusters}), 200
+    else:
+        print(f"Simulating map clusters for bbox: {west},{south},{east},{north} at zoom {zoom}")
+        return jsonify({"message": "Map retrieval simulated (DB not fully initialized)", "zoom": zoom, "clusters": []}), 200
+
 @listing_bp.route("/listings/<int:listing_id>", methods=["GET"])
+@response_cache.cached(lambda listing_id: [f"listing:{listing_id}"])
+@read_only
 def get_listing_detail(listing_id):
     if db_placeholder.session: # In a real app, this would be `db.session`
         listing = Listing.query.get(listing_id)
         if listing:
-            return jsonify({"message": "Listing found", "listing": listing.to_dict()}), 200
+            images = ListingImage.query.filter_by(listing_id=listing_id).order_by(ListingImage.position, ListingImage.id).all()
+            return jsonify({"message": "Listing found", "listing": dict(listing.to_dict(), images=[image.to_dict() for image in images])}), 200
         return jsonify({"message": "Listing not found"}), 404
     else:
         print(f"Simulating fetching listing detail for ID: {listing_id}")
@@ -260,12 +533,12 @@ def update_listing(listing_id):
         if not listing:
             return jsonify({"message": "Listing not found"}), 404
 
-        if listing.user_id != current_user_id:
+        if listing.user_id != int(current_user_id): # Identities are strings, the ids ints
             return jsonify({"message": "Forbidden: You do not own this listing"}), 403
 
         data = request.get_json()
         
-        for field in ["title", "description", "address", "city", "province", "postal_code", "latitude", "longitude", "property_type", "main_image_url", "status", "listing_tier", "payment_status", "transaction_id"]:
+        for field in ["title", "description", "address", "city", "province", "postal_code", "latitude", "longitude", "property_type", "main_image_url", "status"]: # Not the monetization fields: only payments change those
             if field in data:
                 setattr(listing, field, data[field])
         if "price" in data:
@@ -281,23 +554,85 @@ def update_listing(listing_id):
             listing.bathrooms = data.get("bathrooms")
         if "area_sqm" in data:
             listing.area_sqm = data.get("area_sqm")
-        if "is_charged_listing" in data:
-            listing.is_charged_listing = data.get("is_charged_listing", False)
-        if "payment_date" in data:
-            listing.payment_date = datetime.fromisoformat(data["payment_date"]) if data["payment_date"] else None
-        if "tier_expiry_date" in data:
-            listing.tier_expiry_date = datetime.fromisoformat(data["tier_expiry_date"]) if data["tier_expiry_date"] else None
 
         db_placeholder.session.commit()
+        listing_events.listing_saved(listing)
         return jsonify({"message": "Listing updated successfully", "listing": listing.to_dict()}), 200
     else:
         print(f"Simulating update for listing ID: {listing_id}")
         # Simulate finding the listing to check ownership for placeholder
         listing_owner_id = 1 # Assume listing with ID listing_id is owned by user 1 for simulation
-        if listing_owner_id != current_user_id:
+        if listing_owner_id != int(current_user_id):
              return jsonify({"message": "Forbidden: You do not own this listing (Simulated)"}), 403
         return jsonify({"message": "Listing update simulated (DB not fully initialized)"}), 200
 
+@listing_bp.route("/listings/<int:listing_id>/images", methods=["POST"])
+@jwt_required()
+def upload_listing_image(listing_id):
+    """Attach a photo (multipart field `image`); its resized variants are rendered in the background"""
+    current_user_id = get_jwt_identity()
+    if not current_user_id:
+        return jsonify({"message": "Authentication required"}), 401
+    upload = request.files.get("image")
+    if upload is None:
+        return jsonify({"message": "An image file is required (multipart field 'image')"}), 400
+
+    if db_placeholder.session: # In a real app, this would be `db.session`
+        listing = Listing.query.get(listing_id)
+        if not listing:
+            return jsonify({"message": "Listing not found"}), 404
+        if listing.user_id != int(current_user_id): # Identities are strings, the ids ints
+            return jsonify({"message": "Forbidden: You do not own this listing"}), 403
+
+        try:
+            stored = image_pipeline.store_original(upload.stream.read(image_pipeline.max_upload_bytes + 1))
+        except InvalidImageError as e:
+            return jsonify({"message": str(e)}), 400
+        position = ListingImage.query.filter_by(listing_id=listing_id).count()
+        image = ListingImage(listing_id=listing_id, position=position, **stored)
+        db_placeholder.session.add(image)
+        db_placeholder.session.commit()
+        try:
+            image_pipeline.render(image)
+        except ImagePipelineUnavailable:
+            db_placeholder.session.delete(image)
+            db_placeholder.session.commit()
+            raise
+        return jsonify({"message": "Image uploaded; variants are being generated", "image": image.to_dict()}), 202
+    else:
+        print(f"Simulating image upload for listing ID: {listing_id}")
+        return jsonify({"message": "Image upload simulated (DB not fully initialized)"}), 202
+
+@listing_bp.route("/listings/<int:listing_id>/images/<int:image_id>", methods=["DELETE"])
+@jwt_required()
+def delete_listing_image(listing_id, image_id):
+    current_user_id = get_jwt_identity()
+    if not current_user_id:
+        return jsonify({"message": "Authentication required"}), 401
+
+    if db_placeholder.session: # In a real app, this would be `db.session`
+        listing = Listing.query.get(listing_id)
+        image = db_placeholder.session.get(ListingImage, image_id)
+        if not listing or not image or image.listing_id != listing_id:
+            return jsonify({"message": "Image not found"}), 404
+        if listing.user_id != int(current_user_id): # Identities are strings, the ids ints
+            return jsonify({"message": "Forbidden: You do not own this listing"}), 403
+
+        # Files stay on disk: they are content-addressed and may be shared with other listings
+        db_placeholder.session.delete(image)
+        remaining = ListingImage.query.filter(ListingImage.listing_id == listing_id, ListingImage.id != image_id).order_by(ListingImage.position, ListingImage.id).all()
+        for position, other in enumerate(remaining):
+            other.position = position
+        if image.position == 0:
+            cover = remaining[0] if remaining and remaining[0].status == "ready" else None
+            listing.main_image_url = cover.variant_url("card") if cover else None
+        db_placeholder.session.commit()
+        listing_events.listing_saved(listing)
+        return jsonify({"message": "Image deleted successfully"}), 200
+    else:
+        print(f"Simulating image deletion {image_id} for listing ID: {listing_id}")
+        return jsonify({"message": "Image deletion simulated (DB not fully initialized)"}), 200
+
 @listing_bp.route("/listings/<int:listing_id>", methods=["DELETE"])
 @jwt_required()
 def delete_listing(listing_id):
@@ -310,17 +645,18 @@ def delete_listing(listing_id):
         if not listing:
             return jsonify({"message": "Listing not found"}), 404
 
-        if listing.user_id != current_user_id:
+        if listing.user_id != int(current_user_id): # Identities are strings, the ids ints
             return jsonify({"message": "Forbidden: You do not own this listing"}), 403
 
         db_placeholder.session.delete(listing)
         db_placeholder.session.commit()
+        listing_events.listing_deleted(listing_id)
         return jsonify({"message": "Listing deleted successfully"}), 200
     else:
         print(f"Simulating delete for listing ID: {listing_id}")
         # Simulate finding the listing to check ownership for placeholder
         listing_owner_id = 1 # Assume listing with ID listing_id is owned by user 1 for simulation
-        if listing_owner_id != current_user_id:
+        if listing_owner_id != int(current_user_id):
              return jsonify({"message": "Forbidden: You do not own this listing (Simulated)"}), 403
         return jsonify({"message": "Listing deletion simulated (DB not fully initialized)"}), 200
 
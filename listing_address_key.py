@@ -0,0 +1,22 @@
+# Listing Address Key Model (normalized address of each listing, for duplicate candidate lookups)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.user import db
+
+class ListingAddressKey(db.Model):
+    __tablename__ = 'listing_address_keys'
+
+    listing_id = db.Column(db.Integer, db.ForeignKey('listings.id', ondelete='CASCADE'), primary_key=True)
+    address_key = db.Column(db.String(255), nullable=False, index=True) # listing_dedup.normalize_address(address, city)
+
+    def __repr__(self):
+        return f'<ListingAddressKey {self.listing_id} {self.address_key!r}>'
+
+    def to_dict(self):
+        return {
+            'listing_id': self.listing_id,
+            'address_key': self.address_key
+        }
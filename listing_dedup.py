@@ -0,0 +1,373 @@
+# Duplicate-listing detection across sources (blocking + MinHash similarity)
+import functools
+import logging
+import math
+import random
+import re
+import zlib
+
+from sqlalchemy import and_, bindparam, or_, select, union
+from sqlalchemy.orm import Session, object_session
+
+from src.models.listing import Listing
+from src.models.listing_address_key import ListingAddressKey
+from src.models.listing_duplicate import ListingDuplicate
+from src.services import listing_events
+from src.services.geo_index import geohash_encode
+from src.services.search_index import fold_accents
+
+logger = logging.getLogger(__name__)
+
+# Minimum combined score for two listings to be treated as the same property
+DUPLICATE_THRESHOLD = 0.8
+# Prices within this ratio of each other can be duplicates (re-listed with a small change)
+PRICE_TOLERANCE = 0.15
+# Blocks larger than this (e.g. a whole apartment complex) are not compared pairwise
+MAX_BLOCK_SIZE = 50
+# Geohash precision used for coordinate blocking (~150m x 150m cells)
+GEO_BLOCK_PRECISION = 7
+# Length of ListingAddressKey.address_key
+ADDRESS_KEY_LENGTH = 255
+
+NUM_PERMUTATIONS = 32
+_MERSENNE_PRIME = (1 << 61) - 1
+_random = random.Random(20250512)
+_PERMUTATIONS = [(_random.randrange(1, _MERSENNE_PRIME), _random.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+_ADDRESS_ABBREVIATIONS = {
+    "street": "st", "road": "rd", "avenue": "ave", "drive": "dr", "crescent": "cres",
+    "lane": "ln", "close": "cl", "place": "pl", "boulevard": "blvd", "estate": "est",
+}
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Columns needed to block and score a listing
+FEATURE_COLUMNS = ("id", "source", "address", "city", "postal_code", "latitude", "longitude", "price",
+                   "description", "bedrooms", "bathrooms", "property_type")
+
+
+def normalize_address(address, city=None):
+    words = _WORD_RE.findall(fold_accents(f"{address or ''} {city or ''}"))
+    return " ".join(_ADDRESS_ABBREVIATIONS.get(word, word) for word in words)
+
+
+def address_key(address, city=None):
+    """The indexed ListingAddressKey value for an address, or None if it has no words"""
+    return normalize_address(address, city)[:ADDRESS_KEY_LENGTH] or None
+
+
+def minhash(text):
+    """MinHash signature of the word 3-shingles of a text (None if it has no shingles)"""
+    words = _WORD_RE.findall(fold_accents(text or ""))
+    if len(words) < 3:
+        return None
+    shingles = {zlib.crc32(" ".join(words[i:i + 3]).encode("utf-8")) for i in range(len(words) - 2)}
+    return tuple(min((a * shingle + b) % _MERSENNE_PRIME for shingle in shingles) for a, b in _PERMUTATIONS)
+
+
+def _price_bucket(price):
+    # Logarithmic buckets roughly PRICE_TOLERANCE wide
+    return int(math.log(float(price)) / math.log(1 + PRICE_TOLERANCE)) if price and price > 0 else None
+
+
+class ListingFeatures:
+    """Precomputed normalized fields of one listing used for blocking and scoring"""
+
+    def __init__(self, row):
+        self.id = row.id
+        self.source = row.source
+        self.price = float(row.price) if row.price is not None else None
+        self.address = normalize_address(row.address, row.city)
+        self.address_words = set(self.address.split())
+        self.address_key = self.address[:ADDRESS_KEY_LENGTH] or None
+        self.postal_code = (row.postal_code or "").strip().upper() or None
+        self.geohash = geohash_encode(row.latitude, row.longitude, GEO_BLOCK_PRECISION) if row.latitude is not None and row.longitude is not None else None
+        self.signature = minhash(getattr(row, "description", None))
+        self.bedrooms = row.bedrooms
+        self.bathrooms = float(row.bathrooms) if row.bathrooms is not None else None
+        self.property_type = (row.property_type or "").lower() or None
+
+    def blocking_keys(self):
+        """Keys under which candidate duplicates are grouped; any shared key makes a candidate pair"""
+        keys = []
+        if self.address:
+            keys.append(("address", self.address))
+        bucket = _price_bucket(self.price)
+        if bucket is not None:
+            # Register in the next bucket up too, so prices straddling a boundary still meet
+            for price_key in (bucket, bucket + 1):
+                if self.postal_code:
+                    keys.append(("postal", self.postal_code, price_key))
+                if self.geohash:
+                    keys.append(("geo", self.geohash, price_key))
+        return keys
+
+    def canonical_rank(self):
+        # Manually entered listings win over imported copies, then the oldest listing wins
+        return (self.source != "manual", self.id)
+
+
+def similarity(first, second):
+    """Weighted similarity in [0, 1] over the components both listings have"""
+    components = []
+    if first.address_words and second.address_words:
+        overlap = len(first.address_words & second.address_words) / len(first.address_words | second.address_words)
+        components.append((0.4, overlap))
+    if first.signature and second.signature:
+        matches = sum(1 for a, b in zip(first.signature, second.signature) if a == b)
+        components.append((0.35, matches / NUM_PERMUTATIONS))
+    if first.price and second.price:
+        components.append((0.15, max(0.0, 1 - abs(first.price - second.price) / max(first.price, second.price) / PRICE_TOLERANCE)))
+    attributes = [(first.bedrooms, second.bedrooms), (first.bathrooms, second.bathrooms), (first.property_type, second.property_type)]
+    compared = [(a, b) for a, b in attributes if a is not None and b is not None]
+    if compared:
+        components.append((0.1, sum(1 for a, b in compared if a == b) / len(compared)))
+    if first.geohash and second.geohash and first.geohash == second.geohash:
+        components.append((0.1, 1.0))
+
+    total_weight = sum(weight for weight, _ in components)
+    if total_weight < 0.5:
+        return 0.0 # Not enough shared information to call it a duplicate
+    return sum(weight * value for weight, value in components) / total_weight
+
+
+def _feature_query(session):
+    return session.query(*(getattr(Listing, column) for column in FEATURE_COLUMNS))
+
+
+class _DisjointSet:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        if parent != item:
+            parent = self.parent[item] = self.find(parent)
+        return parent
+
+    def union(self, first, second):
+        self.parent[self.find(first)] = self.find(second)
+
+
+def dedupe_all(session, chunk_size=1000):
+    """Recompute duplicate links for the whole table.
+
+    Pass 1 streams only the blocking columns and groups ids by blocking key.
+    Pass 2 loads full features for ids that share a block with someone else
+    and scores pairs inside each block, so work grows with block sizes rather
+    than quadratically with the table. Duplicate groups are merged
+    transitively and linked to their canonical listing. The address keys
+    check_listing looks candidates up by are rewritten from pass 1 as well.
+    """
+    blocks = {}
+    address_keys = []
+    blocking_columns = [getattr(Listing, column) for column in FEATURE_COLUMNS if column != "description"]
+    for row in session.query(*blocking_columns).yield_per(chunk_size):
+        row_features = ListingFeatures(row)
+        for key in row_features.blocking_keys():
+            blocks.setdefault(key, []).append(row.id)
+        if row_features.address_key:
+            address_keys.append({"listing_id": row.id, "address_key": row_features.address_key})
+
+    candidate_ids = set()
+    for ids in blocks.values():
+        if 1 < len(ids) <= MAX_BLOCK_SIZE:
+            candidate_ids.update(ids)
+
+    features = {}
+    candidate_list = sorted(candidate_ids)
+    for start in range(0, len(candidate_list), chunk_size):
+        chunk = candidate_list[start:start + chunk_size]
+        for row in _feature_query(session).filter(Listing.id.in_(chunk)):
+            features[row.id] = ListingFeatures(row)
+
+    groups = _DisjointSet()
+    best_scores = {}
+    compared = set()
+    for ids in blocks.values():
+        if not 1 < len(ids) <= MAX_BLOCK_SIZE:
+            continue
+        for i, first_id in enumerate(ids):
+            for second_id in ids[i + 1:]:
+                pair = (min(first_id, second_id), max(first_id, second_id))
+                if pair in compared or pair[0] == pair[1]:
+                    continue
+                compared.add(pair)
+                score = similarity(features[first_id], features[second_id])
+                if score >= DUPLICATE_THRESHOLD:
+                    groups.union(*pair)
+                    for listing_id in pair:
+                        best_scores[listing_id] = max(best_scores.get(listing_id, 0.0), score)
+
+    members = {}
+    for listing_id in list(groups.parent):
+        members.setdefault(groups.find(listing_id), []).append(listing_id)
+
+    links = []
+    for group in members.values():
+        canonical = min(group, key=lambda listing_id: features[listing_id].canonical_rank())
+        links.extend(
+            {"listing_id": listing_id, "canonical_listing_id": canonical, "score": round(best_scores[listing_id], 4)}
+            for listing_id in group if listing_id != canonical
+        )
+
+    session.query(ListingDuplicate).delete(synchronize_session=False)
+    if links:
+        session.execute(ListingDuplicate.__table__.insert(), links)
+    session.query(ListingAddressKey).delete(synchronize_session=False)
+    for start in range(0, len(address_keys), chunk_size):
+        session.execute(ListingAddressKey.__table__.insert(), address_keys[start:start + chunk_size])
+    session.commit()
+    logger.info("Duplicate scan: %d blocks, %d pairs compared, %d duplicates linked", len(blocks), len(compared), len(links))
+    return {"blocks": len(blocks), "pairs_compared": len(compared), "duplicates": len(links)}
+
+
+def _link(session, duplicate_id, canonical_id, score):
+    # Anything that pointed at the listing being demoted now points at the new canonical
+    session.query(ListingDuplicate).filter(ListingDuplicate.canonical_listing_id == duplicate_id).update(
+        {ListingDuplicate.canonical_listing_id: canonical_id}, synchronize_session=False)
+    session.query(ListingDuplicate).filter(ListingDuplicate.listing_id == duplicate_id).delete(synchronize_session=False)
+    session.add(ListingDuplicate(listing_id=duplicate_id, canonical_listing_id=canonical_id, score=round(score, 4)))
+
+
+@functools.lru_cache(maxsize=None)
+def _candidate_statement(by_address, by_postal_code, by_coordinates, by_price):
+    """Candidate rows from a UNION of the indexed blocking lookups: same address key, same postal code, or the ~150m coordinate box.
+
+    Each branch is its own index lookup (ix_listing_address_keys_address_key,
+    ix_listings_postal_code, ix_listings_latitude_longitude); OR-ing them in
+    one WHERE would make most databases scan the listings table instead. The
+    statement is built once per combination of lookups and takes its values
+    as bound parameters, so a bulk check does not rebuild it per listing.
+    """
+    branches = []
+    if by_address:
+        branches.append(select(ListingAddressKey.listing_id).where(ListingAddressKey.address_key == bindparam("address_key")))
+    if by_postal_code:
+        branches.append(select(Listing.id).where(Listing.postal_code == bindparam("postal_code")))
+    if by_coordinates:
+        branches.append(select(Listing.id).where(and_(Listing.latitude.between(bindparam("min_latitude"), bindparam("max_latitude")),
+                                                      Listing.longitude.between(bindparam("min_longitude"), bindparam("max_longitude")))))
+    candidate_ids = union(*branches) if len(branches) > 1 else branches[0]
+    statement = select(*(getattr(Listing, column) for column in FEATURE_COLUMNS)).where(
+        Listing.id != bindparam("listing_id"), Listing.id.in_(candidate_ids))
+    if by_price:
+        statement = statement.where(Listing.price.between(bindparam("min_price"), bindparam("max_price")))
+    return statement.limit(MAX_BLOCK_SIZE)
+
+
+def _reset(session, listing_ids, features):
+    """Drop the listings' duplicate links and rewrite their address keys before they are matched again"""
+    session.query(ListingDuplicate).filter(ListingDuplicate.listing_id.in_(listing_ids)).delete(synchronize_session=False)
+    session.query(ListingAddressKey).filter(ListingAddressKey.listing_id.in_(listing_ids)).delete(synchronize_session=False)
+    keys = [{"listing_id": listing_id, "address_key": listing_features.address_key}
+            for listing_id, listing_features in zip(listing_ids, features) if listing_features.address_key]
+    if keys:
+        session.execute(ListingAddressKey.__table__.insert(), keys)
+
+
+def _match(session, listing, features):
+    by_coordinates = listing.latitude is not None and listing.longitude is not None
+    if not (features.address_key or features.postal_code or by_coordinates):
+        return None
+    parameters = {"listing_id": listing.id, "address_key": features.address_key, "postal_code": listing.postal_code}
+    if by_coordinates:
+        parameters.update(min_latitude=listing.latitude - 0.0015, max_latitude=listing.latitude + 0.0015,
+                          min_longitude=listing.longitude - 0.0015, max_longitude=listing.longitude + 0.0015)
+    if features.price:
+        parameters.update(min_price=features.price * (1 - PRICE_TOLERANCE), max_price=features.price * (1 + PRICE_TOLERANCE))
+    statement = _candidate_statement(bool(features.address_key), bool(features.postal_code), by_coordinates, bool(features.price))
+
+    best = None
+    for row in session.execute(statement, parameters):
+        candidate = ListingFeatures(row)
+        score = similarity(features, candidate)
+        if score >= DUPLICATE_THRESHOLD and (best is None or score > best[1]):
+            best = (candidate, score)
+
+    if best is None:
+        return None
+
+    candidate, score = best
+    group_canonical = session.query(ListingDuplicate.canonical_listing_id).filter(ListingDuplicate.listing_id == candidate.id).scalar() or candidate.id
+    if group_canonical == listing.id:
+        return listing.id # Already the canonical listing of this group
+
+    if group_canonical == candidate.id:
+        canonical = candidate
+    else:
+        canonical = ListingFeatures(_feature_query(session).filter(Listing.id == group_canonical).one())
+
+    if features.canonical_rank() < canonical.canonical_rank():
+        _link(session, group_canonical, listing.id, score)
+        return listing.id
+    _link(session, listing.id, group_canonical, score)
+    return group_canonical
+
+
+def check_listing(session, listing):
+    """Match one new or edited listing against its blocking candidates and record a link.
+
+    Candidates are fetched with one bounded query over the indexed blocking
+    lookups (see _candidate_statement), within the price tolerance. `listing` may be
+    a Listing or a row with the FEATURE_COLUMNS. Also records the listing's
+    address key. Returns the canonical listing id, or None.
+    """
+    features = ListingFeatures(listing)
+    _reset(session, [listing.id], [features])
+    canonical_id = _match(session, listing, features)
+    session.commit()
+    return canonical_id
+
+
+def check_listings(session, listing_ids, chunk_size=500):
+    """check_listing for listings written in bulk (feed imports), committing once per chunk"""
+    listing_ids = list(listing_ids)
+    linked = 0
+    for start in range(0, len(listing_ids), chunk_size):
+        rows = _feature_query(session).filter(Listing.id.in_(listing_ids[start:start + chunk_size])).order_by(Listing.id).all()
+        features = [ListingFeatures(row) for row in rows]
+        _reset(session, [row.id for row in rows], features)
+        for row, row_features in zip(rows, features):
+            linked += _match(session, row, row_features) not in (None, row.id)
+        session.commit()
+    return linked
+
+
+def _own_session(session):
+    """A session of its own on the caller's primary engine, for writing links from a listener.
+
+    Listeners run after the caller's commit; writing through the caller's
+    session would commit its next unit of work, or leave it needing a
+    rollback if a write failed. Closing the returned session rolls back
+    anything it did not commit.
+    """
+    return Session(bind=session.get_bind(ListingDuplicate.__mapper__))
+
+
+class _DuplicateChecker:
+    """Runs check_listing for every listing written through the API or imported from a feed"""
+
+    def listing_saved(self, listing):
+        session = object_session(listing)
+        if session is not None:
+            with _own_session(session) as own_session:
+                check_listing(own_session, listing)
+
+    def listings_changed(self, listing_ids):
+        from src.models.user import db
+
+        with _own_session(db.session) as own_session:
+            check_listings(own_session, listing_ids)
+
+    def listing_deleted(self, listing_id):
+        # Deleted explicitly: SQLite does not enforce the ON DELETE CASCADE foreign keys by default
+        from src.models.user import db
+
+        with _own_session(db.session) as own_session:
+            own_session.query(ListingDuplicate).filter(or_(ListingDuplicate.listing_id == listing_id,
+                                                           ListingDuplicate.canonical_listing_id == listing_id)).delete(synchronize_session=False)
+            own_session.query(ListingAddressKey).filter(ListingAddressKey.listing_id == listing_id).delete(synchronize_session=False)
+            own_session.commit()
+
+
+listing_events.register(_DuplicateChecker())
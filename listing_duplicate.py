@@ -0,0 +1,28 @@
+# Listing Duplicate Model (links a duplicate listing to its canonical listing)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.user import db
+
+class ListingDuplicate(db.Model):
+    __tablename__ = 'listing_duplicates'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Each listing has at most one canonical listing; canonical listings have no row here
+    listing_id = db.Column(db.Integer, db.ForeignKey('listings.id', ondelete='CASCADE'), nullable=False, unique=True)
+    canonical_listing_id = db.Column(db.Integer, db.ForeignKey('listings.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False) # Similarity score in [0, 1]
+    date_detected = db.Column(db.DateTime, server_default=db.func.now())
+
+    def __repr__(self):
+        return f'<ListingDuplicate {self.listing_id} -> {self.canonical_listing_id}>'
+
+    def to_dict(self):
+        return {
+            'listing_id': self.listing_id,
+            'canonical_listing_id': self.canonical_listing_id,
+            'score': self.score,
+            'date_detected': self.date_detected
+        }
@@ -0,0 +1,133 @@
+# Listing change notifications for in-process derived data (search index, aggregates, caches)
+import logging
+import threading
+import time
+
+from src.models.listing import Listing
+
+logger = logging.getLogger(__name__)
+
+_listeners = []
+
+
+def register(listener):
+    """Register an object exposing listing_saved(listing) and listing_deleted(listing_id).
+
+    Listeners may also implement listings_changed(listing_ids) to hear about
+    set-based UPDATEs that bypass the ORM (e.g. the tier-expiry sweeper).
+    Listeners are called after the write has been committed, so they only ever
+    see durable state. A failing listener is logged and never fails the request.
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+    return listener
+
+
+def listing_saved(listing):
+    for listener in list(_listeners):
+        try:
+            listener.listing_saved(listing)
+        except Exception:
+            logger.exception("Listing listener %r failed for listing %s", listener, getattr(listing, "id", None))
+
+
+def listing_deleted(listing_id):
+    for listener in list(_listeners):
+        try:
+            listener.listing_deleted(listing_id)
+        except Exception:
+            logger.exception("Listing listener %r failed for deleted listing %s", listener, listing_id)
+
+
+def listings_changed(listing_ids):
+    for listener in list(_listeners):
+        handler = getattr(listener, "listings_changed", None)
+        if handler is None:
+            continue
+        try:
+            handler(listing_ids)
+        except Exception:
+            logger.exception("Listing listener %r failed for %d bulk-updated listings", listener, len(listing_ids))
+
+
+class ListingIndex:
+    """Base class for in-process structures derived from the listings table.
+
+    Subclasses declare the Listing `columns` they need and implement
+    _new_state(), _apply(state, row) and _discard(state, listing_id); rows are
+    either query results or Listing instances, read by attribute. The index is
+    kept current in this process through listing_saved/listing_deleted, catches
+    up on writes from other workers by date_updated every `refresh_interval`
+    seconds, and is rebuilt from scratch every `rebuild_interval` seconds to
+    drop rows deleted elsewhere.
+    """
+
+    columns = ()
+
+    def __init__(self, refresh_interval=30, rebuild_interval=900):
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.RLock()
+        self._state = self._new_state()
+        self._built_at = None
+        self._synced_at = None
+        self._watermark = None
+
+    def _new_state(self):
+        raise NotImplementedError
+
+    def _apply(self, state, row):
+        raise NotImplementedError
+
+    def _discard(self, state, listing_id):
+        raise NotImplementedError
+
+    def listing_saved(self, listing):
+        with self._lock:
+            self._apply(self._state, listing)
+
+    def listing_deleted(self, listing_id):
+        with self._lock:
+            self._discard(self._state, listing_id)
+
+    def _query(self, session):
+        return session.query(Listing.id, Listing.date_updated, *(getattr(Listing, column) for column in self.columns))
+
+    def rebuild(self, session):
+        """Build fresh state from the listings table and swap it in"""
+        state = self._new_state()
+        watermark = None
+        for row in self._query(session).yield_per(1000):
+            self._apply(state, row)
+            if row.date_updated and (watermark is None or row.date_updated > watermark):
+                watermark = row.date_updated
+        now = time.monotonic()
+        with self._lock:
+            self._state = state
+            self._watermark = watermark
+            self._built_at = now
+            self._synced_at = now
+
+    def refresh(self, session):
+        """Pick up listings written by other processes since the last sync"""
+        query = self._query(session)
+        if self._watermark is not None:
+            query = query.filter(Listing.date_updated >= self._watermark)
+        with self._lock:
+            for row in query.yield_per(1000):
+                self._apply(self._state, row)
+                if row.date_updated and (self._watermark is None or row.date_updated > self._watermark):
+                    self._watermark = row.date_updated
+            self._synced_at = time.monotonic()
+
+    def invalidate(self):
+        """Forget the built state; the next ensure_current() rebuilds it from the table"""
+        with self._lock:
+            self._built_at = None
+
+    def ensure_current(self, session):
+        now = time.monotonic()
+        if self._built_at is None or now - self._built_at > self.rebuild_interval:
+            self.rebuild(session)
+        elif now - self._synced_at > self.refresh_interval:
+            self.refresh(session)
@@ -0,0 +1,90 @@
+# Streaming listing exports (CSV / NDJSON) read from a server-side cursor in fixed-size chunks
+import csv
+import datetime
+import io
+
+from flask import current_app
+from sqlalchemy import select
+
+from src.models.listing import Listing
+from src.services.listing_serializer import FIELD_FORMATTERS, parse_fields
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+# Every listing column the API exposes; agent_details needs a join and is left to the JSON API
+EXPORT_FIELDS = tuple(field for field in FIELD_FORMATTERS if field != "agent_details")
+# CSV cells starting with these are formulas to Excel and LibreOffice, so they are prefixed with a quote
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def export_fields(value):
+    """Parse a `fields=` value for an export; raises ValueError for unknown or unsupported fields"""
+    fields = parse_fields(value) or EXPORT_FIELDS
+    if "agent_details" in fields:
+        raise ValueError("agent_details cannot be exported; export user_id instead")
+    return fields
+
+
+def export_result(session, fields, filters=(), user_id=None, chunk_size=1000):
+    """Start the export query and return its streaming Result.
+
+    yield_per makes the driver use a server-side cursor (MySQL SSCursor,
+    PostgreSQL named cursor) and fetch chunk_size rows at a time, so memory
+    stays flat however many listings there are. The connection is held until
+    the result is exhausted or closed, which for a download means as long as
+    the client takes to read it.
+    """
+    statement = select(*(getattr(Listing, field) for field in fields))
+    if user_id is not None:
+        statement = statement.where(Listing.user_id == user_id)
+    if filters:
+        statement = statement.where(*filters)
+    statement = statement.order_by(Listing.id).execution_options(yield_per=chunk_size)
+    return session.execute(statement)
+
+
+def _csv_value(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value # Listing text is user-supplied; spreadsheets would evaluate it as a formula
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+def _csv_chunks(result, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for rows in result.partitions():
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _ndjson_chunks(result, fields):
+    dumps = current_app.json.dumps # The app's provider encodes Decimal and datetime
+    formatters = [FIELD_FORMATTERS[field] for field in fields]
+    for rows in result.partitions():
+        lines = []
+        for row in rows:
+            record = {field: (formatter(value) if formatter else value) for field, formatter, value in zip(fields, formatters, row)}
+            lines.append(dumps(record))
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def export_chunks(result, fields, export_format):
+    """Encoded byte chunks of the export, one per fetched partition of rows; closes the result when done"""
+    chunks = _csv_chunks(result, fields) if export_format == "csv" else _ndjson_chunks(result, fields)
+    try:
+        yield from chunks
+    finally:
+        result.close()
@@ -0,0 +1,160 @@
+# Facet counts (city, province, property type, bedrooms, price band, status) for the search filters
+from collections import Counter
+
+from src.models.listing import Listing
+from src.services import listing_events
+
+FACETS = ("city", "province", "property_type", "bedrooms", "price_band", "status")
+
+# (label, min inclusive, max exclusive) in rand; the last band is open-ended
+PRICE_BANDS = [
+    ("0-500000", 0, 500000),
+    ("500000-1000000", 500000, 1000000),
+    ("1000000-2000000", 1000000, 2000000),
+    ("2000000-3000000", 2000000, 3000000),
+    ("3000000-5000000", 3000000, 5000000),
+    ("5000000-10000000", 5000000, 10000000),
+    ("10000000+", 10000000, None),
+]
+
+# Listing columns a facet computation reads
+FACET_COLUMNS = ("city", "province", "property_type", "bedrooms", "price", "status")
+
+
+def price_band(price):
+    if price is None:
+        return None
+    price = float(price)
+    for label, low, high in PRICE_BANDS:
+        if price >= low and (high is None or price < high):
+            return label
+    return None
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def facet_values(row):
+    """(facet, value) pairs one listing contributes; missing values are not counted"""
+    values = (
+        ("city", _text(row.city)),
+        ("province", _text(row.province)),
+        ("property_type", _text(row.property_type)),
+        ("bedrooms", row.bedrooms),
+        ("price_band", price_band(row.price)),
+        ("status", _text(row.status) or "active"),
+    )
+    return tuple(pair for pair in values if pair[1] is not None)
+
+
+def format_facets(counts, total):
+    """Response body for a Counter of (facet, value) pairs over `total` listings"""
+    facets = {facet: [] for facet in FACETS}
+    for (facet, value), count in counts.items():
+        if count > 0:
+            facets[facet].append({"value": value, "count": count})
+    for facet in ("city", "province", "property_type", "status"):
+        facets[facet].sort(key=lambda item: (-item["count"], item["value"]))
+    facets["bedrooms"].sort(key=lambda item: item["value"])
+    band_order = {label: position for position, (label, _, _) in enumerate(PRICE_BANDS)}
+    band_limits = {label: (low, high) for label, low, high in PRICE_BANDS}
+    facets["price_band"].sort(key=lambda item: band_order[item["value"]])
+    for item in facets["price_band"]:
+        item["min_price"], item["max_price"] = band_limits[item["value"]]
+    return {"total_listings": total, "facets": facets}
+
+
+def compute_facets(rows):
+    """Single pass over rows (query results or listings) accumulating every facet at once"""
+    counts = Counter()
+    total = 0
+    for row in rows:
+        counts.update(facet_values(row))
+        total += 1
+    return format_facets(counts, total)
+
+
+def facet_rows(query, listing_ids=None, chunk_size=500):
+    """Stream only the facet columns of a filtered query, optionally restricted to ids in chunks"""
+    columns = [Listing.id] + [getattr(Listing, column) for column in FACET_COLUMNS]
+    if listing_ids is None:
+        yield from query.with_entities(*columns).yield_per(1000)
+        return
+    for start in range(0, len(listing_ids), chunk_size):
+        yield from query.with_entities(*columns).filter(Listing.id.in_(listing_ids[start:start + chunk_size]))
+
+
+class _FacetState:
+    def __init__(self):
+        self.rows = {}  # listing_id -> (city key, facet pairs)
+        self.counts = Counter()  # (facet, value) -> listings, whole table
+        self.total = 0
+        self.city_counts = {}  # lowercased city -> Counter of (facet, value)
+        self.city_totals = Counter()
+
+
+class ListingFacetIndex(listing_events.ListingIndex):
+    """Facet counts for the whole table and per city, maintained incrementally.
+
+    Each listing write moves one listing's contributions between counters, so
+    the unfiltered facets and the city-only facets (the city filter is a
+    case-insensitive substring match, answered by summing the matching cities)
+    never need a GROUP BY. Any other filter combination goes through
+    compute_facets() instead.
+    """
+
+    columns = FACET_COLUMNS
+
+    def _new_state(self):
+        return _FacetState()
+
+    def _discard(self, state, listing_id):
+        entry = state.rows.pop(listing_id, None)
+        if entry is None:
+            return
+        city_key, pairs = entry
+        state.counts.subtract(pairs)
+        state.total -= 1
+        state.city_counts[city_key].subtract(pairs)
+        state.city_totals[city_key] -= 1
+        if state.city_totals[city_key] <= 0:
+            del state.city_counts[city_key]
+            del state.city_totals[city_key]
+
+    def _apply(self, state, row):
+        self._discard(state, row.id)
+        pairs = facet_values(row)
+        city_key = (_text(row.city) or "").lower()
+        state.rows[row.id] = (city_key, pairs)
+        state.counts.update(pairs)
+        state.total += 1
+        state.city_counts.setdefault(city_key, Counter()).update(pairs)
+        state.city_totals[city_key] += 1
+
+    def facets(self, session, city=None):
+        """Facets for all listings, or for those whose city contains `city` (case-insensitive)"""
+        self.ensure_current(session)
+        with self._lock:
+            state = self._state
+            if not city:
+                return format_facets(state.counts, state.total)
+            needle = city.lower()
+            counts = Counter()
+            total = 0
+            for city_key, city_counts in state.city_counts.items():
+                if needle in city_key:
+                    counts.update(city_counts)
+                    total += state.city_totals[city_key]
+            return format_facets(counts, total)
+
+    def values(self, session, facet, containing):
+        """Stored values of a text facet that contain `containing` (case-insensitive), e.g. to turn a substring filter into IN"""
+        self.ensure_current(session)
+        needle = containing.strip().lower()
+        with self._lock:
+            return sorted(value for (name, value), count in self._state.counts.items()
+                          if name == facet and count > 0 and needle in value.lower())
+
+
+listing_facet_index = listing_events.register(ListingFacetIndex())
@@ -0,0 +1,74 @@
+# Listing Image Model (photos attached to a listing, stored content-addressed with resized variants)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.user import db
+
+IMAGE_URL_PREFIX = '/media/images' # Served by the app's static route with immutable cache headers
+
+# Variant name -> bounding box (width, height); images are scaled down to fit, never up
+IMAGE_VARIANTS = {
+    'thumb': (320, 240), # Map pins, galleries
+    'card': (640, 480), # Search result cards (2x a ~320px card)
+    'detail': (1600, 1200), # Listing detail gallery
+}
+IMAGE_VARIANT_FORMATS = ('webp', 'jpg')
+
+
+def variant_size(width, height, variant):
+    """Pixel size of a variant (Pillow's thumbnail() may round the short side by a pixel differently)"""
+    box_width, box_height = IMAGE_VARIANTS[variant]
+    if width <= box_width and height <= box_height:
+        return width, height
+    if width * box_height >= height * box_width:
+        return box_width, max(1, round(height * box_width / width))
+    return max(1, round(width * box_height / height)), box_height
+
+
+def image_url(content_hash, filename):
+    # Content-addressed, so a URL never changes meaning and can be cached forever
+    return f"{IMAGE_URL_PREFIX}/{content_hash[:2]}/{content_hash}/{filename}"
+
+
+class ListingImage(db.Model):
+    __tablename__ = 'listing_images'
+
+    id = db.Column(db.Integer, primary_key=True)
+    listing_id = db.Column(db.Integer, db.ForeignKey('listings.id', ondelete='CASCADE'), nullable=False, index=True)
+    content_hash = db.Column(db.String(64), nullable=False, index=True) # SHA-256 of the original upload
+    original_format = db.Column(db.String(10), nullable=False) # jpg, png or webp
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    byte_size = db.Column(db.Integer, nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0) # 0 is the cover image
+    status = db.Column(db.String(20), nullable=False, default='processing') # processing, ready, failed
+    date_uploaded = db.Column(db.DateTime, server_default=db.func.now())
+
+    def __repr__(self):
+        return f'<ListingImage {self.id} of listing {self.listing_id}>'
+
+    def variant_url(self, variant, image_format='jpg'):
+        return image_url(self.content_hash, f"{variant}.{image_format}")
+
+    def to_dict(self):
+        variants = {}
+        if self.status == 'ready':
+            for variant in IMAGE_VARIANTS:
+                width, height = variant_size(self.width, self.height, variant)
+                variants[variant] = {
+                    'width': width,
+                    'height': height,
+                    **{image_format: self.variant_url(variant, image_format) for image_format in IMAGE_VARIANT_FORMATS}
+                }
+        return {
+            'id': self.id,
+            'listing_id': self.listing_id,
+            'position': self.position,
+            'width': self.width,
+            'height': self.height,
+            'status': self.status,
+            'variants': variants,
+            'date_uploaded': self.date_uploaded
+        }
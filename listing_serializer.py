@@ -0,0 +1,105 @@
+# Bulk serialization of listing pages with field projection and batched agent loading
+from sqlalchemy.orm import load_only, selectinload
+
+from src.models.listing import Listing
+
+
+def _optional_decimal(value):
+    return value if value else None
+
+
+# Field name -> formatter, matching the output of Listing.to_dict().
+# Decimals and datetimes are left to the app's JSON provider (exact strings and ISO 8601).
+FIELD_FORMATTERS = {
+    "id": None,
+    "title": None,
+    "description": None,
+    "price": None,
+    "address": None,
+    "city": None,
+    "province": None,
+    "postal_code": None,
+    "latitude": None,
+    "longitude": None,
+    "bedrooms": None,
+    "bathrooms": _optional_decimal,
+    "property_type": None,
+    "area_sqm": None,
+    "main_image_url": None,
+    "user_id": None,
+    "agent_details": None,
+    "source": None,
+    "status": None,
+    "is_charged_listing": None,
+    "listing_tier": None,
+    "tier_expiry_date": None,
+    "date_posted": None,
+    "date_updated": None,
+}
+
+# Fields needed to render a listing card in search results
+CARD_FIELDS = (
+    "id", "title", "price", "address", "city", "province", "bedrooms", "bathrooms",
+    "property_type", "area_sqm", "main_image_url", "listing_tier", "status", "date_posted",
+)
+
+FIELD_PRESETS = {
+    "card": CARD_FIELDS,
+}
+
+
+def parse_fields(value):
+    """Turn a `fields=` query value into a tuple of field names (None means the full listing).
+
+    Accepts a preset name ("card") or a comma-separated list of fields; raises
+    ValueError for unknown names. `id` is always included.
+    """
+    if not value:
+        return None
+    if value in FIELD_PRESETS:
+        return FIELD_PRESETS[value]
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in FIELD_FORMATTERS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if "id" not in fields:
+        fields = ("id",) + fields
+    return fields
+
+
+def listing_query_options(fields=None):
+    """Loader options so a page of listings costs a constant number of queries.
+
+    Agents are batch-loaded with one SELECT ... IN per page instead of one lazy
+    load per listing, and with a projection only the requested columns (plus
+    the keys needed for ordering and cursors) are selected.
+    """
+    if fields is None:
+        return [selectinload(Listing.user)]
+
+    columns = {"id", "date_posted"}
+    columns.update(field for field in fields if field != "agent_details")
+    if "agent_details" in fields:
+        columns.add("user_id")
+    options = [load_only(*(getattr(Listing, column) for column in sorted(columns)))]
+    if "agent_details" in fields:
+        options.append(selectinload(Listing.user))
+    return options
+
+
+def serialize_listing(listing, fields=None):
+    if fields is None:
+        return listing.to_dict()
+    result = {}
+    for field in fields:
+        if field == "agent_details":
+            result[field] = listing.user.to_dict() if listing.user else None
+            continue
+        value = getattr(listing, field)
+        formatter = FIELD_FORMATTERS[field]
+        result[field] = formatter(value) if formatter else value
+    return result
+
+
+def serialize_listings(listings, fields=None):
+    return [serialize_listing(listing, fields) for listing in listings]
@@ -0,0 +1,34 @@
+# Listing Source Reference Model (maps external feed records onto listings)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.user import db
+
+class ListingSourceRef(db.Model):
+    __tablename__ = 'listing_source_refs'
+    __table_args__ = (
+        db.UniqueConstraint('source', 'external_id', name='uq_listing_source_refs_source_external_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(50), nullable=False) # e.g., privateproperty, property24
+    external_id = db.Column(db.String(100), nullable=False) # The provider's own listing reference
+    listing_id = db.Column(db.Integer, db.ForeignKey('listings.id', ondelete='CASCADE'), nullable=False, index=True)
+    content_hash = db.Column(db.String(40), nullable=False) # Hash of the normalized feed row, to skip unchanged rows
+    date_imported = db.Column(db.DateTime, server_default=db.func.now())
+    date_updated = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+    def __repr__(self):
+        return f'<ListingSourceRef {self.source}:{self.external_id} -> {self.listing_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'source': self.source,
+            'external_id': self.external_id,
+            'listing_id': self.listing_id,
+            'date_imported': self.date_imported,
+            'date_updated': self.date_updated
+        }
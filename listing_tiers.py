@@ -0,0 +1,27 @@
+# Listing Tiers (price, duration, features and promotion of each tier a listing can be upgraded to)
+# Plain data shared by the payment routes, the payment worker, the tier sweeper and the featured ranking;
+# the listing_tier column holds a key of LISTING_TIERS.
+
+LISTING_TIERS = {
+    "standard": {
+        "price": 0,  # Free tier
+        "duration_days": 30,
+        "features": ["Basic listing", "Standard visibility"],
+        "placements": [],  # Not promoted
+        "ranking_weight": 0
+    },
+    "premium": {
+        "price": 199.99,  # ZAR
+        "duration_days": 60,
+        "features": ["Premium listing", "Higher visibility", "Featured in search results"],
+        "placements": ["search"],  # Where paid listings of the tier are promoted (see featured_ranking)
+        "ranking_weight": 1.0  # Relative weight in the featured ranking
+    },
+    "featured": {
+        "price": 499.99,  # ZAR
+        "duration_days": 90,
+        "features": ["Top visibility", "Featured on homepage", "Social media promotion", "Professional photography"],
+        "placements": ["search", "homepage"],
+        "ranking_weight": 3.0
+    }
+}
@@ -0,0 +1,66 @@
+# Shared validation/normalization for listing input (manual create_listing and feed ingest)
+
+REQUIRED_FIELDS = ["title", "price", "address"]
+
+TEXT_FIELDS = ["title", "description", "address", "city", "province", "postal_code", "property_type", "main_image_url", "status"]
+
+NUMERIC_FIELDS = {
+    "latitude": float,
+    "longitude": float,
+    "bedrooms": int,
+    "bathrooms": float,
+    "area_sqm": int,
+}
+
+
+class ListingValidationError(ValueError):
+    pass
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def normalize_listing_fields(data):
+    """Validate the descriptive fields of a listing and return column values.
+
+    Applies the create_listing rules (required title/price/address, positive
+    price) and coerces numeric fields, so values arriving as strings from CSV
+    or XML feeds end up with the same types as JSON input. Raises
+    ListingValidationError with a client-facing message.
+    """
+    if not all(field in data and not _blank(data[field]) for field in REQUIRED_FIELDS):
+        raise ListingValidationError(f"Missing required fields: {', '.join(REQUIRED_FIELDS)}")
+
+    try:
+        price = float(data["price"])
+    except (ValueError, TypeError):
+        raise ListingValidationError("Invalid price format")
+    if price <= 0:
+        raise ListingValidationError("Price must be a positive number")
+
+    values = {"price": price}
+    for field in TEXT_FIELDS:
+        value = data.get(field)
+        values[field] = value.strip() if isinstance(value, str) else value
+    if not values["status"]:
+        values["status"] = "active"
+
+    for field, cast in NUMERIC_FIELDS.items():
+        value = data.get(field)
+        if _blank(value):
+            values[field] = None
+            continue
+        try:
+            number = float(value)
+        except (ValueError, TypeError):
+            raise ListingValidationError(f"Invalid {field} format")
+        if cast is int and not number.is_integer():
+            raise ListingValidationError(f"Invalid {field} format")
+        values[field] = cast(number)
+
+    if values["latitude"] is not None and not -90 <= values["latitude"] <= 90:
+        raise ListingValidationError("Invalid latitude format")
+    if values["longitude"] is not None and not -180 <= values["longitude"] <= 180:
+        raise ListingValidationError("Invalid longitude format")
+    return values
@@ -3,83 +3,88 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, jsonify # Added jsonify
+from flask import Flask
 from flask_cors import CORS # Import CORS
 from flask_jwt_extended import JWTManager # Import JWTManager
 
 from src.models.user import db # Assuming db is initialized in user.py or a shared models.py
-from src.routes.user import user_bp
-from src.routes.auth import auth_bp # Import auth blueprint
-from src.routes.listing import listing_bp # Import listing blueprint
-from src.routes.payment import payment_bp # Import payment blueprint
-from src.routes.advertisement import advertisement_bp # Import advertisement blueprint
+from src.config import app_config, engine_options # Env-driven settings and pool/timeout options
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+def create_app(config=None):
+    """Build the Flask app. `config` (a dict) overrides the environment-driven defaults.
 
-# Configuration
-app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', 'default_super_secret_key_for_dev_!@#$%^&*()')
-app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'default_jwt_secret_key_for_dev_!@#$%^&*()') # For JWT
+    Creating the app opens no database connection: tables are created with
+    `flask --app src.main init-db` and in-process indexes are built on first use.
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
-# Initialize extensions
-CORS(app) # Enable CORS for all routes
-jwt = JWTManager(app) # Initialize JWT
+    # Configuration
+    app.config.update(app_config())
+    if config:
+        app.config.update(config)
+        if 'SQLALCHEMY_DATABASE_URI' in config and 'SQLALCHEMY_ENGINE_OPTIONS' not in config:
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config['SQLALCHEMY_DATABASE_URI'])
 
-# Register Blueprints
-app.register_blueprint(user_bp, url_prefix='/api/users') # Changed prefix for clarity
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(listing_bp, url_prefix='/api/listings') # Changed prefix for consistency
-app.register_blueprint(payment_bp, url_prefix='/api/payments') 
-app.register_blueprint(advertisement_bp, url_prefix='/api/advertisements') # Added advertisement blueprint
+    # Blueprints and services are imported here so importing this module stays cheap
+    from src.routes.user import user_bp
+    from src.routes import auth, listing, payment, advertisement, saved_searches
+    from src.models.listing_source_ref import ListingSourceRef # Feed (source, external_id) -> listing mapping
+    from src.models.listing_duplicate import ListingDuplicate # Duplicate -> canonical listing links
+    from src.models.listing_address_key import ListingAddressKey # Normalized addresses for duplicate lookups
+    from src.models.listing_image import ListingImage, IMAGE_URL_PREFIX # Listing photos and their variant URLs
+    from src.models.saved_search import SavedSearch, SavedSearchMatch # Listing alerts and their match queue
+    from src.models.payment_transaction import PaymentTransaction # Checkouts settled by gateway notifications
+    from src.services.ad_counters import ad_counter_buffer # Buffered ad impression/click counters
+    from src.services.response_cache import response_cache # Read-through cache for public listing reads
+    from src.services.password_hashing import password_hasher # Process pool for password hashing
+    from src.services.metrics import request_metrics # Request/SQL instrumentation served at /metrics
+    from src.services.db_routing import replica_router # Replica binds for read-only endpoints
+    from src.services.image_pipeline import image_pipeline # Photo storage and background variant rendering
+    from src.services.static_assets import static_assets # Manifest-backed frontend serving
+    from src.services.json_provider import json_provider_class # orjson-backed jsonify when installed
+    from src.services.response_compression import response_compression # gzip/brotli for larger responses
+    from src.services.payment_queue import payment_queue # Local journal of payment notifications
+    from src.commands import register_commands # CLI commands, e.g. `flask --app src.main ingest-feed`
 
-# Database Configuration
-DB_USERNAME = 'propsundayuser'
-DB_PASSWORD = 'f22adada45a6e5426994cdeb06c01583' # Retrieved from db_credentials.txt
-DB_HOST = 'localhost'
-DB_PORT = '3307' # Updated port
-DB_NAME = 'propertysunday'
-app.config['SQLALCHEMY_DATABASE_URI'] = f"mysql+pymysql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+    app.json = json_provider_class()(app)
 
-# Create database tables if they don't exist
-with app.app_context():
-    db.create_all()
-    # Link the db.session to the placeholder in listing.py, payment.py and advertisement.py for standalone script execution simulation
-    # This is a HACK for the current placeholder setup and should NOT be in production code.
-    # In a real app, db would be imported directly into those files from this initialized instance.
-    if hasattr(sys.modules.get('src.routes.listing'), 'db_placeholder'):
-        sys.modules['src.routes.listing'].db_placeholder.session = db.session
-        sys.modules['src.routes.listing'].Listing.query = db.session.query_property()
-        sys.modules['src.routes.listing'].User.query = db.session.query_property()
+    # Initialize extensions
+    CORS(app) # Enable CORS for all routes
+    JWTManager(app) # Initialize JWT
+    replica_router.init_app(app, db) # Adds the replica binds, so it must run before db.init_app
+    db.init_app(app)
+    ad_counter_buffer.init_app(app, db)
+    response_cache.init_app(app)
+    password_hasher.init_app(app)
+    image_pipeline.init_app(app)
+    static_assets.init_app(app, excluded=(IMAGE_URL_PREFIX,)) # Scans the static folder once
+    request_metrics.init_app(app, db)
+    response_compression.init_app(app)
+    payment_queue.init_app(app)
+    register_commands(app)
 
-    if hasattr(sys.modules.get('src.routes.payment'), 'db_placeholder'):
-        sys.modules['src.routes.payment'].db_placeholder.session = db.session
-        sys.modules['src.routes.payment'].Listing.query = db.session.query_property()
-        sys.modules['src.routes.payment'].User.query = db.session.query_property()
-        
-    if hasattr(sys.modules.get('src.routes.advertisement'), 'db_placeholder'):
-        sys.modules['src.routes.advertisement'].db_placeholder.session = db.session
-        sys.modules['src.routes.advertisement'].Advertisement.query = db.session.query_property()
+    # Register Blueprints
+    app.register_blueprint(user_bp, url_prefix='/api/users') # Changed prefix for clarity
+    app.register_blueprint(auth.auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(listing.listing_bp, url_prefix='/api/listings') # Changed prefix for consistency
+    app.register_blueprint(payment.payment_bp, url_prefix='/api/payments')
+    app.register_blueprint(advertisement.advertisement_bp, url_prefix='/api/advertisements') # Added advertisement blueprint
+    app.register_blueprint(saved_searches.saved_search_bp, url_prefix='/api/saved-searches')
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
+    # The route modules run their real-database branches once their placeholder holds a session.
+    # db.session is a scoped session bound to the current app context, so one assignment serves every request.
+    for module in (auth, listing, payment, advertisement, saved_searches):
+        module.db_placeholder.session = db.session
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            # Fallback for API routes if not serving static files
-            if path.startswith("api/"):
-                 return jsonify({"message": "API endpoint not found. Please check the URL."}), 404
-            return "index.html not found and not an API route", 404
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if path.startswith(IMAGE_URL_PREFIX.lstrip('/') + '/'): # Content-addressed photos, cached forever
+            return image_pipeline.send(path[len(IMAGE_URL_PREFIX):])
+        return static_assets.serve(path) # Frontend build, looked up in the startup manifest
 
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    return app
 
+# Development server only; in production run `gunicorn -c gunicorn.conf.py wsgi:app`
+if __name__ == '__main__':
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,239 @@
+# Request/SQL instrumentation exposed in the Prometheus text format at /metrics
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+trace_logger = logging.getLogger(__name__ + ".trace")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))+\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement, max_length=500):
+    """Statement with literals and expanded IN lists collapsed, so equal query shapes group together"""
+    shape = _STRING_RE.sub("?", statement)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _PLACEHOLDER_LIST_RE.sub("(?...)", shape)
+    return _WHITESPACE_RE.sub(" ", shape).strip()[:max_length]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]}")
+        return lines
+
+
+def _sample(name, help_text, values, metric_type="gauge"):
+    """Render values read from elsewhere: {labels: value} where labels are (name, value) pairs"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in values.items():
+        lines.append(f"{name}{_labels((), (), labels)} {value}")
+    return lines
+
+
+class RequestMetrics:
+    """Per-endpoint latency, SQL statement counts, DB time, slow queries and pool checkout waits.
+
+    Metrics live in this process; under gunicorn each worker exposes its own
+    series, so scrape every worker or aggregate with the worker label your
+    process manager adds. A sampled fraction of requests (METRICS_TRACE_SAMPLE_RATE)
+    is additionally logged as one JSON trace line with every statement's shape
+    and duration.
+    """
+
+    def __init__(self):
+        self.slow_query_seconds = 0.2
+        self.trace_sample_rate = 0.0
+        self.request_latency = Histogram("http_request_duration_seconds", "Request latency by endpoint", LATENCY_BUCKETS, ("endpoint", "method", "status"))
+        self.request_statements = Histogram("http_request_sql_statements", "SQL statements executed per request", STATEMENT_BUCKETS, ("endpoint",))
+        self.request_db_time = Histogram("http_request_db_seconds", "Total time spent in SQL per request", LATENCY_BUCKETS, ("endpoint",))
+        self.statement_latency = Histogram("sql_statement_duration_seconds", "SQL statement latency by statement type", LATENCY_BUCKETS, ("engine", "operation"))
+        self.slow_queries = Counter("sql_slow_queries_total", "Statements slower than the slow query threshold", ("engine", "operation"))
+        self.pool_wait = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", POOL_WAIT_BUCKETS, ("engine",))
+        self.recent_slow_queries = deque(maxlen=50)
+        self._engines = {}
+
+    def init_app(self, app, db):
+        self.slow_query_seconds = app.config.get("METRICS_SLOW_QUERY_MS", 200) / 1000.0
+        self.trace_sample_rate = app.config.get("METRICS_TRACE_SAMPLE_RATE", 0.0)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        with app.app_context():
+            for bind_key, engine in db.engines.items():
+                self.instrument_engine(engine, bind_key or "default")
+        if app.config.get("METRICS_ENABLED", True):
+            app.add_url_rule("/metrics", "metrics", self.metrics_view)
+
+    def instrument_engine(self, engine, name):
+        if self._engines.get(name) is engine:
+            return # An app created again in this process (tests, benchmarks) brings new engines under the same names
+        self._engines[name] = engine
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._make_after_cursor_execute(name))
+        event.listen(engine, "handle_error", self._handle_error)
+
+        # Time pool checkouts, including the wait for a free connection when the pool is exhausted.
+        # Wrapping raw_connection (rather than the pool) survives engine.dispose() replacing the pool.
+        raw_connection = engine.raw_connection
+
+        def timed_raw_connection(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return raw_connection(*args, **kwargs)
+            finally:
+                self.pool_wait.observe(time.perf_counter() - started, (name,))
+
+        engine.raw_connection = timed_raw_connection
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    def _handle_error(self, context):
+        # A failed statement never reaches after_cursor_execute; drop its start time
+        if context.connection is not None and context.connection.info.get("metrics_started"):
+            context.connection.info["metrics_started"].pop()
+
+    def _make_after_cursor_execute(self, engine_name):
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            timings = conn.info.get("metrics_started")
+            if not timings:
+                return
+            elapsed = time.perf_counter() - timings.pop()
+            operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            self.statement_latency.observe(elapsed, (engine_name, operation))
+            endpoint = None
+            if has_request_context() and "metrics_started" in g:
+                endpoint = g.metrics_endpoint
+                g.metrics_statements += 1
+                g.metrics_db_time += elapsed
+                if g.metrics_trace is not None:
+                    g.metrics_trace.append({"sql": statement_shape(statement, 200), "ms": round(elapsed * 1000, 2)})
+            if elapsed >= self.slow_query_seconds:
+                shape = statement_shape(statement)
+                self.slow_queries.inc((engine_name, operation))
+                self.recent_slow_queries.append({"shape": shape, "ms": round(elapsed * 1000, 1), "endpoint": endpoint, "at": time.time()})
+                logger.warning("Slow query (%.0f ms) on %s: %s", elapsed * 1000, endpoint or "background", shape)
+        return after_cursor_execute
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        g.metrics_statements = 0
+        g.metrics_db_time = 0.0
+        g.metrics_trace = [] if self.trace_sample_rate and random.random() < self.trace_sample_rate else None
+
+    def _after_request(self, response):
+        if "metrics_started" not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        endpoint = g.metrics_endpoint
+        self.request_latency.observe(elapsed, (endpoint, request.method, str(response.status_code)))
+        self.request_statements.observe(g.metrics_statements, (endpoint,))
+        self.request_db_time.observe(g.metrics_db_time, (endpoint,))
+        if g.metrics_trace is not None:
+            trace_logger.info(json.dumps({
+                "method": request.method, "path": request.path, "endpoint": endpoint, "status": response.status_code,
+                "ms": round(elapsed * 1000, 2), "db_ms": round(g.metrics_db_time * 1000, 2), "statements": g.metrics_trace
+            }))
+        return response
+
+    def render(self):
+        lines = []
+        for metric in (self.request_latency, self.request_statements, self.request_db_time,
+                       self.statement_latency, self.slow_queries, self.pool_wait):
+            lines.extend(metric.render())
+
+        pool_stats = {}
+        for name, engine in self._engines.items():
+            pool = engine.pool
+            if hasattr(pool, "checkedout"):
+                pool_stats[(("engine", name), ("state", "checked_out"))] = pool.checkedout()
+                pool_stats[(("engine", name), ("state", "idle"))] = pool.checkedin()
+                pool_stats[(("engine", name), ("state", "overflow"))] = max(pool.overflow(), 0)
+        if pool_stats:
+            lines.extend(_sample("db_pool_connections", "Pooled connections by state", pool_stats))
+
+        from src.services.response_cache import response_cache
+        cache_stats = response_cache.stats()
+        lines.extend(_sample("response_cache_hits_total", "Response cache hits", {(): cache_stats["hits"]}, "counter"))
+        lines.extend(_sample("response_cache_misses_total", "Response cache misses", {(): cache_stats["misses"]}, "counter"))
+        lines.extend(_sample("response_cache_evictions_total", "Response cache evictions", {(): cache_stats["evictions"]}, "counter"))
+        if "entries" in cache_stats:
+            lines.extend(_sample("response_cache_entries", "Entries held by the in-process response cache", {(): cache_stats["entries"]}))
+            lines.extend(_sample("response_cache_bytes", "Bytes held by the in-process response cache", {(): cache_stats["bytes"]}))
+        return "\n".join(lines) + "\n"
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+request_metrics = RequestMetrics()
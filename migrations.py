@@ -0,0 +1,131 @@
+# Versioned schema migrations (run with `flask --app src.main db-upgrade`)
+# db.create_all() only creates missing tables; anything that changes an existing schema goes here.
+import logging
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+# Kept out of db.metadata so create_all() never creates it with a different shape
+_migration_metadata = sa.MetaData()
+schema_migrations = sa.Table(
+    "schema_migrations", _migration_metadata,
+    sa.Column("version", sa.Integer, primary_key=True),
+    sa.Column("description", sa.String(200), nullable=False),
+    sa.Column("applied_at", sa.DateTime, nullable=False),
+)
+
+
+def _create_indexes(connection, table_name, indexes):
+    table = db.metadata.tables[table_name]
+    existing = {index.name: index for index in table.indexes} # sa.Index attaches itself to the table, so reuse it on later runs
+    for name, columns in indexes:
+        index = existing.get(name) or sa.Index(name, *(table.c[column] for column in columns))
+        index.create(connection, checkfirst=True)
+
+
+def _baseline(connection):
+    db.metadata.create_all(connection, checkfirst=True)
+
+
+def _listing_indexes(connection):
+    _create_indexes(connection, "listings", [
+        ("ix_listings_date_posted_id", ("date_posted", "id")),                    # default order and keyset pages
+        ("ix_listings_user_id_date_posted", ("user_id", "date_posted")),          # my-listings
+        # Filters are ordered by date_posted, so equality filters lead and date_posted follows: the index returns a
+        # page in order without sorting every match, and a price range on top is checked against the index rows
+        ("ix_listings_property_type_date_posted", ("property_type", "date_posted")),  # type filter, optionally with a price range
+        ("ix_listings_bedrooms_date_posted", ("bedrooms", "date_posted")),            # bedrooms filter, optionally with a price range
+        ("ix_listings_province_date_posted", ("province", "date_posted")),            # province filter (resolved to IN)
+        ("ix_listings_price", ("price",)),                                        # price range on its own
+        ("ix_listings_listing_tier_date_posted", ("listing_tier", "date_posted")),  # tier filter
+        ("ix_listings_tier_expiry_date", ("tier_expiry_date",)),                  # tier-expiry sweeper
+        ("ix_listings_date_updated", ("date_updated",)),                          # in-process index refresh watermark
+        ("ix_listings_postal_code", ("postal_code",)),                            # duplicate candidate lookup
+        ("ix_listings_latitude_longitude", ("latitude", "longitude")),            # duplicate candidate lookup by coordinates
+    ])
+
+
+def _advertisement_indexes(connection):
+    _create_indexes(connection, "advertisements", [
+        ("ix_advertisements_is_active_end_date", ("is_active", "end_date")),      # live ad schedule rebuild
+    ])
+
+
+def _listing_images(connection):
+    from src.models.listing_image import ListingImage
+    ListingImage.__table__.create(connection, checkfirst=True)
+
+
+def _saved_searches(connection):
+    from src.models.saved_search import SavedSearch, SavedSearchMatch
+    SavedSearch.__table__.create(connection, checkfirst=True)
+    SavedSearchMatch.__table__.create(connection, checkfirst=True)
+
+
+def _payment_transactions(connection):
+    from src.models.payment_transaction import PaymentTransaction
+    PaymentTransaction.__table__.create(connection, checkfirst=True)
+
+
+def _listing_address_keys(connection, chunk_size=1000):
+    from src.models.listing import Listing
+    from src.models.listing_address_key import ListingAddressKey
+    from src.services.listing_dedup import address_key
+
+    ListingAddressKey.__table__.create(connection, checkfirst=True)
+    last_id = 0
+    while True: # Keyset batches, so no cursor stays open while inserting (MySQL cannot interleave them)
+        rows = connection.execute(sa.select(Listing.id, Listing.address, Listing.city).where(Listing.id > last_id)
+                                  .order_by(Listing.id).limit(chunk_size)).all()
+        if not rows:
+            break
+        keys = [{"listing_id": row.id, "address_key": address_key(row.address, row.city)} for row in rows]
+        keys = [key for key in keys if key["address_key"]]
+        if keys:
+            connection.execute(ListingAddressKey.__table__.insert(), keys)
+        last_id = rows[-1].id
+
+
+# (version, description, upgrade(connection)); append only, never renumber or edit an applied migration
+MIGRATIONS = [
+    (1, "Baseline schema", _baseline),
+    (2, "Composite indexes for listing filters and sort orders", _listing_indexes),
+    (3, "Index for the live advertisement schedule", _advertisement_indexes),
+    (4, "Listing images table", _listing_images),
+    (5, "Saved searches and their match queue", _saved_searches),
+    (6, "Payment transactions", _payment_transactions),
+    (7, "Normalized listing address keys for duplicate detection", _listing_address_keys),
+]
+
+
+def applied_versions(engine):
+    _migration_metadata.create_all(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return {row.version for row in connection.execute(sa.select(schema_migrations.c.version))}
+
+
+def pending_migrations(engine):
+    applied = applied_versions(engine)
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+def upgrade(engine, target=None):
+    """Apply pending migrations in order, each in its own transaction; returns the versions applied.
+
+    On MySQL DDL commits implicitly, so a migration that fails halfway is not
+    rolled back; every step uses checkfirst and is safe to re-run.
+    """
+    applied = []
+    for version, description, step in pending_migrations(engine):
+        if target is not None and version > target:
+            break
+        logger.info("Applying migration %d: %s", version, description)
+        with engine.begin() as connection:
+            step(connection)
+            connection.execute(schema_migrations.insert().values(version=version, description=description, applied_at=datetime.utcnow()))
+        applied.append(version)
+    return applied
@@ -0,0 +1,116 @@
+# Pagination helpers for listing queries (keyset/cursor mode and cached totals)
+import base64
+import binascii
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PER_PAGE = 10
+MAX_PER_PAGE = 100
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class InvalidPageSizeError(ValueError):
+    pass
+
+
+def parse_per_page(value, default=DEFAULT_PER_PAGE):
+    """Validate a `per_page` query arg; raises InvalidPageSizeError unless it is an integer in 1..MAX_PER_PAGE"""
+    if value is None or value == "":
+        return default
+    try:
+        per_page = int(value)
+    except ValueError:
+        raise InvalidPageSizeError(f"per_page must be an integer between 1 and {MAX_PER_PAGE}")
+    if not 1 <= per_page <= MAX_PER_PAGE:
+        raise InvalidPageSizeError(f"per_page must be an integer between 1 and {MAX_PER_PAGE}")
+    return per_page
+
+
+def encode_cursor(date_posted, listing_id):
+    """Encode the (date_posted, id) position of a row as an opaque URL-safe token"""
+    payload = json.dumps([date_posted.isoformat() if date_posted else None, listing_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor back into (date_posted, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        date_posted, listing_id = json.loads(raw)
+        return (datetime.fromisoformat(date_posted) if date_posted else None), int(listing_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursorError("Invalid cursor")
+
+
+def keyset_paginate(query, model, per_page, cursor=None):
+    """Fetch one page ordered by (date_posted DESC, id DESC) starting after `cursor`.
+
+    Seeks directly to the cursor position instead of using OFFSET, so the cost of
+    a page does not grow with how deep the client has scrolled. Returns
+    (items, next_cursor); next_cursor is None on the last page.
+    """
+    if cursor:
+        date_posted, last_id = decode_cursor(cursor)
+        if date_posted is None:
+            # Rows without a date_posted sort after every dated row in DESC order
+            query = query.filter(model.date_posted.is_(None), model.id < last_id)
+        else:
+            query = query.filter(or_(
+                model.date_posted < date_posted,
+                and_(model.date_posted == date_posted, model.id < last_id),
+                model.date_posted.is_(None)
+            ))
+
+    # Fetch one extra row to find out whether another page exists without a COUNT(*)
+    rows = query.order_by(model.date_posted.desc(), model.id.desc()).limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        next_cursor = encode_cursor(items[-1].date_posted, items[-1].id)
+    return items, next_cursor
+
+
+class CountCache:
+    """Small TTL cache of COUNT(*) results keyed by a normalized filter set.
+
+    Totals served from here are approximate: they can lag writes by up to `ttl`
+    seconds, which is acceptable for "about N results" style UI.
+    """
+
+    def __init__(self, ttl=60, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_count(self, key, query):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        total = query.order_by(None).count()
+
+        with self._lock:
+            self._entries[key] = (total, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return total
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+listing_count_cache = CountCache()
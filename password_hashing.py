@@ -0,0 +1,105 @@
+# Password hashing offloaded to a bounded process pool
+import atexit
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = "scrypt" # werkzeug's default, which User.set_password and existing accounts use
+
+
+def method_prefix(method):
+    """The "<method>:<parameters>" prefix werkzeug stores for a hash method, with its defaults filled in.
+
+    Mirrors werkzeug.security._hash_internal, so "pbkdf2" becomes
+    "pbkdf2:sha256:<default iterations>" and "scrypt" "scrypt:32768:8:1".
+    Raises ValueError for a method werkzeug cannot hash with.
+    """
+    name, *args = method.split(":")
+    if name == "scrypt" and len(args) in (0, 3):
+        n, r, p = map(int, args) if args else (2**15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    if name == "pbkdf2" and len(args) <= 2:
+        hash_name = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Unsupported password hash method {method!r}")
+
+
+class HashingPoolSaturated(Exception):
+    """Raised instead of queueing when too many hash operations are already in flight"""
+
+
+class PasswordHasher:
+    """Runs PBKDF2/scrypt hashing in worker processes so request threads stay free.
+
+    At most `max_queue` operations may be queued or running; beyond that
+    hash()/verify() raise HashingPoolSaturated immediately so the caller can
+    answer 503 rather than pile up requests behind a login spike. The hash
+    method (and therefore its cost) comes from PASSWORD_HASH_METHOD; hashes
+    made with other parameters are reported by needs_rehash() so they can be
+    upgraded transparently on the next successful login.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, max_workers=None, max_queue=None, timeout=10.0):
+        self.method = method
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue or self.max_workers * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._method_prefix = method_prefix(method)
+
+    def init_app(self, app):
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        self.max_workers = app.config.get("PASSWORD_HASH_WORKERS", self.max_workers)
+        self.max_queue = app.config.get("PASSWORD_HASH_MAX_QUEUE", self.max_workers * 4)
+        self.timeout = app.config.get("PASSWORD_HASH_TIMEOUT", self.timeout)
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._method_prefix = method_prefix(self.method) # A misconfigured method fails at startup, not at the first login
+        atexit.register(self.shutdown)
+
+    def _get_executor(self):
+        # A pool inherited through fork is unusable, so each worker process creates its own
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    from concurrent.futures import ProcessPoolExecutor # Deferred: only needed once a password is hashed
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated()
+        try:
+            future = self._get_executor().submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashingPoolSaturated()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the stored hash was made with a different method or cost than configured"""
+        return password_hash.split("$", 1)[0] != self._method_prefix
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -1,14 +1,24 @@
 # Payment Routes for Charged Listings
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import os
 import sys
+import secrets
+import sqlite3
 from datetime import datetime, timedelta
+from decimal import Decimal
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.models.user import User
 from src.models.listing import Listing
+from src.models.payment_transaction import PaymentTransaction
+from src.models.listing_tiers import LISTING_TIERS
+from src.services import listing_events
+from src.services.response_cache import response_cache
+from src.services.payment_gateway import payment_gateway, InvalidNotificationError, PaymentGatewayNotConfigured
+from src.services.payment_queue import payment_queue
+from src.services.payment_worker import activate_tier
 
 # Placeholder for db.session, will be properly linked from main.py
 class DBPlaceholder:
@@ -20,26 +30,22 @@ db_placeholder = DBPlaceholder()
 
 payment_bp = Blueprint("payment_bp", __name__)
 
-# Define pricing tiers
-LISTING_TIERS = {
-    "standard": {
-        "price": 0,  # Free tier
-        "duration_days": 30,
-        "features": ["Basic listing", "Standard visibility"]
-    },
-    "premium": {
-        "price": 199.99,  # ZAR
-        "duration_days": 60,
-        "features": ["Premium listing", "Higher visibility", "Featured in search results"]
-    },
-    "featured": {
-        "price": 499.99,  # ZAR
-        "duration_days": 90,
-        "features": ["Top visibility", "Featured on homepage", "Social media promotion", "Professional photography"]
-    }
-}
+@payment_bp.errorhandler(PaymentGatewayNotConfigured)
+def payment_gateway_not_configured(e):
+    current_app.logger.error("Payments are disabled: %s", e)
+    return jsonify({"message": "Payments are not available right now"}), 503
+
+def _client_ip():
+    """The address the request came from, seen through PAYMENT_TRUSTED_PROXIES reverse proxies"""
+    proxies = current_app.config.get("PAYMENT_TRUSTED_PROXIES", 0)
+    if proxies <= 0:
+        return request.remote_addr
+    # Each trusted proxy appends the address it received the request from; anything further left is client-supplied
+    route = request.access_route
+    return route[-proxies] if len(route) >= proxies else None
 
 @payment_bp.route("/pricing/tiers", methods=["GET"])
+@response_cache.cached(lambda: ["pricing"], ttl=3600, mutable=False) # Tiers only change with a deploy
 def get_pricing_tiers():
     """Get all available pricing tiers and their details"""
     return jsonify({
@@ -50,10 +56,16 @@ def get_pricing_tiers():
 @payment_bp.route("/listings/<int:listing_id>/upgrade", methods=["POST"])
 @jwt_required()
 def upgrade_listing(listing_id):
-    """Upgrade a listing to a paid tier"""
+    """Start an upgrade of a listing to a paid tier.
+
+    Returns 202 with a signed checkout form for the gateway and a pending
+    transaction; the tier is applied by the payment worker once the gateway's
+    notification arrives. Free tiers are applied immediately.
+    """
     current_user_id = get_jwt_identity()
     if not current_user_id:
         return jsonify({"message": "Authentication required"}), 401
+    current_user_id = int(current_user_id) # Identities are strings; listing and transaction user ids are ints
     
     data = request.get_json()
     if not data or "tier" not in data:
@@ -62,16 +74,8 @@ def upgrade_listing(listing_id):
     requested_tier = data["tier"]
     if requested_tier not in LISTING_TIERS:
         return jsonify({"message": f"Invalid tier. Available tiers: {', '.join(LISTING_TIERS.keys())}"}), 400
-    
-    # Simulate payment processing
-    payment_successful = True  # In a real app, this would be the result of payment processing
-    payment_details = {
-        "transaction_id": f"TRANS-{datetime.now().strftime('%Y%m%d%H%M%S')}-{listing_id}",
-        "amount": LISTING_TIERS[requested_tier]["price"],
-        "currency": "ZAR",
-        "payment_method": data.get("payment_method", "credit_card"),
-        "status": "completed" if payment_successful else "failed"
-    }
+    tier = LISTING_TIERS[requested_tier]
+    reference = f"PS-{listing_id}-{secrets.token_hex(6)}"
     
     if db_placeholder.session:
         listing = Listing.query.get(listing_id)
@@ -81,61 +85,55 @@ def upgrade_listing(listing_id):
         if listing.user_id != current_user_id:
             return jsonify({"message": "Forbidden: You do not own this listing"}), 403
         
-        if payment_successful:
-            # Update listing with new tier information
-            listing.is_charged_listing = True
-            listing.listing_tier = requested_tier
-            listing.payment_status = "paid"
-            listing.transaction_id = payment_details["transaction_id"]
-            listing.payment_date = datetime.now()
-            
-            # Set expiry date based on tier duration
-            duration_days = LISTING_TIERS[requested_tier]["duration_days"]
-            listing.tier_expiry_date = datetime.now() + timedelta(days=duration_days)
-            
+        if tier["price"] == 0:
+            activate_tier(listing, requested_tier, reference, tier["duration_days"])
             db_placeholder.session.commit()
-            
+            listing_events.listing_saved(listing) # Refresh search/map indexes and cached listing responses
             return jsonify({
                 "message": "Listing upgraded successfully",
-                "payment": payment_details,
+                "payment": {"reference": reference, "amount": 0, "currency": "ZAR", "status": "complete"},
                 "listing": listing.to_dict(),
-                "tier_details": LISTING_TIERS[requested_tier]
+                "tier_details": tier
             }), 200
-        else:
-            return jsonify({
-                "message": "Payment failed",
-                "payment": payment_details
-            }), 400
+        
+        gateway = payment_gateway()
+        transaction = PaymentTransaction(reference=reference, listing_id=listing_id, user_id=current_user_id, tier=requested_tier,
+                                         amount=Decimal(str(tier["price"])), currency="ZAR", gateway=gateway.name, status="pending")
+        db_placeholder.session.add(transaction)
+        db_placeholder.session.commit()
+        return jsonify({
+            "message": "Payment started; the listing is upgraded once the payment is confirmed",
+            "payment": dict(transaction.to_dict(), checkout=gateway.checkout(transaction, f"Property Sunday {requested_tier} listing #{listing_id}")),
+            "tier_details": tier
+        }), 202
     else:
         print(f"Simulating listing upgrade for ID: {listing_id} to tier: {requested_tier}")
-        
-        if payment_successful:
-            # Simulate the updated listing
-            mock_listing = {
-                'id': listing_id,
-                'title': 'Simulated Upgraded Listing',
-                'price': '100000.00',
-                'address': '123 Premium St',
-                'user_id': current_user_id,
-                'is_charged_listing': True,
-                'listing_tier': requested_tier,
-                'payment_status': 'paid',
-                'transaction_id': payment_details["transaction_id"],
-                'payment_date': datetime.now().isoformat(),
-                'tier_expiry_date': (datetime.now() + timedelta(days=LISTING_TIERS[requested_tier]["duration_days"])).isoformat()
-            }
-            
-            return jsonify({
-                "message": "Listing upgrade simulated (DB not fully initialized)",
-                "payment": payment_details,
-                "listing": mock_listing,
-                "tier_details": LISTING_TIERS[requested_tier]
-            }), 200
-        else:
-            return jsonify({
-                "message": "Payment failed (simulated)",
-                "payment": payment_details
-            }), 400
+        return jsonify({
+            "message": "Listing upgrade simulated (DB not fully initialized)",
+            "payment": {"reference": reference, "listing_id": listing_id, "tier": requested_tier, "amount": tier["price"], "currency": "ZAR", "status": "pending"},
+            "tier_details": tier
+        }), 202
+
+@payment_bp.route("/notify/<gateway_name>", methods=["POST"])
+def payment_notification(gateway_name):
+    """Gateway webhook (PayFast ITN): verify the source and signature, journal the event and acknowledge at once.
+
+    The payment worker (`flask --app src.main process-payment-events`) applies
+    journaled events; a non-200 answer makes the gateway retry the delivery.
+    """
+    gateway = payment_gateway()
+    if gateway_name != gateway.name:
+        return jsonify({"message": "Unknown payment gateway"}), 404
+    try:
+        event = gateway.verify_notification(request.form.items(multi=True), _client_ip())
+    except InvalidNotificationError as e:
+        return jsonify({"message": str(e)}), 400
+    event_key = f"{event['reference']}:{event['gateway_payment_id']}:{event['status']}"
+    try:
+        payment_queue.append(gateway.name, event_key, event)
+    except sqlite3.Error:
+        return jsonify({"message": "Payment notifications cannot be recorded right now"}), 503
+    return jsonify({"message": "Notification received"}), 200
 
 @payment_bp.route("/listings/<int:listing_id>/payment-status", methods=["GET"])
 @jwt_required()
@@ -144,6 +142,7 @@ def get_listing_payment_status(listing_id):
     current_user_id = get_jwt_identity()
     if not current_user_id:
         return jsonify({"message": "Authentication required"}), 401
+    current_user_id = int(current_user_id) # Identities are strings; listing and transaction user ids are ints
     
     if db_placeholder.session:
         listing = Listing.query.get(listing_id)
@@ -158,13 +157,16 @@ def get_listing_payment_status(listing_id):
             "listing_tier": listing.listing_tier,
             "payment_status": listing.payment_status,
             "transaction_id": listing.transaction_id,
-            "payment_date": listing.payment_date.isoformat() if listing.payment_date else None,
-            "tier_expiry_date": listing.tier_expiry_date.isoformat() if listing.tier_expiry_date else None
+            "payment_date": listing.payment_date,
+            "tier_expiry_date": listing.tier_expiry_date
         }
         
         # Add tier details if applicable
         if listing.listing_tier and listing.listing_tier in LISTING_TIERS:
             payment_info["tier_details"] = LISTING_TIERS[listing.listing_tier]
+        transactions = PaymentTransaction.query.filter_by(listing_id=listing_id) \
+            .order_by(PaymentTransaction.date_created.desc(), PaymentTransaction.id.desc()).limit(5).all()
+        payment_info["transactions"] = [transaction.to_dict() for transaction in transactions]
         
         return jsonify({
             "message": "Payment status retrieved successfully",
@@ -0,0 +1,196 @@
+# Payment gateways: PayFast checkout forms and ITN (instant transaction notification) verification, plus a local fake
+import hashlib
+import hmac
+import ipaddress
+import urllib.request
+from decimal import Decimal
+from urllib.parse import quote_plus, urlencode
+
+from flask import current_app
+
+PAYFAST_LIVE_URL = "https://www.payfast.co.za/eng/process"
+PAYFAST_SANDBOX_URL = "https://sandbox.payfast.co.za/eng/process"
+PAYFAST_LIVE_VALIDATE_URL = "https://www.payfast.co.za/eng/query/validate"
+PAYFAST_SANDBOX_VALIDATE_URL = "https://sandbox.payfast.co.za/eng/query/validate"
+# Networks PayFast sends ITNs from (PAYFAST_VALID_NETWORKS overrides)
+PAYFAST_NETWORKS = ("197.97.145.144/28", "41.74.179.192/27", "102.216.36.0/28", "102.216.36.128/28", "144.126.193.139/32")
+# PayFast's public sandbox merchant, also used by the fake gateway
+SANDBOX_MERCHANT_ID = "10000100"
+SANDBOX_MERCHANT_KEY = "46f0cd694581a"
+
+# ITN payment_status -> PaymentTransaction.status; anything else (e.g. PENDING) leaves the transaction pending
+NOTIFICATION_STATUSES = {
+    "COMPLETE": "complete",
+    "FAILED": "failed",
+    "CANCELLED": "cancelled",
+}
+
+
+class InvalidNotificationError(ValueError):
+    """Raised for notifications that are unsigned, wrongly signed, from outside the gateway's networks or meant for another merchant"""
+
+
+class PaymentGatewayNotConfigured(Exception):
+    """Raised when live payments are selected without merchant credentials and a passphrase"""
+
+
+class PayFastGateway:
+    """Builds signed PayFast checkout forms and verifies ITN callbacks.
+
+    Both are pure computation: the browser posts the checkout form to PayFast
+    and PayFast posts the ITN back to the notify URL, so no request thread ever
+    waits on the gateway. The signature is the MD5 of the non-empty fields,
+    URL-encoded in the order they are sent, with the merchant passphrase
+    appended. Without the passphrase anyone could sign a notification, so live
+    mode refuses to start without it; the payment worker also confirms each
+    notification with PayFast's validate call before applying it.
+    """
+
+    name = "payfast"
+
+    def __init__(self, merchant_id, merchant_key, passphrase=None, sandbox=False, return_url=None, cancel_url=None, notify_url=None,
+                 valid_networks=PAYFAST_NETWORKS, timeout=10):
+        if not sandbox and (not merchant_id or not merchant_key or not passphrase or merchant_id == SANDBOX_MERCHANT_ID):
+            raise PaymentGatewayNotConfigured(
+                "PayFast needs PAYFAST_MERCHANT_ID, PAYFAST_MERCHANT_KEY and PAYFAST_PASSPHRASE (or PAYFAST_SANDBOX=true)"
+            )
+        self.merchant_id = merchant_id
+        self.merchant_key = merchant_key
+        self.passphrase = passphrase
+        self.process_url = PAYFAST_SANDBOX_URL if sandbox else PAYFAST_LIVE_URL
+        self.validate_url = PAYFAST_SANDBOX_VALIDATE_URL if sandbox else PAYFAST_LIVE_VALIDATE_URL
+        self.return_url = return_url
+        self.cancel_url = cancel_url
+        self.notify_url = notify_url
+        self.valid_networks = [ipaddress.ip_network(network) for network in valid_networks]
+        self.timeout = timeout
+
+    def signature(self, fields):
+        """MD5 signature of [(name, value), ...] in the order given"""
+        encoded = "&".join(f"{name}={quote_plus(str(value).strip())}" for name, value in fields
+                           if name != "signature" and value is not None and str(value).strip() != "")
+        if self.passphrase:
+            encoded += f"&passphrase={quote_plus(self.passphrase.strip())}"
+        return hashlib.md5(encoded.encode("utf-8")).hexdigest()
+
+    def checkout(self, transaction, item_name):
+        """The form the client posts to the gateway to pay for `transaction`"""
+        fields = [
+            ("merchant_id", self.merchant_id),
+            ("merchant_key", self.merchant_key),
+            ("return_url", self.return_url),
+            ("cancel_url", self.cancel_url),
+            ("notify_url", self.notify_url),
+            ("m_payment_id", transaction.reference),
+            ("amount", f"{transaction.amount:.2f}"),
+            ("item_name", item_name[:100]),
+            ("custom_int1", transaction.listing_id),
+            ("custom_str1", transaction.tier),
+        ]
+        fields = [(name, value) for name, value in fields if value is not None and str(value) != ""]
+        fields.append(("signature", self.signature(fields)))
+        # A list, not an object: the form must be posted in the signed order and JSON objects may be key-sorted
+        return {"gateway": self.name, "url": self.process_url, "method": "POST", "fields": fields}
+
+    def verify_notification(self, fields, remote_addr):
+        """Check an ITN's source address, signature and merchant; returns the event to queue.
+
+        `fields` are the posted (name, value) pairs in the order received.
+        PayFast's server-to-server validate call is network I/O, so it is made
+        by the payment worker (validate()) rather than in the request.
+        """
+        try:
+            address = ipaddress.ip_address(remote_addr or "")
+        except ValueError:
+            address = None
+        if address is None or not any(address in network for network in self.valid_networks):
+            raise InvalidNotificationError("Notification did not come from the payment gateway")
+        fields = list(fields)
+        values = dict(fields)
+        expected = self.signature(fields)
+        if not values.get("signature") or not hmac.compare_digest(values["signature"], expected):
+            raise InvalidNotificationError("Invalid notification signature")
+        if values.get("merchant_id") != self.merchant_id:
+            raise InvalidNotificationError("Notification is for another merchant")
+        if not values.get("m_payment_id") or not values.get("payment_status"):
+            raise InvalidNotificationError("Notification is missing m_payment_id or payment_status")
+        return {
+            "gateway": self.name,
+            "reference": values["m_payment_id"],
+            "gateway_payment_id": values.get("pf_payment_id"),
+            "status": values["payment_status"].upper(),
+            "amount": values.get("amount_gross"),
+            "fields": values,
+        }
+
+    def validate(self, fields):
+        """Ask PayFast whether it sent this notification; True for "VALID".
+
+        Network errors propagate so the worker retries the event later.
+        """
+        body = urlencode([(name, value) for name, value in fields.items() if name != "signature"]).encode("utf-8")
+        request = urllib.request.Request(self.validate_url, data=body, headers={"Content-Type": "application/x-www-form-urlencoded"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read().decode("utf-8", "replace").strip() == "VALID"
+
+
+class FakeGateway(PayFastGateway):
+    """PayFast-compatible gateway that never leaves the machine, for local development and tests.
+
+    Checkout forms point at the sandbox like PayFast's, and notification()
+    produces the signed ITN PayFast would post, to be sent to the app's own
+    notify endpoint (see the `fake-payment-notify` command). Notifications are
+    only accepted from the loopback interface, and validate() accepts every
+    signature not listed in `invalid_signatures`.
+    """
+
+    name = "fake"
+
+    def __init__(self, passphrase="fake-passphrase", **kwargs):
+        super().__init__(SANDBOX_MERCHANT_ID, SANDBOX_MERCHANT_KEY, passphrase=passphrase, sandbox=True,
+                         valid_networks=("127.0.0.0/8", "::1/128"), **kwargs)
+        self._next_payment_id = 1
+        self.invalid_signatures = set() # Notifications validate() reports as not sent by the gateway
+
+    def notification(self, transaction, status="COMPLETE", amount=None):
+        """Signed ITN fields for a transaction, as PayFast would post them"""
+        gross = Decimal(str(amount if amount is not None else transaction.amount))
+        fields = [
+            ("m_payment_id", transaction.reference),
+            ("pf_payment_id", f"FAKE-{transaction.id}-{self._next_payment_id}"),
+            ("payment_status", status),
+            ("item_name", f"{transaction.tier} listing #{transaction.listing_id}"),
+            ("amount_gross", f"{gross:.2f}"),
+            ("amount_fee", "0.00"),
+            ("amount_net", f"{gross:.2f}"),
+            ("custom_int1", transaction.listing_id),
+            ("custom_str1", transaction.tier),
+            ("merchant_id", self.merchant_id),
+        ]
+        self._next_payment_id += 1
+        fields.append(("signature", self.signature(fields)))
+        return fields
+
+    def validate(self, fields):
+        return fields.get("signature") not in self.invalid_signatures
+
+
+def payment_gateway(app=None):
+    """The gateway selected by PAYMENT_GATEWAY, built once per app; raises PaymentGatewayNotConfigured"""
+    app = app or current_app._get_current_object()
+    gateway = app.extensions.get("payment_gateway")
+    if gateway is None:
+        config = app.config
+        urls = {"return_url": config.get("PAYMENT_RETURN_URL"), "cancel_url": config.get("PAYMENT_CANCEL_URL"),
+                "notify_url": config.get("PAYMENT_NOTIFY_URL")}
+        networks = config.get("PAYFAST_VALID_NETWORKS") or PAYFAST_NETWORKS
+        if config.get("PAYMENT_GATEWAY", "payfast") == "fake":
+            gateway = FakeGateway(**urls)
+        elif config.get("PAYFAST_SANDBOX", False):
+            gateway = PayFastGateway(config.get("PAYFAST_MERCHANT_ID") or SANDBOX_MERCHANT_ID, config.get("PAYFAST_MERCHANT_KEY") or SANDBOX_MERCHANT_KEY,
+                                     passphrase=config.get("PAYFAST_PASSPHRASE"), sandbox=True, valid_networks=networks, **urls)
+        else:
+            gateway = PayFastGateway(config.get("PAYFAST_MERCHANT_ID"), config.get("PAYFAST_MERCHANT_KEY"), passphrase=config.get("PAYFAST_PASSPHRASE"),
+                                     sandbox=False, valid_networks=networks, **urls)
+        app.extensions["payment_gateway"] = gateway
+    return gateway
@@ -0,0 +1,140 @@
+# Durable local journal of verified payment notifications, drained by the payment worker
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+QueuedEvent = namedtuple("QueuedEvent", ["id", "gateway", "payload", "attempts"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS payment_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    gateway TEXT NOT NULL,
+    event_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    received_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    claimed_by TEXT,
+    done_at REAL,
+    error TEXT,
+    UNIQUE (gateway, event_key)
+);
+CREATE INDEX IF NOT EXISTS ix_payment_events_pending ON payment_events (done_at, available_at, id);
+"""
+
+
+class PaymentEventQueue:
+    """Append-only SQLite journal that webhook requests write to and payment workers drain.
+
+    append() is one small fsynced INSERT (WAL, synchronous=FULL), so a webhook
+    can acknowledge the gateway as soon as it returns, and the notification
+    survives a crash of the web worker, the payment worker or the database
+    server. Repeated deliveries of the same notification collapse on
+    (gateway, event_key). Workers claim a batch with a lease; events whose
+    worker dies become available again when the lease runs out, and failed
+    events are retried with exponential backoff up to `max_attempts`.
+
+    The file is local to the host, so run the payment worker next to the web
+    workers (any number of processes on the host can share it).
+    """
+
+    def __init__(self, path=None, lease_seconds=60, max_attempts=8):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+    def init_app(self, app):
+        self.path = app.config.get("PAYMENT_QUEUE_PATH") or os.path.join(app.instance_path, "payment_events.sqlite3")
+        self.max_attempts = app.config.get("PAYMENT_EVENT_MAX_ATTEMPTS", self.max_attempts)
+
+    def _connection(self):
+        # One connection per thread and process; a connection inherited through fork, or to a previous path, must not be reused
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid() or self._local.path != self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            self._local.path = self.path
+        return connection
+
+    def append(self, gateway, event_key, payload):
+        """Durably record a notification; returns False if it was already recorded"""
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT OR IGNORE INTO payment_events (gateway, event_key, payload, received_at, available_at) VALUES (?, ?, ?, ?, ?)",
+            (gateway, event_key, json.dumps(payload), now, now),
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, limit=100, worker=None):
+        """Lease up to `limit` due events, oldest first, to this worker"""
+        worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE") # Serializes claimers so two workers never lease the same event
+        try:
+            rows = connection.execute(
+                "SELECT id, gateway, payload, attempts FROM payment_events WHERE done_at IS NULL AND available_at <= ? ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            if rows:
+                connection.executemany(
+                    "UPDATE payment_events SET claimed_by = ?, available_at = ? WHERE id = ?",
+                    [(worker, now + self.lease_seconds, row[0]) for row in rows],
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return [QueuedEvent(row[0], row[1], json.loads(row[2]), row[3]) for row in rows]
+
+    def complete(self, event_ids, error=None):
+        """Mark events done; `error` records why an event was dropped instead of applied"""
+        self._connection().executemany(
+            "UPDATE payment_events SET done_at = ?, error = ?, claimed_by = NULL WHERE id = ?",
+            [(time.time(), error, event_id) for event_id in event_ids],
+        )
+
+    def retry(self, event, error):
+        """Release a failed event for a later attempt, or give up on it after max_attempts"""
+        attempts = event.attempts + 1
+        now = time.time()
+        if attempts >= self.max_attempts:
+            logger.error("Giving up on payment event %s after %d attempts: %s", event.id, attempts, error)
+            self._connection().execute(
+                "UPDATE payment_events SET attempts = ?, error = ?, done_at = ?, claimed_by = NULL WHERE id = ?",
+                (attempts, error, now, event.id),
+            )
+            return
+        self._connection().execute(
+            "UPDATE payment_events SET attempts = ?, error = ?, available_at = ?, claimed_by = NULL WHERE id = ?",
+            (attempts, error, now + min(5 * 2 ** attempts, 3600), event.id),
+        )
+
+    def purge(self, older_than_days=30):
+        """Delete events finished more than `older_than_days` ago; returns how many"""
+        cursor = self._connection().execute(
+            "DELETE FROM payment_events WHERE done_at IS NOT NULL AND done_at < ?", (time.time() - older_than_days * 86400,)
+        )
+        return cursor.rowcount
+
+    def stats(self):
+        row = self._connection().execute(
+            "SELECT SUM(done_at IS NULL), SUM(done_at IS NOT NULL AND error IS NULL), SUM(done_at IS NOT NULL AND error IS NOT NULL) FROM payment_events"
+        ).fetchone()
+        return {"pending": row[0] or 0, "applied": row[1] or 0, "dropped": row[2] or 0}
+
+
+payment_queue = PaymentEventQueue()
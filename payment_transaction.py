@@ -0,0 +1,45 @@
+# Payment Transaction Model (one checkout for a listing tier, settled by gateway notifications)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.user import db
+
+# pending until the gateway's notification is applied; the other states are final
+TRANSACTION_STATUSES = ('pending', 'complete', 'failed', 'cancelled')
+
+class PaymentTransaction(db.Model):
+    __tablename__ = 'payment_transactions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    reference = db.Column(db.String(100), nullable=False, unique=True) # Our payment id (PayFast m_payment_id); Listing.transaction_id
+    listing_id = db.Column(db.Integer, db.ForeignKey('listings.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    tier = db.Column(db.String(50), nullable=False)
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default='ZAR')
+    gateway = db.Column(db.String(50), nullable=False) # e.g. payfast, fake
+    gateway_payment_id = db.Column(db.String(100), nullable=True) # PayFast pf_payment_id, set by the notification
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    failure_reason = db.Column(db.String(255), nullable=True)
+    date_created = db.Column(db.DateTime, server_default=db.func.now())
+    date_settled = db.Column(db.DateTime, nullable=True) # When the notification was applied
+
+    def __repr__(self):
+        return f'<PaymentTransaction {self.reference} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'reference': self.reference,
+            'listing_id': self.listing_id,
+            'tier': self.tier,
+            'amount': self.amount,
+            'currency': self.currency,
+            'gateway': self.gateway,
+            'gateway_payment_id': self.gateway_payment_id,
+            'status': self.status,
+            'failure_reason': self.failure_reason,
+            'date_created': self.date_created,
+            'date_settled': self.date_settled
+        }
@@ -0,0 +1,153 @@
+# Applies queued payment notifications to PaymentTransaction and Listing rows, in batches and idempotently
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from src.models.listing import Listing
+from src.models.listing_tiers import LISTING_TIERS
+from src.models.payment_transaction import PaymentTransaction
+from src.services import listing_events
+from src.services.payment_gateway import NOTIFICATION_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentEventError(Exception):
+    """A notification that can never be applied (unknown reference, wrong gateway); it is dropped, not retried"""
+
+
+def activate_tier(listing, tier, reference, duration_days, now=None):
+    """Put a listing on a paid tier for `duration_days` from now"""
+    now = now or datetime.now() # Expiry dates are stored in server local time (see tier_sweeper)
+    listing.is_charged_listing = True
+    listing.listing_tier = tier
+    listing.payment_status = "paid"
+    listing.transaction_id = reference
+    listing.payment_date = now
+    listing.tier_expiry_date = now + timedelta(days=duration_days)
+
+
+def apply_payment_event(session, event, now=None):
+    """Apply one notification inside the caller's transaction; returns the listing it changed, if any.
+
+    Only a pending transaction is ever settled, so a repeated, late or
+    replayed notification is a no-op.
+    """
+    now = now or datetime.now()
+    transaction = session.query(PaymentTransaction).filter_by(reference=event["reference"]).with_for_update().first()
+    if transaction is None:
+        raise PaymentEventError(f"Unknown payment reference {event['reference']!r}")
+    if transaction.gateway != event["gateway"]:
+        raise PaymentEventError(f"Payment {transaction.reference} was not made through {event['gateway']}")
+    status = NOTIFICATION_STATUSES.get(event["status"])
+    if transaction.status != "pending" or status is None:
+        return None
+
+    transaction.gateway_payment_id = event.get("gateway_payment_id")
+    transaction.date_settled = now
+    if status == "complete":
+        try:
+            amount = Decimal(event.get("amount") or "")
+        except InvalidOperation:
+            amount = None
+        if amount != transaction.amount:
+            transaction.status = "failed"
+            transaction.failure_reason = f"Amount paid ({event.get('amount')}) does not match {transaction.amount}"
+            logger.warning("Payment %s: %s", transaction.reference, transaction.failure_reason)
+            return None
+    transaction.status = status
+
+    listing = session.get(Listing, transaction.listing_id)
+    if listing is None:
+        return None
+    if status == "complete":
+        activate_tier(listing, transaction.tier, transaction.reference, LISTING_TIERS[transaction.tier]["duration_days"], now)
+    elif listing.payment_status != "paid":
+        listing.payment_status = status # A failed retry must not downgrade a tier that is already paid for
+    return listing
+
+
+def _apply_one(session, queue, event):
+    try:
+        listing = apply_payment_event(session, event.payload)
+        session.commit()
+    except PaymentEventError as e:
+        session.rollback()
+        queue.complete([event.id], error=str(e))
+        logger.warning("Dropped payment event %s: %s", event.id, e)
+        return None, False
+    except Exception as e:
+        session.rollback()
+        queue.retry(event, repr(e))
+        logger.exception("Payment event %s failed; it will be retried", event.id)
+        return None, False
+    queue.complete([event.id])
+    return listing, True
+
+
+def _confirmed(queue, gateway, events):
+    """The events the gateway confirms it sent; the rest are dropped, or retried if the gateway could not be asked"""
+    confirmed = []
+    for event in events:
+        if event.gateway != gateway.name:
+            queue.complete([event.id], error=f"Received through {event.gateway}, but {gateway.name} is configured")
+            continue
+        try:
+            valid = gateway.validate(event.payload["fields"])
+        except Exception as e:
+            queue.retry(event, f"Validation failed: {e!r}")
+            logger.warning("Could not validate payment event %s with %s: %r", event.id, gateway.name, e)
+            continue
+        if valid:
+            confirmed.append(event)
+        else:
+            queue.complete([event.id], error="Not confirmed by the gateway")
+            logger.warning("Dropped payment event %s: %s did not confirm it", event.id, gateway.name)
+    return confirmed
+
+
+def process_payment_events(session, queue, gateway, batch_size=100, max_batches=None):
+    """Drain due events from the queue; returns counts.
+
+    Every event is first confirmed with the gateway (PayFast's validate call),
+    outside any database transaction, so a slow gateway never holds row
+    locks. Each claimed batch is then applied in one database transaction and
+    marked done in the queue. If the batch fails, its events are re-applied
+    one per transaction so a single bad event cannot hold up the rest. A
+    worker that dies between the two commits leaves its events to be claimed
+    again, which is harmless because applying an event twice changes nothing.
+    """
+    applied = failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        claimed = queue.claim(batch_size)
+        if not claimed:
+            break
+        batches += 1
+        events = _confirmed(queue, gateway, claimed)
+        failed += len(claimed) - len(events)
+        changed = []
+        try:
+            for event in events:
+                listing = apply_payment_event(session, event.payload)
+                if listing is not None:
+                    changed.append(listing)
+            session.commit()
+            queue.complete([event.id for event in events])
+            applied += len(events)
+        except Exception:
+            session.rollback()
+            changed = []
+            for event in events:
+                listing, ok = _apply_one(session, queue, event)
+                applied += ok
+                failed += not ok
+                if listing is not None:
+                    changed.append(listing)
+        for listing in changed:
+            listing_events.listing_saved(listing) # Featured ranking, search indexes and cached listing responses
+        if len(claimed) < batch_size:
+            break
+
+    if applied or failed:
+        logger.info("Processed %d payment events (%d failed) in %d batches", applied + failed, failed, batches)
+    return {"applied": applied, "failed": failed, "batches": batches}
@@ -0,0 +1,114 @@
+# EXPLAIN-based regression check for the SQL issued by listing endpoints (run with `flask --app src.main check-query-plans`)
+import logging
+import re
+from contextlib import contextmanager
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from src.models.listing import Listing
+from src.models.user import db, User
+
+logger = logging.getLogger(__name__)
+
+# (name, path, needs_auth, tables allowed to be scanned and why)
+ENDPOINT_CHECKS = [
+    ("latest listings", "/api/listings/listings", False, {}),
+    ("latest listings, deep page", "/api/listings/listings?page=20", False, {}),
+    ("latest listings, cursor", "/api/listings/listings?pagination=cursor", False, {}),
+    ("property type and price range", "/api/listings/listings?property_type=House&min_price=1000000&max_price=3000000", False, {}),
+    ("bedrooms", "/api/listings/listings?bedrooms=3", False, {}),
+    ("province", "/api/listings/listings?province=gauteng", False, {}),
+    ("province and property type", "/api/listings/listings?province=western&property_type=House", False, {}),
+    ("minimum price", "/api/listings/listings?min_price=5000000", False, {}),
+    ("listing tier", "/api/listings/listings?listing_tier=premium", False, {}),
+    ("city substring", "/api/listings/listings?city=cape", False,
+     {"listings": "leading-wildcard ILIKE cannot use a B-tree index; use search= for text matching"}),
+    ("listing detail", "/api/listings/listings/{listing_id}", False, {}),
+    ("my listings", "/api/listings/listings/my-listings", True, {}),
+    ("facets, property type", "/api/listings/facets?property_type=House", False, {}),
+]
+
+_SELECT_RE = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+
+@contextmanager
+def capture_selects(engine):
+    """Collect (statement, parameters) for every SELECT run on the engine inside the block"""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _SELECT_RE.match(statement) and not executemany:
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def full_scans(connection, statement, parameters):
+    """Tables the database would read in full for a statement, and the raw plan lines"""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+        plan = [row[-1] for row in rows]
+        # "SCAN listings" is a table scan; "SCAN listings USING [COVERING] INDEX ..." walks an index in order
+        scanned = {match.group(1) for line in plan for match in [re.match(r"SCAN (\w+)$", line)] if match}
+        return scanned, plan
+    if dialect == "mysql":
+        result = connection.exec_driver_sql("EXPLAIN " + statement, parameters)
+        rows = [dict(zip(result.keys(), row)) for row in result]
+        plan = [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row.get('Extra') or ''}" for row in rows]
+        return {row["table"] for row in rows if row["type"] == "ALL"}, plan
+    if dialect == "postgresql":
+        plan = [row[0] for row in connection.exec_driver_sql("EXPLAIN " + statement, parameters)]
+        scanned = {match.group(1) for line in plan for match in [re.search(r"Seq Scan on (\w+)", line)] if match}
+        return scanned, plan
+    raise ValueError(f"EXPLAIN checks are not implemented for {dialect}")
+
+
+def check_query_plans(app):
+    """Replay the ENDPOINT_CHECKS requests and EXPLAIN each SELECT they issue.
+
+    Every request is made once to warm the in-process indexes (whose periodic
+    rebuild is a deliberate full scan), then again with the response cache off
+    while its statements are captured. Returns a list of result dicts; a check
+    fails when a statement scans a table not listed in its allowed scans. Run
+    it against a database with realistic data volumes: on near-empty tables
+    planners legitimately prefer full scans.
+    """
+    from src.services.response_cache import response_cache
+
+    listing = db.session.query(Listing.id, Listing.user_id).order_by(Listing.id.desc()).first()
+    if listing is None:
+        raise RuntimeError("The listings table is empty; load data before checking query plans")
+    owner = db.session.get(User, listing.user_id)
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(owner.id))}"}
+
+    cache_enabled = response_cache.enabled
+    response_cache.enabled = False
+    results = []
+    try:
+        for name, path, needs_auth, allowed in ENDPOINT_CHECKS:
+            url = path.format(listing_id=listing.id)
+            request_headers = headers if needs_auth else {}
+            client.get(url, headers=request_headers)
+            with capture_selects(db.engine) as captured:
+                response = client.get(url, headers=request_headers)
+            statements = []
+            failed = response.status_code != 200
+            with db.engine.connect() as connection:
+                for statement, parameters in captured:
+                    scanned, plan = full_scans(connection, statement, parameters)
+                    unexpected = sorted(scanned - set(allowed))
+                    failed = failed or bool(unexpected)
+                    statements.append({"sql": statement, "plan": plan, "full_scans": sorted(scanned), "unexpected": unexpected})
+            results.append({"name": name, "url": url, "status": response.status_code, "ok": not failed,
+                            "allowed": allowed, "statements": statements})
+    finally:
+        response_cache.enabled = cache_enabled
+    logger.info("Checked query plans for %d endpoints", len(results))
+    return results
@@ -0,0 +1,237 @@
+# Read-through response cache for public GET endpoints, with tag-based invalidation and ETags
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+from src.services.response_compression import response_compression
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    __slots__ = ("status", "body", "mimetype", "etag", "encoding")
+
+    def __init__(self, status, body, mimetype, etag, encoding=None):
+        self.status = status
+        self.body = body # Stored encoded, so hits are not recompressed
+        self.mimetype = mimetype
+        self.etag = etag # Of the identity body
+        self.encoding = encoding
+
+
+class LRUBackend:
+    """In-process LRU with per-entry TTL, bounded by entry count and total body bytes"""
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._bytes += len(value.body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value.body)
+
+    def generation(self, tag):
+        return self._generations.get(tag, 0)
+
+    def bump_generation(self, tag):
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def size(self):
+        return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+class RedisBackend:
+    """Shared backend so every worker sees the same entries and invalidations (requires `redis`)"""
+
+    def __init__(self, url, prefix="ps:cache:"):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        if raw is None:
+            return None
+        header, _, body = raw.partition(b"\n")
+        status, mimetype, etag, encoding = json.loads(header)
+        return CachedResponse(status, body, mimetype, etag, encoding)
+
+    def set(self, key, value, ttl):
+        header = json.dumps([value.status, value.mimetype, value.etag, value.encoding]).encode("utf-8")
+        self._client.setex(self._prefix + key, max(int(ttl), 1), header + b"\n" + value.body)
+
+    def generation(self, tag):
+        return int(self._client.get(self._prefix + "gen:" + tag) or 0)
+
+    def bump_generation(self, tag):
+        self._client.incr(self._prefix + "gen:" + tag)
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + "*"):
+            self._client.delete(key)
+
+    def size(self):
+        return {}
+
+
+class ResponseCache:
+    """Caches full GET responses keyed by path and normalized query args.
+
+    Every entry is filed under tags (e.g. "listings", "listing:42"). Invalidating
+    a tag bumps its generation, which is folded into the key of every entry
+    carrying it, so stale entries become unreachable immediately and age out
+    through LRU/TTL. Responses carry a strong ETag and answer If-None-Match with
+    304 Not Modified.
+
+    The in-process backend only sees invalidations made by its own process. When
+    several workers serve the app without the Redis backend, views of mutable
+    resources are therefore not cached at all; only `mutable=False` views are.
+    Entries are stored compressed in the encoding the client negotiated.
+    """
+
+    def __init__(self, backend=None, default_ttl=60):
+        self.backend = backend or LRUBackend()
+        self.default_ttl = default_ttl
+        self.enabled = False
+        self.cache_mutable = True
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get("RESPONSE_CACHE_ENABLED", True)
+        self.default_ttl = app.config.get("RESPONSE_CACHE_TTL", self.default_ttl)
+        self.backend = None
+        redis_url = app.config.get("RESPONSE_CACHE_REDIS_URL")
+        if redis_url:
+            try:
+                self.backend = RedisBackend(redis_url)
+            except ImportError:
+                logger.warning("RESPONSE_CACHE_REDIS_URL is set but redis is not installed; using the in-process cache")
+        if self.backend is None:
+            self.backend = LRUBackend(
+                max_entries=app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 10000),
+                max_bytes=app.config.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+            )
+        # Another worker's edit would not reach this process's LRU, so its listing responses could stay stale for the TTL
+        self.cache_mutable = isinstance(self.backend, RedisBackend) or app.config.get("WEB_CONCURRENCY", 1) <= 1
+        if self.enabled and not self.cache_mutable:
+            logger.warning("%s workers share no response cache backend; set RESPONSE_CACHE_REDIS_URL to cache listing responses",
+                           app.config.get("WEB_CONCURRENCY"))
+
+    def _key(self, tags, lowercase_args, encoding):
+        args = []
+        for name in sorted(set(request.args.keys())):
+            for value in request.args.getlist(name):
+                value = value.strip()
+                if value:
+                    args.append((name, value.lower() if name in lowercase_args else value))
+        generations = [(tag, self.backend.generation(tag)) for tag in tags]
+        raw = json.dumps([request.path, args, generations, encoding], separators=(",", ":"))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            try:
+                self.backend.bump_generation(tag)
+            except Exception:
+                logger.exception("Failed to invalidate cache tag %s", tag)
+
+    def stats(self):
+        stats = {"hits": self.hits, "misses": self.misses, "evictions": self.backend.evictions}
+        stats.update(self.backend.size())
+        return stats
+
+    def cached(self, tags, ttl=None, lowercase_args=(), mutable=True):
+        """Decorate a GET view; `tags` is a callable receiving the view's URL kwargs.
+
+        Pass mutable=False only for responses that never need invalidating.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != "GET" or (mutable and not self.cache_mutable):
+                    return view(*args, **kwargs)
+
+                key = None
+                entry = None
+                encoding = response_compression.accepted_encoding()
+                try:
+                    key = self._key(tags(**kwargs), lowercase_args, encoding)
+                    entry = self.backend.get(key)
+                except Exception:
+                    logger.exception("Response cache lookup failed")
+
+                if entry is not None:
+                    self.hits += 1
+                    status = "HIT"
+                else:
+                    self.misses += 1
+                    status = "MISS"
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or key is None:
+                        return response
+                    body = response.get_data()
+                    etag = hashlib.sha1(body).hexdigest()
+                    if not response_compression.should_compress(response, encoding):
+                        encoding = None
+                    else:
+                        body, encoding = response_compression.encode(body, encoding)
+                    entry = CachedResponse(response.status_code, body, response.mimetype, etag, encoding)
+                    try:
+                        self.backend.set(key, entry, ttl or self.default_ttl)
+                    except Exception:
+                        logger.exception("Response cache store failed")
+
+                response = Response(entry.body, status=entry.status, mimetype=entry.mimetype)
+                response.vary.add("Accept-Encoding")
+                if entry.encoding:
+                    response.headers["Content-Encoding"] = entry.encoding
+                response.set_etag(entry.etag, weak=bool(entry.encoding)) # The encoded bytes differ from the identity body
+                response.headers["Cache-Control"] = "public, no-cache"
+                response.headers["X-Cache"] = status
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
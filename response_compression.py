@@ -0,0 +1,89 @@
+# On-the-fly gzip/brotli compression of larger API responses, negotiated from Accept-Encoding
+import gzip
+import re
+
+from flask import request
+
+try:
+    import brotli
+except ImportError: # Optional; gzip is used when brotli is unavailable
+    brotli = None
+
+COMPRESSIBLE_TYPES = re.compile(r"^(application/(json|javascript|xml|x-ndjson)|text/)")
+
+
+class ResponseCompression:
+    """Compresses response bodies of at least COMPRESS_MIN_BYTES.
+
+    Small bodies are left alone: below roughly a kilobyte the saving does not
+    cover the CPU time and framing overhead. Brotli (when installed) is used at
+    a fast quality level in preference to gzip. A strong ETag becomes weak,
+    since the encoded bytes differ from the identity body; werkzeug compares
+    If-None-Match weakly for GET, so conditional requests keep returning 304.
+    Streamed, already-encoded and non-text responses pass through, as do
+    responses that already vary on Accept-Encoding: the response cache stores
+    its entries encoded and serves them as they are.
+    """
+
+    def __init__(self, min_bytes=1024, gzip_level=5, brotli_quality=4):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.enabled = True
+
+    def init_app(self, app):
+        self.enabled = app.config.get("COMPRESS_ENABLED", self.enabled)
+        self.min_bytes = app.config.get("COMPRESS_MIN_BYTES", self.min_bytes)
+        self.gzip_level = app.config.get("COMPRESS_GZIP_LEVEL", self.gzip_level)
+        self.brotli_quality = app.config.get("COMPRESS_BROTLI_QUALITY", self.brotli_quality)
+        app.after_request(self._compress)
+
+    def accepted_encoding(self):
+        """The encoding this request's responses get, or None"""
+        if not self.enabled:
+            return None
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return None
+
+    def should_compress(self, response, encoding):
+        return (encoding is not None and response.status_code == 200 and not response.is_streamed
+                and (response.content_length or 0) >= self.min_bytes and COMPRESSIBLE_TYPES.match(response.mimetype or "") is not None)
+
+    def compress(self, body, encoding):
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def encode(self, body, encoding):
+        """(body, encoding) to send: the identity body with None when compressing would not shrink it"""
+        compressed = self.compress(body, encoding)
+        if len(compressed) >= len(body):
+            return body, None
+        return compressed, encoding
+
+    def _compress(self, response):
+        if (not self.enabled or response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or "Content-Encoding" in response.headers or "Accept-Encoding" in response.vary
+                or not COMPRESSIBLE_TYPES.match(response.mimetype or "")):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self.accepted_encoding()
+        if not self.should_compress(response, encoding):
+            return response
+
+        body, encoding = self.encode(response.get_data(), encoding)
+        if encoding is None:
+            return response
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+response_compression = ResponseCompression()
@@ -0,0 +1,68 @@
+# Saved Search Models (structured listing alerts and the queue of listings they matched)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.user import db
+
+class SavedSearch(db.Model):
+    __tablename__ = 'saved_searches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=True)
+    # Predicates, with the same meaning as the get_listings query args; NULL means "any"
+    city = db.Column(db.String(100), nullable=True) # Case-insensitive substring
+    province = db.Column(db.String(100), nullable=True) # Case-insensitive substring
+    property_type = db.Column(db.String(50), nullable=True)
+    min_price = db.Column(db.Numeric(10, 2), nullable=True)
+    max_price = db.Column(db.Numeric(10, 2), nullable=True)
+    bedrooms = db.Column(db.Integer, nullable=True)
+    search = db.Column(db.String(200), nullable=True) # Free-text terms; every term must occur
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    date_created = db.Column(db.DateTime, server_default=db.func.now())
+    date_updated = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+    def __repr__(self):
+        return f'<SavedSearch {self.id} of user {self.user_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'name': self.name,
+            'city': self.city,
+            'province': self.province,
+            'property_type': self.property_type,
+            'min_price': self.min_price,
+            'max_price': self.max_price,
+            'bedrooms': self.bedrooms,
+            'search': self.search,
+            'is_active': self.is_active,
+            'date_created': self.date_created
+        }
+
+class SavedSearchMatch(db.Model):
+    __tablename__ = 'saved_search_matches'
+    __table_args__ = (
+        db.UniqueConstraint('saved_search_id', 'listing_id', name='uq_saved_search_matches_search_listing'),
+        db.Index('ix_saved_search_matches_notified_at', 'notified_at', 'saved_search_id'), # Digest queue scan
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    saved_search_id = db.Column(db.Integer, db.ForeignKey('saved_searches.id', ondelete='CASCADE'), nullable=False)
+    listing_id = db.Column(db.Integer, db.ForeignKey('listings.id', ondelete='CASCADE'), nullable=False, index=True)
+    date_matched = db.Column(db.DateTime, server_default=db.func.now())
+    notified_at = db.Column(db.DateTime, nullable=True) # NULL while queued for the next digest
+
+    def __repr__(self):
+        return f'<SavedSearchMatch {self.saved_search_id} -> {self.listing_id}>'
+
+    def to_dict(self):
+        return {
+            'saved_search_id': self.saved_search_id,
+            'listing_id': self.listing_id,
+            'date_matched': self.date_matched,
+            'notified_at': self.notified_at
+        }
@@ -0,0 +1,128 @@
+# Saved Search Routes (listing alerts: create, list, delete, and the listings each search has matched)
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from decimal import Decimal, InvalidOperation
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.saved_search import SavedSearch, SavedSearchMatch
+from src.services.search_percolator import saved_search_percolator
+
+# Placeholder for db.session, will be properly linked from main.py
+class DBPlaceholder:
+    session = None
+
+db_placeholder = DBPlaceholder()
+
+saved_search_bp = Blueprint("saved_search_bp", __name__)
+
+TEXT_FIELDS = {"name": 100, "city": 100, "province": 100, "property_type": 50, "search": 200}
+PREDICATE_FIELDS = ("city", "province", "property_type", "min_price", "max_price", "bedrooms", "search")
+
+def _saved_search_values(data):
+    """Validated SavedSearch column values from a request body; returns (values, None) or (None, error message)"""
+    values = {}
+    for field, max_length in TEXT_FIELDS.items():
+        value = data.get(field)
+        if value is None or str(value).strip() == "":
+            values[field] = None
+        elif len(str(value).strip()) > max_length:
+            return None, f"{field} may be at most {max_length} characters"
+        else:
+            values[field] = str(value).strip()
+    for field in ("min_price", "max_price"):
+        try:
+            values[field] = Decimal(str(data[field])) if data.get(field) not in (None, "") else None
+        except InvalidOperation:
+            return None, f"Invalid {field} format"
+        if values[field] is not None and values[field] < 0:
+            return None, f"{field} must not be negative"
+    if values["min_price"] is not None and values["max_price"] is not None and values["min_price"] > values["max_price"]:
+        return None, "min_price must not exceed max_price"
+    try:
+        values["bedrooms"] = int(data["bedrooms"]) if data.get("bedrooms") not in (None, "") else None
+    except (TypeError, ValueError):
+        return None, "Invalid bedrooms format"
+    if all(values[field] is None for field in PREDICATE_FIELDS):
+        return None, "A saved search needs at least one criterion"
+    return values, None
+
+@saved_search_bp.route("", methods=["POST"])
+@jwt_required()
+def create_saved_search():
+    current_user_id = get_jwt_identity()
+    if not current_user_id:
+        return jsonify({"message": "Authentication required"}), 401
+    values, error = _saved_search_values(request.get_json() or {})
+    if error:
+        return jsonify({"message": error}), 400
+
+    if db_placeholder.session: # In a real app, this would be `db.session`
+        limit = current_app.config.get("SAVED_SEARCH_LIMIT", 25)
+        if SavedSearch.query.filter_by(user_id=current_user_id).count() >= limit:
+            return jsonify({"message": f"You can keep at most {limit} saved searches"}), 400
+        saved_search = SavedSearch(user_id=current_user_id, **values)
+        db_placeholder.session.add(saved_search)
+        db_placeholder.session.commit()
+        saved_search_percolator.search_saved(saved_search)
+        return jsonify({"message": "Saved search created successfully", "saved_search": saved_search.to_dict()}), 201
+    else:
+        print(f"Simulating saved search creation: {values}")
+        return jsonify({"message": "Saved search creation simulated (DB not fully initialized)", "saved_search": values}), 201
+
+@saved_search_bp.route("", methods=["GET"])
+@jwt_required()
+def get_saved_searches():
+    current_user_id = get_jwt_identity()
+    if not current_user_id:
+        return jsonify({"message": "Authentication required"}), 401
+
+    if db_placeholder.session: # In a real app, this would be `db.session`
+        saved_searches = SavedSearch.query.filter_by(user_id=current_user_id).order_by(SavedSearch.id).all()
+        return jsonify({"message": "Saved searches retrieved successfully", "saved_searches": [s.to_dict() for s in saved_searches]}), 200
+    else:
+        print(f"Simulating fetching saved searches for user_id: {current_user_id}")
+        return jsonify({"message": "Saved search retrieval simulated (DB not fully initialized)", "saved_searches": []}), 200
+
+@saved_search_bp.route("/<int:search_id>", methods=["DELETE"])
+@jwt_required()
+def delete_saved_search(search_id):
+    current_user_id = get_jwt_identity()
+    if not current_user_id:
+        return jsonify({"message": "Authentication required"}), 401
+
+    if db_placeholder.session: # In a real app, this would be `db.session`
+        saved_search = db_placeholder.session.get(SavedSearch, search_id)
+        if not saved_search or saved_search.user_id != int(current_user_id): # Identities are strings, the ids ints
+            return jsonify({"message": "Saved search not found"}), 404
+        # Delete queued matches explicitly: SQLite does not enforce ON DELETE CASCADE by default
+        SavedSearchMatch.query.filter_by(saved_search_id=search_id).delete()
+        db_placeholder.session.delete(saved_search)
+        db_placeholder.session.commit()
+        saved_search_percolator.search_deleted(search_id)
+        return jsonify({"message": "Saved search deleted successfully"}), 200
+    else:
+        print(f"Simulating deletion of saved search {search_id}")
+        return jsonify({"message": "Saved search deletion simulated (DB not fully initialized)"}), 200
+
+@saved_search_bp.route("/<int:search_id>/matches", methods=["GET"])
+@jwt_required()
+def get_saved_search_matches(search_id):
+    """Listings matched by a saved search, newest first: ?limit=50"""
+    current_user_id = get_jwt_identity()
+    if not current_user_id:
+        return jsonify({"message": "Authentication required"}), 401
+    limit = min(request.args.get("limit", 50, type=int), 200)
+
+    if db_placeholder.session: # In a real app, this would be `db.session`
+        saved_search = db_placeholder.session.get(SavedSearch, search_id)
+        if not saved_search or saved_search.user_id != int(current_user_id): # Identities are strings, the ids ints
+            return jsonify({"message": "Saved search not found"}), 404
+        matches = SavedSearchMatch.query.filter_by(saved_search_id=search_id) \
+            .order_by(SavedSearchMatch.date_matched.desc(), SavedSearchMatch.id.desc()).limit(limit).all()
+        return jsonify({"message": "Matches retrieved successfully", "matches": [match.to_dict() for match in matches]}), 200
+    else:
+        print(f"Simulating matches for saved search {search_id}")
+        return jsonify({"message": "Match retrieval simulated (DB not fully initialized)", "matches": []}), 200
@@ -0,0 +1,178 @@
+# Ranked full-text search over listings (in-process inverted index with BM25 scoring)
+import math
+import re
+import unicodedata
+
+from src.services import listing_events
+
+# Relative weight of a term occurrence in each indexed field
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "city": 2.5,
+    "address": 1.5,
+    "description": 1.0,
+}
+
+# Common local shorthand mapped onto the place name it refers to
+PLACE_ALIASES = {
+    "jozi": "johannesburg",
+    "joburg": "johannesburg",
+    "jhb": "johannesburg",
+    "pta": "pretoria",
+    "plett": "plettenberg",
+    "kzn": "kwazulunatal",
+    "pe": "gqeberha",
+}
+
+STOP_WORDS = {"a", "an", "and", "the", "in", "of", "on", "for", "with", "to", "at", "by", "or", "is"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def fold_accents(text):
+    """Lowercase and strip diacritics, e.g. 'Bonnièvale' -> 'bonnievale'"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def stem(token):
+    """Light suffix stripping so 'apartments'/'apartment' and 'properties'/'property' match"""
+    if len(token) <= 4 or token.isdigit():
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith("sses"):
+        return token[:-2]
+    if token.endswith("ing") and len(token) > 6:
+        return token[:-3]
+    if token.endswith("ed") and len(token) > 5:
+        return token[:-2]
+    if token.endswith(("ches", "shes", "xes", "zes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text, for_query=False):
+    """Split text into normalized index terms.
+
+    Apostrophes are dropped ("Gordon's Bay" -> "gordons bay"). Hyphenated place
+    names are indexed as their parts plus the joined form, and queried by the
+    joined form only, so "KwaZulu-Natal" and "KZN" find the same documents.
+    """
+    if not text:
+        return []
+    folded = fold_accents(text).replace("'", "").replace("’", "")
+    terms = []
+    for match in _TOKEN_RE.findall(folded):
+        parts = match.split("-")
+        if len(parts) > 1:
+            terms.append(stem("".join(parts)))
+            if for_query:
+                continue
+        for part in parts:
+            if part and part not in STOP_WORDS:
+                terms.append(stem(PLACE_ALIASES.get(part, part)))
+    return terms
+
+
+class _SearchState:
+    def __init__(self):
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0.0
+
+
+class ListingSearchIndex(listing_events.ListingIndex):
+    """Inverted index over title, description, address and city.
+
+    Queries use AND semantics and are scored with BM25 over field-weighted term
+    frequencies. The cost of a query depends on the posting list sizes of its
+    terms rather than on the number of listings in the table.
+    """
+
+    columns = ("title", "description", "address", "city")
+
+    def _new_state(self):
+        return _SearchState()
+
+    def _discard(self, state, listing_id):
+        terms = state.doc_terms.pop(listing_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = state.postings.get(term)
+            if postings is not None:
+                postings.pop(listing_id, None)
+                if not postings:
+                    del state.postings[term]
+        state.total_length -= state.doc_lengths.pop(listing_id, 0.0)
+
+    def _apply(self, state, row):
+        self._discard(state, row.id)
+        terms = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(getattr(row, field)):
+                terms[term] = terms.get(term, 0.0) + weight
+        if not terms:
+            return
+        state.doc_terms[row.id] = terms
+        for term, frequency in terms.items():
+            state.postings.setdefault(term, {})[row.id] = frequency
+        length = sum(terms.values())
+        state.doc_lengths[row.id] = length
+        state.total_length += length
+
+    # Querying
+
+    def search(self, session, text):
+        """Return [(listing_id, score), ...] for listings matching every query term, best first"""
+        self.ensure_current(session)
+        terms = list(dict.fromkeys(tokenize(text, for_query=True)))
+        if not terms:
+            return []
+
+        with self._lock:
+            state = self._state
+            postings = [state.postings.get(term) for term in terms]
+            if not all(postings):
+                return []
+            # Intersect starting from the rarest term so the candidate set stays small
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    return []
+
+            doc_count = len(state.doc_lengths)
+            average_length = state.total_length / doc_count if doc_count else 1.0
+            scores = dict.fromkeys(candidates, 0.0)
+            for posting in postings:
+                idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for listing_id in candidates:
+                    frequency = posting[listing_id]
+                    norm = 1 - BM25_B + BM25_B * state.doc_lengths[listing_id] / average_length
+                    scores[listing_id] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * norm)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+
+    def matching(self, session, text, listing_ids):
+        """The given listing ids that search(text) would return, in the given order, without scoring the other matches"""
+        self.ensure_current(session)
+        terms = list(dict.fromkeys(tokenize(text, for_query=True)))
+        if not terms:
+            return []
+        with self._lock:
+            postings = [self._state.postings.get(term) for term in terms]
+            if not all(postings):
+                return []
+            return [listing_id for listing_id in listing_ids if all(listing_id in posting for posting in postings)]
+
+
+listing_search_index = listing_events.register(ListingSearchIndex())
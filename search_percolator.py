@@ -0,0 +1,319 @@
+# Saved-search percolator: each written listing is matched against only the saved searches that could match it
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import object_session
+
+from src.models.listing import Listing
+from src.models.saved_search import SavedSearch, SavedSearchMatch
+from src.services import listing_events
+from src.services.listing_serializer import CARD_FIELDS, serialize_listings
+from src.services.search_index import FIELD_WEIGHTS, tokenize
+
+logger = logging.getLogger(__name__)
+
+LISTING_COLUMNS = ("id", "user_id", "status", "city", "province", "property_type", "price", "bedrooms") + tuple(FIELD_WEIGHTS)
+# Listings in other states (sold, rented, pending) never trigger alerts
+ALERT_STATUSES = (None, "active")
+
+
+class _Predicate:
+    """A saved search compiled for matching; same semantics as the get_listings filters"""
+
+    __slots__ = ("id", "user_id", "city", "province", "property_type", "min_price", "max_price", "bedrooms", "terms")
+
+    def __init__(self, search):
+        self.id = search.id
+        self.user_id = search.user_id
+        self.city = search.city.lower() if search.city else None
+        self.province = search.province.lower() if search.province else None
+        self.property_type = search.property_type or None
+        self.min_price = search.min_price
+        self.max_price = search.max_price
+        self.bedrooms = search.bedrooms
+        self.terms = frozenset(tokenize(search.search, for_query=True)) if search.search else frozenset()
+
+    def key(self):
+        """The index key: the predicate that rules out the most listings.
+
+        A city narrows a listing to one market; a free-text term (the longest,
+        as a proxy for the rarest) usually comes next; property type, bedrooms
+        and province each still leave a large share of the table. Searches with
+        only a price range (or nothing) are checked against every listing.
+        """
+        if self.city:
+            return ("city", self.city)
+        if self.terms:
+            return ("term", max(self.terms, key=len))
+        if self.property_type:
+            return ("property_type", self.property_type)
+        if self.bedrooms is not None:
+            return ("bedrooms", self.bedrooms)
+        if self.province:
+            return ("province", self.province)
+        return None
+
+    def matches(self, listing, terms):
+        if self.user_id == listing.user_id:
+            return False # No alerts for your own listings
+        if self.city and self.city not in (listing.city or "").lower():
+            return False
+        if self.province and self.province not in (listing.province or "").lower():
+            return False
+        if self.property_type and self.property_type != listing.property_type:
+            return False
+        if self.bedrooms is not None and self.bedrooms != listing.bedrooms:
+            return False
+        if self.min_price is not None and (listing.price is None or listing.price < self.min_price):
+            return False
+        if self.max_price is not None and (listing.price is None or listing.price > self.max_price):
+            return False
+        return self.terms <= terms()
+
+
+class _PercolatorState:
+    def __init__(self):
+        self.keyed = {} # (field, value) -> {search_id: predicate}
+        self.unkeyed = {} # search_id -> predicate
+        self.keys = {} # search_id -> key, to move a search when it is edited
+        self.substring_lengths = {"city": {}, "province": {}} # Key lengths in use -> number of searches
+        self.term_searches = 0 # Searches keyed on a term; when zero, listings need not be tokenized
+        self.max_id = 0 # Highest saved search id read from the database, for catching up between reloads
+
+
+class SavedSearchPercolator:
+    """In-process index of active saved searches, keyed by each search's most selective predicate.
+
+    Matching a listing looks up its city substrings, text terms, property type,
+    bedrooms and province substrings in the index, so the cost depends on the
+    listing and the few candidate searches rather than on how many searches
+    exist. New matches are queued in saved_search_matches for the digest job;
+    a listing is queued at most once per search, so edits and re-imports do
+    not alert twice. Searches created by other processes are read before each
+    match with an id range query; searches they delete are dropped by a full
+    reload every `reload_interval` seconds (until then their matches fail the
+    foreign key and are skipped).
+    """
+
+    def __init__(self, reload_interval=60):
+        self.reload_interval = reload_interval
+        self._lock = threading.RLock()
+        self._state = _PercolatorState()
+        self._loaded_at = None
+
+    # Index maintenance
+
+    def _add(self, state, predicate):
+        key = predicate.key()
+        state.keys[predicate.id] = key
+        if key is None:
+            state.unkeyed[predicate.id] = predicate
+            return
+        state.keyed.setdefault(key, {})[predicate.id] = predicate
+        if key[0] == "term":
+            state.term_searches += 1
+        elif key[0] in state.substring_lengths:
+            lengths = state.substring_lengths[key[0]]
+            lengths[len(key[1])] = lengths.get(len(key[1]), 0) + 1
+
+    def _remove(self, state, search_id):
+        if search_id not in state.keys:
+            return
+        key = state.keys.pop(search_id)
+        if key is None:
+            state.unkeyed.pop(search_id, None)
+            return
+        bucket = state.keyed.get(key, {})
+        bucket.pop(search_id, None)
+        if not bucket:
+            state.keyed.pop(key, None)
+        if key[0] == "term":
+            state.term_searches -= 1
+        elif key[0] in state.substring_lengths:
+            lengths = state.substring_lengths[key[0]]
+            lengths[len(key[1])] -= 1
+            if not lengths[len(key[1])]:
+                del lengths[len(key[1])]
+
+    def load(self, session):
+        state = _PercolatorState()
+        state.max_id = session.query(func.max(SavedSearch.id)).scalar() or 0 # Read first, so a search created meanwhile is caught up
+        for search in session.query(SavedSearch).filter(SavedSearch.is_active == True, SavedSearch.id <= state.max_id).yield_per(1000):
+            self._add(state, _Predicate(search))
+        with self._lock:
+            self._state = state
+            self._loaded_at = time.monotonic()
+
+    def ensure_current(self, session):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_interval:
+            self.load(session)
+        else:
+            self._catch_up(session)
+
+    def _catch_up(self, session):
+        """Index saved searches created since the last load, by this or another process (a primary key range seek).
+
+        An id committed after a higher one was already read waits for the next reload.
+        """
+        max_id = self._state.max_id
+        searches = session.query(SavedSearch).filter(SavedSearch.id > max_id).order_by(SavedSearch.id).all()
+        if not searches:
+            return
+        with self._lock:
+            state = self._state
+            for search in searches:
+                self._remove(state, search.id)
+                if search.is_active:
+                    self._add(state, _Predicate(search))
+            state.max_id = max(state.max_id, searches[-1].id)
+
+    def search_saved(self, search):
+        """Index a created or edited saved search in this process"""
+        with self._lock:
+            self._remove(self._state, search.id)
+            if search.is_active:
+                self._add(self._state, _Predicate(search))
+
+    def search_deleted(self, search_id):
+        with self._lock:
+            self._remove(self._state, search_id)
+
+    # Matching
+
+    def _substrings(self, value, lengths):
+        value = (value or "").lower()
+        for length in lengths:
+            for start in range(len(value) - length + 1):
+                yield value[start:start + length]
+
+    def candidates(self, listing):
+        state = self._state
+        keys = [("property_type", listing.property_type), ("bedrooms", listing.bedrooms)]
+        for field in ("city", "province"):
+            keys.extend((field, part) for part in self._substrings(getattr(listing, field), state.substring_lengths[field]))
+        terms = None
+
+        def listing_terms():
+            nonlocal terms
+            if terms is None:
+                terms = {term for field in FIELD_WEIGHTS for term in tokenize(getattr(listing, field))}
+            return terms
+
+        if state.term_searches:
+            keys.extend(("term", term) for term in listing_terms())
+        candidates = dict(state.unkeyed)
+        for key in keys:
+            candidates.update(state.keyed.get(key, ()))
+        return [predicate for predicate in candidates.values() if predicate.matches(listing, listing_terms)]
+
+    def match(self, session, listings):
+        """[(saved_search_id, listing_id), ...] for the given listing rows or instances"""
+        with session.no_autoflush: # Reading saved searches must not flush (and lock rows for) the caller's pending changes
+            self.ensure_current(session)
+        with self._lock:
+            return [(predicate.id, listing.id) for listing in listings if listing.status in ALERT_STATUSES
+                    for predicate in self.candidates(listing)]
+
+    def percolate(self, session, listings):
+        """Queue new matches for the listings; returns how many were queued.
+
+        `session` is only read from. The matches are written on a connection
+        of their own and committed there, so the caller's transaction (the
+        request's session, when called from a listener) is never committed or
+        rolled back here.
+        """
+        pairs = self.match(session, listings)
+        if not pairs:
+            return 0
+        listing_ids = {listing_id for _, listing_id in pairs}
+        with session.get_bind(SavedSearchMatch.__mapper__).connect() as connection:
+            existing = set(connection.execute(
+                select(SavedSearchMatch.saved_search_id, SavedSearchMatch.listing_id).where(SavedSearchMatch.listing_id.in_(listing_ids))
+            ).all())
+            new = [{"saved_search_id": search_id, "listing_id": listing_id} for search_id, listing_id in pairs if (search_id, listing_id) not in existing]
+            if not new:
+                return 0
+            try:
+                connection.execute(SavedSearchMatch.__table__.insert(), new)
+                connection.commit()
+                return len(new)
+            except IntegrityError:
+                # Another worker queued some of these first, or a search was just deleted: fall back to one row at a time
+                connection.rollback()
+            queued = 0
+            for row in new:
+                try:
+                    connection.execute(SavedSearchMatch.__table__.insert(), [row])
+                    connection.commit()
+                    queued += 1
+                except IntegrityError:
+                    connection.rollback()
+            return queued
+
+    # listing_events listener
+
+    def listing_saved(self, listing):
+        session = object_session(listing)
+        if session is not None:
+            self.percolate(session, [listing])
+
+    def listing_deleted(self, listing_id):
+        pass # Queued matches are removed by the ON DELETE CASCADE foreign key
+
+    def listings_changed(self, listing_ids, chunk_size=500):
+        from src.models.user import db
+
+        listing_ids = list(listing_ids)
+        for start in range(0, len(listing_ids), chunk_size):
+            rows = db.session.query(*(getattr(Listing, column) for column in LISTING_COLUMNS)) \
+                .filter(Listing.id.in_(listing_ids[start:start + chunk_size])).all()
+            self.percolate(db.session, rows)
+
+
+def send_digests(session, send, max_listings=20, now=None, mark_notified=True):
+    """Deliver queued matches as one digest per user and mark them notified; returns the number of digests.
+
+    `send(user_id, digest)` receives {"user_id", "searches": [{"search",
+    "listings", "more"}]} with at most `max_listings` listing cards per
+    search. Each user's matches are marked in their own transaction after
+    send() returns, so a failure part-way resends nothing already delivered.
+    """
+    now = now or datetime.utcnow()
+    user_ids = [user_id for (user_id,) in session.execute(
+        select(SavedSearch.user_id).join(SavedSearchMatch, SavedSearchMatch.saved_search_id == SavedSearch.id)
+        .where(SavedSearchMatch.notified_at.is_(None)).distinct().order_by(SavedSearch.user_id)
+    )]
+    for user_id in user_ids:
+        queued = session.execute(
+            select(SavedSearchMatch.id, SavedSearchMatch.saved_search_id, SavedSearchMatch.listing_id)
+            .join(SavedSearch, SavedSearch.id == SavedSearchMatch.saved_search_id)
+            .where(SavedSearch.user_id == user_id, SavedSearchMatch.notified_at.is_(None))
+            .order_by(SavedSearchMatch.saved_search_id, SavedSearchMatch.date_matched.desc())
+        ).all()
+        by_search = {}
+        for row in queued:
+            by_search.setdefault(row.saved_search_id, []).append(row.listing_id)
+        shown_ids = {listing_id for listing_ids in by_search.values() for listing_id in listing_ids[:max_listings]}
+        cards = {listing["id"]: listing for listing in serialize_listings(
+            session.query(Listing).filter(Listing.id.in_(shown_ids)).all(), CARD_FIELDS
+        )}
+        searches = {search.id: search for search in session.query(SavedSearch).filter(SavedSearch.id.in_(list(by_search)))}
+        digest = {"user_id": user_id, "searches": [
+            {"search": searches[search_id].to_dict(),
+             "listings": [cards[listing_id] for listing_id in listing_ids[:max_listings] if listing_id in cards],
+             "more": max(0, len(listing_ids) - max_listings)}
+            for search_id, listing_ids in by_search.items() if search_id in searches
+        ]}
+        send(user_id, digest)
+        if not mark_notified:
+            continue
+        session.execute(update(SavedSearchMatch).where(SavedSearchMatch.id.in_([row.id for row in queued])).values(notified_at=now))
+        session.commit()
+    return len(user_ids)
+
+
+saved_search_percolator = listing_events.register(SavedSearchPercolator())
@@ -0,0 +1,195 @@
+# Static frontend serving from an in-memory manifest, with precompressed variants, strong ETags and SPA fallback
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+
+from flask import Response, jsonify, request
+from werkzeug.http import http_date, parse_etags
+from werkzeug.wsgi import wrap_file
+
+logger = logging.getLogger(__name__)
+
+# Content-Encoding -> file suffix of the precompressed sibling, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_TYPES = re.compile(r"^(text/|application/(javascript|json|xml|manifest\+json|wasm)|image/svg\+xml)")
+# Build tools put a content hash in the file name (index-BQ7vT8x1.js, main.3f2a9c1e.css); those never change
+DEFAULT_HASHED_PATTERN = r"[.-](?=[A-Za-z_-]*[0-9])[A-Za-z0-9_-]{8,}\.\w+$"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class StaticAsset:
+    __slots__ = ("path", "mimetype", "size", "etag", "last_modified", "cache_control", "body", "variants")
+
+    def __init__(self, path, mimetype, size, etag, last_modified, cache_control, body=None):
+        self.path = path
+        self.mimetype = mimetype
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.cache_control = cache_control
+        self.body = body # Kept in memory for small files
+        self.variants = {} # Content-Encoding -> StaticAsset of the precompressed file
+
+
+def _digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+class StaticAssets:
+    """Serves the built frontend without touching the filesystem for lookups.
+
+    The static folder is scanned once at startup. Each file gets a strong ETag
+    from its content, so If-None-Match is answered from the manifest. If the
+    build left a `.br` or `.gz` file next to an asset (see `flask
+    build-static`), clients that accept that encoding get it. File names with
+    a content hash are cached as immutable, other files revalidate after
+    STATIC_MAX_AGE seconds, and index.html always revalidates so a deploy is
+    picked up immediately. Files added after startup are only seen after
+    refresh() or a restart.
+    """
+
+    def __init__(self, max_age=3600, memory_limit=256 * 1024, hashed_pattern=DEFAULT_HASHED_PATTERN):
+        self.root = None
+        self.max_age = max_age
+        self.memory_limit = memory_limit
+        self.hashed_pattern = re.compile(hashed_pattern)
+        self.excluded = ()
+        self.manifest = {}
+
+    def init_app(self, app, excluded=()):
+        self.root = app.static_folder
+        self.max_age = app.config.get("STATIC_MAX_AGE", self.max_age)
+        self.memory_limit = app.config.get("STATIC_MEMORY_LIMIT", self.memory_limit)
+        self.hashed_pattern = re.compile(app.config.get("STATIC_HASHED_PATTERN", DEFAULT_HASHED_PATTERN))
+        self.excluded = tuple(prefix.strip("/") + "/" for prefix in excluded)
+        self.refresh()
+
+    def _cache_control(self, relative_path):
+        if relative_path == "index.html":
+            return "no-cache"
+        if self.hashed_pattern.search(relative_path):
+            return IMMUTABLE_CACHE_CONTROL
+        return f"public, max-age={self.max_age}"
+
+    def _asset(self, path, relative_path, mimetype, cache_control, etag_suffix=""):
+        stat = os.stat(path)
+        body = None
+        if stat.st_size <= self.memory_limit:
+            with open(path, "rb") as stream:
+                body = stream.read()
+            etag = hashlib.sha256(body).hexdigest()[:32]
+        else:
+            etag = _digest(path)
+        return StaticAsset(path, mimetype, stat.st_size, etag + etag_suffix, stat.st_mtime, cache_control, body)
+
+    def _source_files(self):
+        for directory, _, filenames in os.walk(self.root, followlinks=True):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                relative_path = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if relative_path.startswith(self.excluded) or relative_path.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                    continue
+                yield path, relative_path
+
+    def refresh(self):
+        """Rescan the static folder"""
+        manifest = {}
+        if self.root and os.path.isdir(self.root):
+            for path, relative_path in self._source_files():
+                mimetype = mimetypes.guess_type(relative_path)[0] or "application/octet-stream"
+                cache_control = self._cache_control(relative_path)
+                asset = self._asset(path, relative_path, mimetype, cache_control)
+                for encoding, suffix in ENCODINGS:
+                    # A stale sibling from an earlier build would serve old content
+                    if os.path.exists(path + suffix) and os.path.getmtime(path + suffix) >= asset.last_modified:
+                        asset.variants[encoding] = self._asset(path + suffix, relative_path, mimetype, cache_control, f"-{encoding}")
+                manifest[relative_path] = asset
+        self.manifest = manifest
+        logger.info("Static manifest: %d files from %s", len(manifest), self.root)
+        return manifest
+
+    def _respond(self, asset, encoding=None):
+        chosen = asset.variants[encoding] if encoding else asset
+        headers = {
+            "ETag": f'"{chosen.etag}"',
+            "Cache-Control": asset.cache_control,
+            "Last-Modified": http_date(asset.last_modified),
+        }
+        if asset.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        if chosen.etag in parse_etags(request.headers.get("If-None-Match")):
+            return Response(status=304, headers=headers)
+
+        if chosen.body is not None:
+            body = chosen.body
+        else:
+            body = wrap_file(request.environ, open(chosen.path, "rb"))
+        response = Response(body, mimetype=asset.mimetype, headers=headers, direct_passthrough=chosen.body is None)
+        response.content_length = chosen.size
+        return response
+
+    def serve(self, path):
+        """Response for a frontend path: the file itself, index.html for client-side routes, or 404"""
+        asset = self.manifest.get(path or "index.html")
+        if asset is None:
+            if path.startswith("api/"):
+                return jsonify({"message": "API endpoint not found. Please check the URL."}), 404
+            # Paths with an extension are missing files; serving index.html for them would be cached as the wrong type
+            if "." in path.rsplit("/", 1)[-1]:
+                return "Not found", 404
+            asset = self.manifest.get("index.html")
+            if asset is None:
+                return "index.html not found and not an API route", 404
+        encoding = next((encoding for encoding, _ in ENCODINGS
+                         if encoding in asset.variants and request.accept_encodings[encoding]), None)
+        return self._respond(asset, encoding)
+
+
+def precompress(root, min_size=1024, use_brotli=True):
+    """Write .gz (and, if the brotli package is installed, .br) siblings for compressible files.
+
+    Returns (files compressed, bytes before, bytes after gzip). Siblings that
+    would not be smaller than the original are skipped.
+    """
+    brotli = None
+    if use_brotli:
+        try:
+            import brotli
+        except ImportError:
+            logger.warning("brotli is not installed; writing gzip variants only")
+
+    compressed, before, after = 0, 0, 0
+    assets = StaticAssets()
+    assets.root = root
+    for path, relative_path in assets._source_files():
+        mimetype = mimetypes.guess_type(relative_path)[0] or ""
+        size = os.path.getsize(path)
+        if size < min_size or not COMPRESSIBLE_TYPES.match(mimetype):
+            continue
+        with open(path, "rb") as stream:
+            data = stream.read()
+        variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data, quality=11)
+        for suffix, body in variants.items():
+            if len(body) < size:
+                with open(path + suffix, "wb") as stream:
+                    stream.write(body)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        compressed += 1
+        before += size
+        after += min(size, len(variants[".gz"]))
+    return compressed, before, after
+
+
+static_assets = StaticAssets()
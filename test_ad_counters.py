@@ -0,0 +1,50 @@
+# Ad impression and click tracking: buffered per request, flushed as one batch of increments
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.user import db
+from src.models.advertisement import Advertisement
+from src.services.ad_counters import ad_counter_buffer
+
+
+@pytest.fixture
+def ad(app):
+    now = datetime.utcnow()
+    ad = Advertisement(title="Bond originator", advertiser_name="Home Loans Co", image_url="http://example.com/ad.jpg",
+                       target_url="http://example.com/bonds", placement_area="homepage_banner",
+                       start_date=now - timedelta(days=1), end_date=now + timedelta(days=30), is_active=True)
+    db.session.add(ad)
+    db.session.commit()
+    return ad
+
+
+def test_tracked_events_are_flushed_as_increments(client, ad):
+    assert client.get("/api/advertisements/advertisements?placement_area=homepage_banner").status_code == 200 # Builds the schedule index
+    assert client.post(f"/api/advertisements/advertisements/{ad.id}/track-impression").status_code == 202
+    response = client.post("/api/advertisements/advertisements/track-impressions", json={"ad_ids": [ad.id, ad.id]})
+    assert response.status_code == 202
+    assert response.get_json()["tracked"] == 2
+    response = client.post(f"/api/advertisements/advertisements/{ad.id}/track-click")
+    assert response.status_code == 200
+    assert response.get_json()["target_url"] == "http://example.com/bonds"
+
+    ad_counter_buffer.flush()
+    db.session.expire_all()
+    assert (ad.impressions, ad.clicks) == (3, 1)
+
+
+def test_unknown_and_deleted_ads_are_not_tracked(client, ad, auth_headers):
+    assert client.post("/api/advertisements/advertisements/999999/track-impression").status_code == 404
+    assert client.post("/api/advertisements/advertisements/999999/track-click").status_code == 404
+    response = client.post("/api/advertisements/advertisements/track-impressions", json={"ad_ids": [ad.id, 999999]})
+    assert response.status_code == 404
+    assert response.get_json()["ad_ids"] == [999999]
+    assert client.post("/api/advertisements/advertisements/track-impressions", json={"ad_ids": ["1"]}).status_code == 400
+
+    ad_id = ad.id
+    assert client.get("/api/advertisements/advertisements").status_code == 200
+    assert client.delete(f"/api/advertisements/advertisements/{ad_id}", headers=auth_headers(1)).status_code == 200
+    assert client.post(f"/api/advertisements/advertisements/{ad_id}/track-impression").status_code == 404
+    assert client.post(f"/api/advertisements/advertisements/{ad_id}/track-click").status_code == 404
+    assert ad_counter_buffer.flush() == 0
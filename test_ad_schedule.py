@@ -0,0 +1,50 @@
+# Live ads served from the in-memory schedule: writes, start/end boundaries and the DB fallback
+from datetime import datetime, timedelta
+
+from src.routes import advertisement as advertisement_routes
+
+AD = {"title": "Bond originator", "advertiser_name": "Home Loans Co", "image_url": "http://example.com/ad.jpg",
+      "target_url": "http://example.com/bonds", "placement_area": "homepage_banner"}
+
+
+def _titles(client, **query):
+    response = client.get("/api/advertisements/advertisements", query_string=query)
+    assert response.status_code == 200
+    return [ad["title"] for ad in response.get_json()["advertisements"]]
+
+
+def _create(client, headers, title, start, end, **values):
+    response = client.post("/api/advertisements/advertisements", headers=headers,
+                           json=dict(AD, title=title, start_date=start.isoformat(), end_date=end.isoformat(), **values))
+    assert response.status_code == 201
+
+
+def test_schedule_follows_writes_and_date_boundaries(client, auth_headers, monkeypatch):
+    headers = auth_headers(1)
+    now = datetime.utcnow()
+    assert _titles(client, placement_area="homepage_banner") == [] # Builds the index before any ad exists
+    _create(client, headers, "Live", now - timedelta(days=1), now + timedelta(days=1))
+    _create(client, headers, "Next week", now + timedelta(days=7), now + timedelta(days=14))
+    _create(client, headers, "Sidebar", now - timedelta(days=1), now + timedelta(days=1), placement_area="sidebar_listing")
+    assert _titles(client, placement_area="homepage_banner") == ["Live"] # Created in this process, so visible at once
+    assert sorted(_titles(client)) == ["Live", "Sidebar"]
+    assert sorted(_titles(client, active_only="false")) == ["Live", "Next week", "Sidebar"]
+
+    class NextWeek(datetime):
+        @classmethod
+        def utcnow(cls):
+            return now + timedelta(days=8)
+    monkeypatch.setattr(advertisement_routes, "datetime", NextWeek)
+    assert _titles(client, placement_area="homepage_banner") == ["Next week"] # Crossing a start and an end rebuilds the index
+
+
+def test_invalid_schedules_are_rejected(client, auth_headers):
+    headers = auth_headers(1)
+    now = datetime.utcnow()
+    response = client.post("/api/advertisements/advertisements", headers=headers, json=dict(AD, start_date="soon", end_date=now.isoformat()))
+    assert response.status_code == 400
+    response = client.post("/api/advertisements/advertisements", headers=headers,
+                           json=dict(AD, start_date=now.isoformat(), end_date=(now - timedelta(days=1)).isoformat()))
+    assert response.status_code == 400
+    assert client.post("/api/advertisements/advertisements", headers=headers, json={"title": "Incomplete"}).status_code == 400
+    assert _titles(client) == []
@@ -0,0 +1,88 @@
+# Read-replica routing against two SQLite files: the replica is a copy of the primary with a different title
+import os
+import shutil
+import sqlite3
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from src.main import create_app
+from src.models.user import db, User
+from src.models.listing import Listing
+from src.services import db_routing
+from src.services.db_routing import replica_router
+from src.services.migrations import upgrade
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{primary}",
+        "DATABASE_REPLICA_URIS": [f"sqlite:///{replica}"],
+        "REPLICA_RETRY_INTERVAL": 30,
+        "RESPONSE_CACHE_ENABLED": False,
+        "PAYMENT_GATEWAY": "fake",
+        "PAYMENT_QUEUE_PATH": str(tmp_path / "payment_events.sqlite3"),
+        "IMAGE_STORAGE_DIR": str(tmp_path / "media"),
+    })
+    with app.app_context():
+        upgrade(db.engine)
+        user = User("owner@example.com", password_hash="unused")
+        db.session.add(user)
+        db.session.flush()
+        listing = Listing(title="On the primary", price=1500000, address="1 Long Street", city="Cape Town", user_id=user.id)
+        db.session.add(listing)
+        db.session.commit()
+        app.config["TEST_LISTING_ID"], app.config["TEST_USER_ID"] = listing.id, user.id
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+        shutil.copy(primary, replica)
+        connection = sqlite3.connect(replica)
+        connection.execute("UPDATE listings SET title = 'On the replica'")
+        connection.commit()
+        connection.close()
+    return app # Outside the app context: each request gets its own session, as it does when served
+
+
+def _title(client, app):
+    response = client.get(f"/api/listings/listings/{app.config['TEST_LISTING_ID']}")
+    assert response.status_code == 200
+    return response.get_json()["listing"]["title"]
+
+
+def test_reads_go_to_the_replica(replica_app):
+    assert _title(replica_app.test_client(), replica_app) == "On the replica"
+
+
+def test_writes_and_the_sticky_window_stay_on_the_primary(replica_app):
+    client = replica_app.test_client()
+    with replica_app.app_context():
+        token = create_access_token(identity=str(replica_app.config["TEST_USER_ID"]))
+    response = client.post("/api/listings/listings", json={"title": "New flat", "price": 900000, "address": "2 Long Street", "city": "Cape Town"},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 201
+    assert db_routing.STICKY_COOKIE in response.headers.get("Set-Cookie", "")
+    assert _title(client, replica_app) == "On the primary"
+    assert _title(replica_app.test_client(), replica_app) == "On the replica"
+
+
+def test_failed_replica_falls_back_to_the_primary_and_is_reprobed(replica_app, tmp_path, monkeypatch):
+    replica = tmp_path / "replica.db"
+    healthy_copy = tmp_path / "replica.healthy"
+    with replica_app.app_context():
+        db.engines["replica_0"].dispose()
+    os.replace(replica, healthy_copy)
+    os.mkdir(replica) # Opening a directory as a database fails
+    client = replica_app.test_client()
+    assert _title(client, replica_app) == "On the primary"
+    assert _title(client, replica_app) == "On the primary" # Skipped while down
+
+    os.rmdir(replica)
+    os.replace(healthy_copy, replica)
+    assert _title(client, replica_app) == "On the primary" # Not re-probed before REPLICA_RETRY_INTERVAL
+    later = db_routing.time.monotonic() + replica_router.retry_interval + 1
+    monkeypatch.setattr(db_routing.time, "monotonic", lambda: later)
+    assert _title(client, replica_app) == "On the replica"
@@ -0,0 +1,48 @@
+# Featured slots: paid listings ranked by tier weight and recency, per placement and city/province
+from datetime import datetime, timedelta
+
+from src.models.user import db
+from src.models.listing import Listing
+
+
+def _paid(owner_id, title, tier, city, province, paid_days_ago, expires_in_days=30):
+    now = datetime.now()
+    listing = Listing(title=title, price=3000000, address="10 Marine Drive", city=city, province=province, user_id=owner_id, status="active",
+                      is_charged_listing=True, listing_tier=tier, payment_status="paid", payment_date=now - timedelta(days=paid_days_ago),
+                      tier_expiry_date=now + timedelta(days=expires_in_days))
+    db.session.add(listing)
+    return listing
+
+
+def _featured_ids(client, **query):
+    response = client.get("/api/listings/featured", query_string=query)
+    assert response.status_code == 200
+    return [item["id"] for item in response.get_json()["listings"]]
+
+
+def test_ranking_by_weight_recency_and_scope(client, listing, auth_headers):
+    owner_id = listing.user_id
+    top = _paid(owner_id, "Featured sea view flat", "featured", "Cape Town", "Western Cape", paid_days_ago=1)
+    premium = _paid(owner_id, "Premium sea view flat", "premium", "Cape Town", "Western Cape", paid_days_ago=0)
+    old = _paid(owner_id, "Featured Umhlanga flat", "featured", "Durban", "KwaZulu-Natal", paid_days_ago=30) # 3 x 2^(-30/7) < 1
+    expired = _paid(owner_id, "Lapsed featured flat", "featured", "Cape Town", "Western Cape", paid_days_ago=0, expires_in_days=-1)
+    db.session.commit()
+
+    assert _featured_ids(client, placement="search") == [top.id, premium.id, old.id]
+    assert _featured_ids(client, placement="homepage") == [top.id, old.id] # Premium is promoted in search only
+    assert _featured_ids(client, placement="search", city="cape") == [top.id, premium.id]
+    assert _featured_ids(client, placement="search", province="kwazulu") == [old.id]
+    assert _featured_ids(client, placement="search", limit="1", offset="1") == [premium.id]
+    assert expired.id not in _featured_ids(client, placement="search", limit="50")
+
+    page = client.get("/api/listings/listings", query_string={"search": "sea view"}).get_json()
+    assert [item["id"] for item in page["featured"]] == [top.id, premium.id] # Promoted matches shown above the results
+
+    assert client.delete(f"/api/listings/listings/{top.id}", headers=auth_headers(owner_id)).status_code == 200
+    assert _featured_ids(client, placement="homepage") == [old.id]
+
+
+def test_invalid_featured_requests_are_rejected(client, listing):
+    assert client.get("/api/listings/featured", query_string={"placement": "sidebar"}).status_code == 400
+    assert client.get("/api/listings/featured", query_string={"fields": "title,secret"}).status_code == 400
+    assert _featured_ids(client) == [] # The fixture listing is not paid for
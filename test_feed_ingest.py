@@ -0,0 +1,45 @@
+# Feed ingest through the CLI: inserts, content-hash updates and rejected rows
+import json
+
+
+def _write_feed(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8")
+    return str(path)
+
+
+def _ingest(app, path, owner_id, *extra):
+    return app.test_cli_runner().invoke(args=["ingest-feed", path, "--source", "property24", "--user-id", str(owner_id), *extra])
+
+
+def _sea_point_prices(client):
+    body = client.get("/api/listings/listings", query_string={"city": "Sea Point"}).get_json()
+    return sorted(float(item["price"]) for item in body["listings"])
+
+
+def test_feed_rows_are_inserted_then_updated_in_place(app, client, listing, tmp_path):
+    owner_id = listing.user_id
+    rows = [
+        {"external_id": "P24-1", "title": "Studio", "price": "950000", "address": "1 Main Road", "city": "Sea Point", "bedrooms": "1"},
+        {"external_id": "P24-2", "title": "Penthouse", "price": "8500000", "address": "2 Beach Road", "city": "Sea Point"},
+        {"external_id": "P24-3", "title": "No price", "address": "3 Main Road", "city": "Sea Point"},
+        {"title": "No reference", "price": "1000000", "address": "4 Main Road", "city": "Sea Point"},
+    ]
+    result = _ingest(app, _write_feed(tmp_path / "feed.ndjson", rows), owner_id, "--batch-size", "2")
+    assert result.exit_code == 0, result.output
+    assert "'inserted': 2" in result.output and "'rejected': 2" in result.output
+    assert _sea_point_prices(client) == [950000, 8500000]
+
+    rows[1]["price"] = "7900000"
+    result = _ingest(app, _write_feed(tmp_path / "feed.ndjson", rows[:2]), owner_id)
+    assert result.exit_code == 0, result.output
+    assert "'inserted': 0" in result.output and "'updated': 1" in result.output and "'unchanged': 1" in result.output
+    assert _sea_point_prices(client) == [950000, 7900000]
+
+
+def test_unreadable_feeds_are_refused(app, listing, tmp_path):
+    assert _ingest(app, str(tmp_path / "missing.ndjson"), listing.user_id).exit_code == 2
+    path = tmp_path / "feed.json"
+    path.write_text("[]", encoding="utf-8")
+    result = _ingest(app, str(path), listing.user_id)
+    assert result.exit_code == 2
+    assert "--format ndjson|csv|xml" in result.output
@@ -0,0 +1,80 @@
+# Uploaded photos: variants are stripped of the upload's metadata and originals are never served
+import io
+import os
+from concurrent.futures import Future
+
+import pytest
+
+from src.services.image_pipeline import image_pipeline, render_variants
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _upload_with_exif(path):
+    image = Image.new("RGB", (2000, 1500), (40, 120, 200))
+    exif = image.getexif()
+    exif[0x010F] = "Camera maker"
+    exif[0x8825] = {1: "S", 2: (33.0, 55.0, 0.0)} # GPS position
+    image.save(path, exif=exif)
+
+
+def test_variants_do_not_keep_exif(tmp_path):
+    _upload_with_exif(tmp_path / "original.jpg")
+    sizes = render_variants(str(tmp_path), "original.jpg", 40_000_000)
+    for filename, size in sizes.items():
+        assert os.path.getsize(tmp_path / filename) == size
+        with Image.open(tmp_path / filename) as variant:
+            assert not dict(variant.getexif())
+            assert "exif" not in variant.info
+
+
+def test_originals_are_not_served(app, client):
+    content_hash = "ab" * 32
+    directory = image_pipeline.directory(content_hash)
+    os.makedirs(directory)
+    _upload_with_exif(os.path.join(directory, "original.jpg"))
+    render_variants(directory, "original.jpg", 40_000_000)
+    assert client.get(f"/media/images/ab/{content_hash}/original.jpg").status_code == 404
+    assert client.get(f"/media/images/ab/{content_hash}/card.jpg").status_code == 200
+
+
+class _InlineExecutor:
+    """Runs a render in the calling thread, so the test sees its result without waiting on the process pool"""
+
+    def submit(self, function, *args):
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+
+def _jpeg():
+    stream = io.BytesIO()
+    Image.new("RGB", (1200, 900), (200, 80, 40)).save(stream, "JPEG")
+    stream.seek(0)
+    return stream
+
+
+def test_owner_uploads_and_deletes_a_photo(client, listing, auth_headers, monkeypatch):
+    monkeypatch.setattr(image_pipeline, "_get_executor", lambda: _InlineExecutor())
+    response = client.post(f"/api/listings/listings/{listing.id}/images", data={"image": (_jpeg(), "flat.jpg")},
+                           headers=auth_headers(listing.user_id))
+    assert response.status_code == 202
+    image_id = response.get_json()["image"]["id"]
+
+    detail = client.get(f"/api/listings/listings/{listing.id}").get_json()["listing"]
+    assert [image["status"] for image in detail["images"]] == ["ready"]
+    assert detail["main_image_url"] == detail["images"][0]["variants"]["card"]["jpg"]
+    assert "original_url" not in detail["images"][0]
+
+    response = client.delete(f"/api/listings/listings/{listing.id}/images/{image_id}", headers=auth_headers(listing.user_id))
+    assert response.status_code == 200
+    assert client.get(f"/api/listings/listings/{listing.id}").get_json()["listing"]["images"] == []
+
+
+def test_only_the_owner_can_change_photos(client, listing, other_user, auth_headers):
+    response = client.post(f"/api/listings/listings/{listing.id}/images", data={"image": (_jpeg(), "flat.jpg")},
+                           headers=auth_headers(other_user.id))
+    assert response.status_code == 403
+    response = client.post(f"/api/listings/listings/{listing.id}/images", data={"image": (io.BytesIO(b"not an image"), "flat.jpg")},
+                           headers=auth_headers(listing.user_id))
+    assert response.status_code == 400
@@ -0,0 +1,52 @@
+# JSON encoding (orjson or stdlib, same output) and gzip of larger responses
+import datetime
+import decimal
+import gzip
+import json
+
+import pytest
+
+from src.models.user import db
+from src.models.listing import Listing
+from src.services import json_provider
+from src.services.response_compression import response_compression
+
+
+def test_large_responses_are_compressed_for_clients_that_accept_it(client, listing):
+    for n in range(10):
+        db.session.add(Listing(title=f"Flat {n}", price=1000000 + n, address=f"{n} Bree Street", city="Cape Town", user_id=listing.user_id, status="active"))
+    db.session.commit()
+
+    compressed = client.get("/api/listings/listings", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    body = json.loads(gzip.decompress(compressed.get_data()))
+    assert body["total_listings"] == 11
+    posted = body["listings"][0]["date_posted"]
+    assert datetime.datetime.fromisoformat(posted) # ISO 8601, not an HTTP date
+
+    identity = client.get("/api/listings/listings")
+    assert "Content-Encoding" not in identity.headers
+    assert identity.get_json() == body
+
+    small = client.get(f"/api/listings/listings/{listing.id}", headers={"Accept-Encoding": "gzip"})
+    assert len(small.get_data()) < response_compression.min_bytes
+    assert "Content-Encoding" not in small.headers
+
+
+def test_errors_and_unaccepted_encodings_are_sent_as_is(client, listing):
+    response = client.get("/api/listings/listings", query_string={"min_price": "cheap"}, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 400
+    assert "Content-Encoding" not in response.headers
+    response = client.get("/api/listings/listings", headers={"Accept-Encoding": "compress"})
+    assert "Content-Encoding" not in response.headers
+
+
+@pytest.mark.parametrize("provider_name", ["StdlibJSONProvider", "OrjsonProvider"])
+def test_providers_encode_decimals_and_dates_alike(app, provider_name):
+    if provider_name == "OrjsonProvider":
+        pytest.importorskip("orjson")
+    provider = getattr(json_provider, provider_name)(app)
+    value = {"price": decimal.Decimal("1500000.50"), "posted": datetime.datetime(2025, 5, 1, 9, 30), "b": 1, "a": "Bonnièvale"}
+    assert json.loads(provider.dumps(value)) == {"price": "1500000.50", "posted": "2025-05-01T09:30:00", "b": 1, "a": "Bonnièvale"}
+    assert list(json.loads(provider.dumps(value))) == ["a", "b", "posted", "price"] # Sorted keys
@@ -0,0 +1,50 @@
+# Cross-source duplicate detection on listing writes (listing_dedup)
+from sqlalchemy.exc import OperationalError
+
+from src.models.user import db
+from src.models.listing import Listing
+from src.models.listing_address_key import ListingAddressKey
+from src.models.listing_duplicate import ListingDuplicate
+from src.services import listing_dedup
+
+FLAT = {"title": "Two bedroom flat", "description": "Sunny two bedroom flat with a balcony overlooking Table Mountain, close to shops",
+        "price": 1500000, "address": "1 Long Street", "city": "Cape Town", "bedrooms": 2, "property_type": "apartment"}
+
+
+def _create(client, headers, **fields):
+    response = client.post("/api/listings/listings", json=dict(FLAT, **fields), headers=headers)
+    assert response.status_code == 201
+    return response.get_json()["listing"]["id"]
+
+
+def test_copy_is_linked_and_collapsed(client, other_user, auth_headers):
+    original_id = _create(client, auth_headers(other_user.id))
+    copy_id = _create(client, auth_headers(other_user.id), price=1520000)
+    link = ListingDuplicate.query.filter_by(listing_id=copy_id).one()
+    assert link.canonical_listing_id == original_id
+
+    response = client.get("/api/listings/listings", query_string={"collapse_duplicates": "true"})
+    assert [item["id"] for item in response.get_json()["listings"]] == [original_id]
+    unrelated_id = _create(client, auth_headers(other_user.id), address="9 Beach Road", city="Durban", description="Family home with a pool")
+    assert ListingDuplicate.query.filter_by(listing_id=unrelated_id).count() == 0
+
+
+def test_deleting_a_listing_removes_its_links(client, other_user, auth_headers):
+    headers = auth_headers(other_user.id)
+    original_id = _create(client, headers)
+    copy_id = _create(client, headers)
+    assert client.delete(f"/api/listings/listings/{original_id}", headers=headers).status_code == 200
+    assert ListingDuplicate.query.filter(ListingDuplicate.canonical_listing_id == original_id).count() == 0
+    assert db.session.get(ListingAddressKey, original_id) is None
+    assert db.session.get(ListingAddressKey, copy_id) is not None
+
+
+def test_failed_check_does_not_break_the_request(client, other_user, auth_headers, monkeypatch):
+    def fail(*args):
+        raise OperationalError("SELECT", {}, Exception("database is locked"))
+    monkeypatch.setattr(listing_dedup, "_match", fail)
+    response = client.post("/api/listings/listings", json=FLAT, headers=auth_headers(other_user.id))
+    assert response.status_code == 201
+    listing_id = response.get_json()["listing"]["id"]
+    assert db.session.get(Listing, listing_id).title == FLAT["title"]
+    assert db.session.get(ListingAddressKey, listing_id) is None # The check's own transaction was rolled back
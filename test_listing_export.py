@@ -0,0 +1,42 @@
+# Listing exports streamed as CSV or NDJSON, scoped to the caller unless they are an admin
+import csv
+import io
+import json
+
+from src.models.user import db
+from src.models.listing import Listing
+
+
+def _export(client, headers, **query):
+    response = client.get("/api/listings/export", query_string=query, headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response
+
+
+def test_owners_export_their_listings_and_admins_everything(app, client, listing, other_user, auth_headers):
+    db.session.add(Listing(title="=HYPERLINK(\"http://evil.example\")", price=990000, address="7 Loop Street", city="Cape Town",
+                           user_id=other_user.id, status="active"))
+    db.session.commit()
+
+    response = _export(client, auth_headers(listing.user_id))
+    assert response.mimetype == "text/csv"
+    assert response.headers["Content-Disposition"].startswith('attachment; filename="listings-')
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(row["id"], row["title"]) for row in rows] == [(str(listing.id), "Two bedroom flat")]
+
+    lines = _export(client, auth_headers(other_user.id), format="ndjson", fields="title,price").get_data(as_text=True).splitlines()
+    assert [set(json.loads(line)) for line in lines] == [{"id", "title", "price"}]
+
+    app.config["ADMIN_USER_IDS"] = [other_user.id]
+    rows = list(csv.DictReader(io.StringIO(_export(client, auth_headers(other_user.id), scope="all", fields="title").get_data(as_text=True))))
+    assert sorted(row["title"] for row in rows) == ["'=HYPERLINK(\"http://evil.example\")", "Two bedroom flat"] # Not run as a formula
+    rows = list(csv.DictReader(io.StringIO(_export(client, auth_headers(other_user.id), scope="all", city="durban").get_data(as_text=True))))
+    assert rows == []
+
+
+def test_invalid_exports_are_refused(client, listing, auth_headers):
+    headers = auth_headers(listing.user_id)
+    assert client.get("/api/listings/export").status_code == 401
+    assert client.get("/api/listings/export", query_string={"scope": "all"}, headers=headers).status_code == 403
+    for query in ({"format": "xlsx"}, {"scope": "everyone"}, {"fields": "agent_details"}, {"fields": "secret"}, {"min_price": "cheap"}):
+        assert client.get("/api/listings/export", query_string=query, headers=headers).status_code == 400, query
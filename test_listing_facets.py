@@ -0,0 +1,44 @@
+# Facet counts: maintained counters for unfiltered and city-only requests, SQL for other filters
+def _counts(client, **query):
+    response = client.get("/api/listings/facets", query_string=query)
+    assert response.status_code == 200
+    body = response.get_json()
+    return body["total_listings"], {facet: {item["value"]: item["count"] for item in items} for facet, items in body["facets"].items()}
+
+
+def test_counters_follow_writes_and_filters_fall_back_to_sql(client, listing, auth_headers):
+    headers = auth_headers(listing.user_id)
+    total, facets = _counts(client)
+    assert total == 1
+    assert facets["city"] == {"Cape Town": 1}
+    assert facets["price_band"] == {"1000000-2000000": 1}
+
+    response = client.post("/api/listings/listings", headers=headers, json={
+        "title": "Family house", "price": 4200000, "address": "8 Florida Road", "city": "Durban", "province": "KwaZulu-Natal",
+        "bedrooms": 3, "property_type": "house"})
+    assert response.status_code == 201
+    durban_id = response.get_json()["listing"]["id"]
+
+    total, facets = _counts(client)
+    assert total == 2
+    assert facets["city"] == {"Cape Town": 1, "Durban": 1}
+    assert facets["bedrooms"] == {2: 1, 3: 1}
+    assert facets["price_band"] == {"1000000-2000000": 1, "3000000-5000000": 1}
+
+    total, facets = _counts(client, city="DUR")
+    assert (total, facets["property_type"]) == (1, {"house": 1})
+    total, facets = _counts(client, property_type="apartment")
+    assert (total, facets["city"]) == (1, {"Cape Town": 1})
+    total, facets = _counts(client, search="family house")
+    assert (total, facets["city"]) == (1, {"Durban": 1})
+
+    assert client.delete(f"/api/listings/listings/{durban_id}", headers=headers).status_code == 200
+    total, facets = _counts(client)
+    assert (total, facets["city"]) == (1, {"Cape Town": 1})
+
+
+def test_invalid_facet_filters_are_rejected(client, listing):
+    assert client.get("/api/listings/facets", query_string={"min_price": "cheap"}).status_code == 400
+    assert client.get("/api/listings/facets", query_string={"bedrooms": "two"}).status_code == 400
+    total, facets = _counts(client, city="Johannesburg")
+    assert total == 0 and facets["city"] == {}
@@ -0,0 +1,51 @@
+# Map clusters and points from the geohash cell index
+import pytest
+
+from src.models.user import db
+from src.models.listing import Listing
+
+SOUTH_AFRICA = "16.0,-35.0,33.0,-22.0"
+
+
+@pytest.fixture
+def mapped(listing):
+    listings = [
+        Listing(title=f"Flat {n}", price=price, address=f"{n} Kloof Street", city="Cape Town", latitude=-33.92 - n / 1000, longitude=18.42 + n / 1000,
+                user_id=listing.user_id, status="active")
+        for n, price in enumerate((1000000, 2000000, 3000000))
+    ]
+    listings.append(Listing(title="Sandton house", price=5000000, address="1 Rivonia Road", city="Johannesburg", latitude=-26.10, longitude=28.05,
+                            user_id=listing.user_id, status="active"))
+    listings.append(Listing(title="Sold flat", price=900000, address="9 Kloof Street", city="Cape Town", latitude=-33.921, longitude=18.421,
+                            user_id=listing.user_id, status="sold"))
+    db.session.add_all(listings)
+    db.session.commit()
+    return listings
+
+
+def test_clusters_and_points(client, listing, mapped, auth_headers):
+    response = client.get("/api/listings/map", query_string={"bbox": SOUTH_AFRICA, "zoom": "5"})
+    assert response.status_code == 200
+    clusters = sorted(response.get_json()["clusters"], key=lambda cluster: cluster["count"])
+    assert [(cluster["count"], cluster["min_price"], cluster["max_price"]) for cluster in clusters] == [(1, 5000000, 5000000), (3, 1000000, 3000000)]
+    assert clusters[1]["latitude"] == pytest.approx(-33.921)
+
+    priciest = mapped[2].id
+    assert client.delete(f"/api/listings/listings/{priciest}", headers=auth_headers(listing.user_id)).status_code == 200
+    clusters = client.get("/api/listings/map", query_string={"bbox": SOUTH_AFRICA, "zoom": "5"}).get_json()["clusters"]
+    cape_town = next(cluster for cluster in clusters if cluster["count"] == 2)
+    assert (cape_town["min_price"], cape_town["max_price"]) == (1000000, 2000000) # Recomputed without the deleted listing
+
+    points = client.get("/api/listings/map", query_string={"bbox": "18.40,-33.93,18.43,-33.91", "zoom": "16"}).get_json()["points"]
+    assert sorted(point["id"] for point in points) == [mapped[0].id, mapped[1].id]
+
+
+@pytest.mark.parametrize("query", [
+    {"zoom": "5"},
+    {"bbox": "16,-35,33", "zoom": "5"},
+    {"bbox": "33.0,-35.0,16.0,-22.0", "zoom": "5"}, # West of east
+    {"bbox": SOUTH_AFRICA},
+    {"bbox": SOUTH_AFRICA, "zoom": "23"},
+])
+def test_invalid_map_requests_are_rejected(client, query):
+    assert client.get("/api/listings/map", query_string=query).status_code == 400
@@ -0,0 +1,22 @@
+# per_page is validated once (pagination.parse_per_page) for every listing page mode
+import pytest
+
+
+@pytest.mark.parametrize("query", [
+    {"per_page": "0"},
+    {"per_page": "101"},
+    {"per_page": "ten"},
+    {"per_page": "101", "pagination": "cursor"},
+    {"per_page": "-1", "search": "flat"},
+])
+def test_out_of_range_per_page_is_rejected(client, listing, query):
+    response = client.get("/api/listings/listings", query_string=query)
+    assert response.status_code == 400
+    assert "per_page" in response.get_json()["message"]
+
+
+@pytest.mark.parametrize("query", [{}, {"per_page": "100"}, {"per_page": "1", "pagination": "cursor"}, {"per_page": "1", "search": "flat"}])
+def test_per_page_in_range_is_accepted(client, listing, query):
+    response = client.get("/api/listings/listings", query_string=query)
+    assert response.status_code == 200
+    assert [item["id"] for item in response.get_json()["listings"]] == [listing.id]
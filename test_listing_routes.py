@@ -0,0 +1,22 @@
+# Listing writes through the authenticated routes
+from src.models.user import db
+from src.models.listing import Listing
+
+
+def test_owner_updates_and_deletes_a_listing(client, listing, auth_headers):
+    response = client.put(f"/api/listings/listings/{listing.id}", json={"title": "Renovated two bedroom flat", "price": 1650000},
+                          headers=auth_headers(listing.user_id))
+    assert response.status_code == 200
+    assert response.get_json()["listing"]["title"] == "Renovated two bedroom flat"
+
+    listing_id = listing.id
+    response = client.delete(f"/api/listings/listings/{listing_id}", headers=auth_headers(listing.user_id))
+    assert response.status_code == 200
+    assert db.session.get(Listing, listing_id) is None
+
+
+def test_only_the_owner_changes_a_listing(client, listing, other_user, auth_headers):
+    assert client.put(f"/api/listings/listings/{listing.id}", json={"title": "Mine now"}, headers=auth_headers(other_user.id)).status_code == 403
+    assert client.delete(f"/api/listings/listings/{listing.id}", headers=auth_headers(other_user.id)).status_code == 403
+    assert client.put(f"/api/listings/listings/{listing.id}", json={"price": "cheap"}, headers=auth_headers(listing.user_id)).status_code == 400
+    assert client.delete("/api/listings/listings/999999", headers=auth_headers(listing.user_id)).status_code == 404
@@ -0,0 +1,41 @@
+# Listing search: ranked from the in-process index, narrowed by the SQL filters
+from src.models.user import db
+from src.models.listing import Listing
+
+
+def _add(owner_id, title, city, **values):
+    listing = Listing(title=title, price=values.pop("price", 2000000), address="3 Main Road", city=city, province=values.pop("province", "Western Cape"),
+                      bedrooms=values.pop("bedrooms", 3), property_type=values.pop("property_type", "house"), user_id=owner_id, status="active", **values)
+    db.session.add(listing)
+    db.session.commit()
+    return listing
+
+
+def test_search_ranks_matches_and_applies_filters(client, listing):
+    best = _add(listing.user_id, "Sea view apartments with a sea view deck", "Cape Town", description="Sea facing")
+    other = _add(listing.user_id, "Family house, partial view of the sea", "Cape Town", description="Large garden")
+    durban = _add(listing.user_id, "Sea view flat", "Durban", province="KwaZulu-Natal")
+
+    response = client.get("/api/listings/listings", query_string={"search": "Sea Views apartment"})
+    assert response.status_code == 200
+    assert [item["id"] for item in response.get_json()["listings"]] == [best.id] # Every term must match, stemmed
+
+    body = client.get("/api/listings/listings", query_string={"search": "sea view"}).get_json()
+    assert [item["id"] for item in body["listings"]][0] == best.id
+    assert {item["id"] for item in body["listings"]} == {best.id, other.id, durban.id}
+    assert body["total_listings"] == 3
+
+    body = client.get("/api/listings/listings", query_string={"search": "sea view", "city": "cape town", "per_page": "1"}).get_json()
+    assert [item["id"] for item in body["listings"]] == [best.id]
+    assert (body["total_listings"], body["total_pages"]) == (2, 2)
+    body = client.get("/api/listings/listings", query_string={"search": "sea view", "city": "cape town", "per_page": "1", "page": "2"}).get_json()
+    assert [item["id"] for item in body["listings"]] == [other.id]
+
+
+def test_search_errors_and_misses(client, listing):
+    response = client.get("/api/listings/listings", query_string={"search": "flat", "min_price": "cheap"})
+    assert response.status_code == 400
+    body = client.get("/api/listings/listings", query_string={"search": "penthouse"}).get_json()
+    assert (body["listings"], body["total_listings"]) == ([], 0)
+    body = client.get("/api/listings/listings", query_string={"search": "the and of"}).get_json() # Only stop words
+    assert body["listings"] == []
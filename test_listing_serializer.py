@@ -0,0 +1,49 @@
+# Listing pages: field projection and a constant number of queries per page
+from sqlalchemy import event
+
+from src.models.user import db, User
+from src.models.listing import Listing
+from src.services.listing_serializer import CARD_FIELDS
+
+
+def _add_listings(count):
+    for n in range(count):
+        agent = User(f"agent{n}@example.com", password_hash="unused", full_name=f"Agent {n}")
+        db.session.add(agent)
+        db.session.flush()
+        db.session.add(Listing(title=f"Flat {n}", price=1000000 + n, address=f"{n} Bree Street", city="Cape Town", user_id=agent.id, status="active"))
+    db.session.commit()
+
+
+def _statements(client, query_string):
+    db.session.expunge_all() # Requests share the test's session; start without agents in its identity map
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        assert client.get("/api/listings/listings", query_string=query_string).status_code == 200
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    return statements
+
+
+def test_projected_pages_and_agents_loaded_in_one_query(client, listing):
+    _add_listings(6)
+    full = client.get("/api/listings/listings").get_json()["listings"]
+    assert full[0]["agent_details"]["email"] == "agent5@example.com"
+    assert set(full[0]) == set(db.session.get(Listing, full[0]["id"]).to_dict())
+
+    card = client.get("/api/listings/listings", query_string={"fields": "card"}).get_json()["listings"]
+    assert all(set(item) == set(CARD_FIELDS) for item in card)
+    custom = client.get("/api/listings/listings", query_string={"fields": "title,agent_details"}).get_json()["listings"]
+    assert custom[0] == {"id": full[0]["id"], "title": "Flat 5", "agent_details": full[0]["agent_details"]}
+
+    small = _statements(client, {"per_page": "2"})
+    large = _statements(client, {"per_page": "7"})
+    assert len(small) == len(large) # Agents come from one SELECT ... IN, not one query per listing
+
+
+def test_unknown_fields_are_rejected(client, listing):
+    response = client.get("/api/listings/listings", query_string={"fields": "title,password_hash"})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Unknown fields: password_hash"
@@ -0,0 +1,35 @@
+# /metrics: request latency, SQL statements per request and slow queries, in the Prometheus text format
+import re
+
+from src.main import create_app
+from src.services.metrics import request_metrics
+
+
+def _value(client, series):
+    text = client.get("/metrics").get_data(as_text=True)
+    match = re.search(r"^" + re.escape(series) + r" (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_requests_and_their_statements_are_counted(client, listing, monkeypatch):
+    requests = 'http_request_duration_seconds_count{endpoint="/api/listings/listings/<int:listing_id>",method="GET",status="200"}'
+    statements = 'http_request_sql_statements_sum{endpoint="/api/listings/listings/<int:listing_id>"}'
+    missing = 'http_request_duration_seconds_count{endpoint="/api/listings/listings/<int:listing_id>",method="GET",status="404"}'
+    slow = 'sql_slow_queries_total{engine="default",operation="SELECT"}'
+    before = {series: _value(client, series) for series in (requests, statements, missing, slow)}
+
+    assert client.get(f"/api/listings/listings/{listing.id}").status_code == 200
+    monkeypatch.setattr(request_metrics, "slow_query_seconds", 0.0) # Every statement counts as slow
+    assert client.get("/api/listings/listings/999999").status_code == 404
+
+    assert _value(client, requests) == before[requests] + 1
+    assert _value(client, missing) == before[missing] + 1
+    assert _value(client, statements) >= before[statements] + 2 # The listing and its images
+    assert _value(client, slow) >= before[slow] + 1
+    assert request_metrics.recent_slow_queries[-1]["endpoint"] == "/api/listings/listings/<int:listing_id>"
+
+
+def test_metrics_can_be_switched_off(tmp_path):
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}", "METRICS_ENABLED": False,
+                      "PAYMENT_GATEWAY": "fake", "PAYMENT_QUEUE_PATH": str(tmp_path / "payment_events.sqlite3")})
+    assert app.test_client().get("/metrics").status_code == 404
@@ -0,0 +1,42 @@
+# Registration and login through the hashing pool, and the upgrade of hashes made with another method
+import pytest
+from werkzeug.security import generate_password_hash
+
+from src.models.user import db, User
+from src.services.password_hashing import password_hasher, HashingPoolSaturated, method_prefix
+
+
+def test_existing_accounts_keep_their_hash_and_others_are_converted(app, client):
+    current = User("current@example.com", password="correct horse")
+    legacy = User("legacy@example.com", password_hash=generate_password_hash("battery staple", method="pbkdf2:sha256:1000"))
+    db.session.add_all([current, legacy])
+    db.session.commit()
+    current_hash = current.password_hash
+
+    response = client.post("/api/auth/register", json={"email": "New@Example.com", "password": "s3cret pass"})
+    assert response.status_code == 201
+    assert response.get_json()["user"]["email"] == "new@example.com"
+    assert client.post("/api/auth/login", json={"email": "new@example.com", "password": "s3cret pass"}).status_code == 200
+
+    assert client.post("/api/auth/login", json={"email": "current@example.com", "password": "correct horse"}).status_code == 200
+    db.session.expire_all()
+    assert current.password_hash == current_hash # set_password already uses the configured method
+
+    assert client.post("/api/auth/login", json={"email": "legacy@example.com", "password": "battery staple"}).status_code == 200
+    db.session.expire_all()
+    assert legacy.password_hash.startswith(method_prefix(app.config["PASSWORD_HASH_METHOD"]) + "$")
+
+
+def test_rejected_logins(app, client, monkeypatch):
+    db.session.add(User("current@example.com", password="correct horse"))
+    db.session.commit()
+    assert client.post("/api/auth/login", json={"email": "current@example.com", "password": "wrong"}).status_code == 401
+    assert client.post("/api/auth/login", json={"email": "current@example.com"}).status_code == 400
+    assert client.post("/api/auth/register", json={"email": "current@example.com", "password": "again"}).status_code == 409
+
+    def saturated(*args):
+        raise HashingPoolSaturated()
+    monkeypatch.setattr(password_hasher, "verify", saturated)
+    response = client.post("/api/auth/login", json={"email": "current@example.com", "password": "correct horse"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
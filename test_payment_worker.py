@@ -0,0 +1,152 @@
+# Payment notifications: webhook verification, the journal and the worker that applies it
+from decimal import Decimal
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from src.models.user import db
+from src.models.listing import Listing
+from src.models.payment_transaction import PaymentTransaction
+from src.services import payment_worker
+from src.services.payment_gateway import InvalidNotificationError, payment_gateway
+from src.services.payment_queue import payment_queue
+from src.services.payment_worker import process_payment_events
+
+
+@pytest.fixture
+def gateway(app):
+    return payment_gateway()
+
+
+@pytest.fixture
+def make_transaction(listing, gateway):
+    def make_transaction(tier="premium", amount="199.99"):
+        transaction = PaymentTransaction(reference=f"PS-{listing.id}-{PaymentTransaction.query.count() + 1}", listing_id=listing.id,
+                                         user_id=listing.user_id, tier=tier, amount=Decimal(amount), gateway=gateway.name)
+        db.session.add(transaction)
+        db.session.commit()
+        return transaction
+    return make_transaction
+
+
+def notify(client, fields, remote_addr="127.0.0.1"):
+    return client.post("/api/payments/notify/fake", data=MultiDict(fields), environ_base={"REMOTE_ADDR": remote_addr})
+
+
+def process(gateway):
+    return process_payment_events(db.session, payment_queue, gateway)
+
+
+def status_of(transaction):
+    db.session.expire_all()
+    return db.session.get(PaymentTransaction, transaction.id).status
+
+
+def test_signed_notification_is_accepted(gateway, make_transaction):
+    transaction = make_transaction()
+    event = gateway.verify_notification(gateway.notification(transaction), "127.0.0.1")
+    assert event["reference"] == transaction.reference
+    assert event["status"] == "COMPLETE"
+    assert event["amount"] == "199.99"
+
+
+def test_tampered_notification_is_rejected(client, gateway, make_transaction):
+    fields = [(name, "1.00" if name == "amount_gross" else value) for name, value in gateway.notification(make_transaction())]
+    with pytest.raises(InvalidNotificationError):
+        gateway.verify_notification(fields, "127.0.0.1")
+    assert notify(client, fields).status_code == 400
+    assert payment_queue.stats()["pending"] == 0
+
+
+def test_notification_from_outside_the_gateway_networks_is_rejected(client, gateway, make_transaction):
+    assert notify(client, gateway.notification(make_transaction()), remote_addr="203.0.113.9").status_code == 400
+    assert payment_queue.stats()["pending"] == 0
+
+
+def test_repeated_delivery_is_applied_once(client, gateway, make_transaction, listing):
+    transaction = make_transaction()
+    fields = gateway.notification(transaction)
+    assert notify(client, fields).status_code == 200
+    assert notify(client, fields).status_code == 200
+    assert payment_queue.stats()["pending"] == 1
+
+    assert process(gateway) == {"applied": 1, "failed": 0, "batches": 1}
+    assert status_of(transaction) == "complete"
+    upgraded = db.session.get(Listing, listing.id)
+    assert (upgraded.listing_tier, upgraded.payment_status, upgraded.transaction_id) == ("premium", "paid", transaction.reference)
+
+
+def test_amount_mismatch_fails_the_transaction(client, gateway, make_transaction, listing):
+    transaction = make_transaction()
+    notify(client, gateway.notification(transaction, amount="1.00"))
+    process(gateway)
+    assert status_of(transaction) == "failed"
+    assert "does not match" in db.session.get(PaymentTransaction, transaction.id).failure_reason
+    assert db.session.get(Listing, listing.id).payment_status != "paid"
+
+
+def test_only_pending_transactions_are_settled(client, gateway, make_transaction, listing):
+    transaction = make_transaction()
+    notify(client, gateway.notification(transaction))
+    process(gateway)
+    notify(client, gateway.notification(transaction, status="FAILED"))
+    assert process(gateway)["applied"] == 1
+    assert status_of(transaction) == "complete"
+    assert db.session.get(Listing, listing.id).payment_status == "paid"
+
+
+def test_notification_the_gateway_does_not_confirm_is_dropped(client, gateway, make_transaction):
+    transaction = make_transaction()
+    fields = gateway.notification(transaction)
+    gateway.invalid_signatures.add(dict(fields)["signature"])
+    notify(client, fields)
+    assert process(gateway) == {"applied": 0, "failed": 1, "batches": 1}
+    assert status_of(transaction) == "pending"
+    assert payment_queue.stats()["dropped"] == 1
+
+
+def test_failed_batch_falls_back_to_one_event_per_transaction(client, gateway, make_transaction, monkeypatch):
+    good, bad, other = make_transaction(), make_transaction(), make_transaction()
+    for transaction in (good, bad, other):
+        notify(client, gateway.notification(transaction))
+    apply_payment_event = payment_worker.apply_payment_event
+
+    def failing_apply(session, event, now=None):
+        if event["reference"] == bad.reference:
+            raise RuntimeError("deadlock")
+        return apply_payment_event(session, event, now)
+
+    monkeypatch.setattr(payment_worker, "apply_payment_event", failing_apply)
+    assert process(gateway) == {"applied": 2, "failed": 1, "batches": 1}
+    assert [status_of(t) for t in (good, bad, other)] == ["complete", "pending", "complete"]
+    assert payment_queue.stats() == {"pending": 1, "applied": 2, "dropped": 0} # Retried later, with backoff
+
+
+def test_checkout_through_the_api_upgrades_the_listing(app, client, listing, auth_headers):
+    response = client.post(f"/api/payments/listings/{listing.id}/upgrade", json={"tier": "premium"}, headers=auth_headers(listing.user_id))
+    assert response.status_code == 202
+    payment = response.get_json()["payment"]
+    assert payment["status"] == "pending"
+    assert payment["checkout"]["fields"]
+    transaction = PaymentTransaction.query.filter_by(reference=payment["reference"]).one()
+    assert transaction.user_id == listing.user_id
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["fake-payment-notify", payment["reference"]])
+    assert "HTTP 200" in result.output
+    result = runner.invoke(args=["process-payment-events"])
+    assert result.exit_code == 0, result.output
+
+    response = client.get(f"/api/payments/listings/{listing.id}/payment-status", headers=auth_headers(listing.user_id))
+    assert response.status_code == 200
+    info = response.get_json()["payment_info"]
+    assert (info["listing_tier"], info["payment_status"]) == ("premium", "paid")
+    assert info["transactions"][0]["status"] == "complete"
+
+
+def test_only_the_owner_can_start_a_checkout(client, listing, other_user, auth_headers):
+    response = client.post(f"/api/payments/listings/{listing.id}/upgrade", json={"tier": "premium"}, headers=auth_headers(other_user.id))
+    assert response.status_code == 403
+    response = client.post(f"/api/payments/listings/{listing.id}/upgrade", json={"tier": "gold"}, headers=auth_headers(listing.user_id))
+    assert response.status_code == 400
+    assert PaymentTransaction.query.count() == 0
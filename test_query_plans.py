@@ -0,0 +1,12 @@
+# The listing endpoints' SQL must keep using indexes (see query_plans.ENDPOINT_CHECKS)
+from src.models.user import db
+from src.services.bench_data import generate
+from src.services.query_plans import check_query_plans
+
+
+def test_listing_endpoints_do_not_scan_listings(app):
+    generate(db.session, users=20, listings=3000, ads=0, password_method="pbkdf2:sha256:1")
+    results = check_query_plans(app)
+    failures = {result["name"]: [statement["plan"] for statement in result["statements"] if statement["unexpected"]] or result["status"]
+                for result in results if not result["ok"]}
+    assert not failures
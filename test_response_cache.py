@@ -0,0 +1,59 @@
+# Public GET responses from the response cache: hits, ETags, invalidation on edit and the multi-worker fallback
+import gzip
+
+import pytest
+
+from src.models.user import db
+from src.models.listing import Listing
+from src.services.response_cache import response_cache
+from src.services.response_compression import response_compression
+
+
+@pytest.fixture
+def cached_app(app, listing):
+    for n in range(5): # Enough listings for the page to be compressed
+        db.session.add(Listing(title=f"Flat {n} with a sea view", price=1000000 + n, address=f"{n} Beach Road", city="Cape Town",
+                               province="Western Cape", bedrooms=1, property_type="apartment", user_id=listing.user_id, status="active"))
+    db.session.commit()
+    app.config["RESPONSE_CACHE_ENABLED"] = True
+    response_cache.init_app(app)
+    return app
+
+
+def test_hits_are_served_compressed_and_invalidated_on_edit(cached_app, client, listing, auth_headers, monkeypatch):
+    compressions = []
+    compress = response_compression.compress
+    monkeypatch.setattr(response_compression, "compress", lambda body, encoding: compressions.append(encoding) or compress(body, encoding))
+    headers = {"Accept-Encoding": "gzip"}
+
+    first = client.get("/api/listings/listings?city=Cape+Town", headers=headers)
+    assert first.headers["X-Cache"] == "MISS"
+    assert first.headers["Content-Encoding"] == "gzip"
+    second = client.get("/api/listings/listings?city=cape+town", headers=headers)
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.headers["Content-Encoding"] == "gzip"
+    assert second.get_data() == first.get_data()
+    assert compressions == ["gzip"] # The hit was not compressed again
+
+    identity = client.get("/api/listings/listings?city=Cape+Town")
+    assert identity.headers["X-Cache"] == "MISS" # Cached separately per encoding
+    assert "Content-Encoding" not in identity.headers
+    assert identity.get_data() == gzip.decompress(first.get_data())
+    assert client.get("/api/listings/listings?city=Cape+Town", headers=dict(headers, **{"If-None-Match": first.headers["ETag"]})).status_code == 304
+
+    response = client.put(f"/api/listings/listings/{listing.id}", json={"title": "Renovated two bedroom flat"}, headers=auth_headers(listing.user_id))
+    assert response.status_code == 200
+    after_edit = client.get("/api/listings/listings?city=Cape+Town", headers=headers)
+    assert after_edit.headers["X-Cache"] == "MISS"
+    assert b"Renovated two bedroom flat" in gzip.decompress(after_edit.get_data())
+
+
+def test_listings_are_not_cached_by_several_workers_without_redis(cached_app, client):
+    cached_app.config["WEB_CONCURRENCY"] = 2
+    response_cache.init_app(cached_app)
+    assert not response_cache.cache_mutable
+
+    assert "X-Cache" not in client.get("/api/listings/listings").headers
+    assert "X-Cache" not in client.get("/api/listings/listings/999999").headers
+    client.get("/api/payments/pricing/tiers")
+    assert client.get("/api/payments/pricing/tiers").headers["X-Cache"] == "HIT" # Never invalidated, so still cached
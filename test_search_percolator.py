@@ -0,0 +1,47 @@
+# Saved-search matching on listing writes (search_percolator)
+from flask_jwt_extended import create_access_token
+
+from src.models.user import db, User
+from src.models.listing import Listing
+from src.models.saved_search import SavedSearch, SavedSearchMatch
+from src.services.search_percolator import saved_search_percolator
+
+
+def _searcher():
+    user = User("searcher@example.com", password_hash="unused")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_search_created_by_another_process_matches_before_the_reload(app, client, listing):
+    saved_search_percolator.load(db.session)
+    searcher = _searcher()
+    # Committed without search_saved(), as another worker would
+    db.session.add(SavedSearch(user_id=searcher.id, city="cape town", bedrooms=3))
+    db.session.commit()
+
+    token = create_access_token(identity=str(listing.user_id))
+    response = client.post("/api/listings/listings", json={"title": "Three bedroom house", "price": 2500000, "address": "5 Kloof Street",
+                                                           "city": "Cape Town", "bedrooms": 3},
+                           headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 201
+    listing_id = response.get_json()["listing"]["id"]
+    assert [match.listing_id for match in SavedSearchMatch.query.all()] == [listing_id]
+
+
+def test_percolate_leaves_the_callers_transaction_alone(app, listing):
+    saved_search_percolator.load(db.session)
+    searcher = _searcher()
+    saved_search = SavedSearch(user_id=searcher.id, city="cape")
+    db.session.add(saved_search)
+    db.session.commit()
+    saved_search_percolator.search_saved(saved_search)
+
+    written = db.session.get(Listing, listing.id)
+    db.session.add(User("uncommitted@example.com", password_hash="unused"))
+    assert saved_search_percolator.percolate(db.session, [written]) == 1
+    db.session.rollback()
+    assert User.query.filter_by(email="uncommitted@example.com").count() == 0
+    assert SavedSearchMatch.query.filter_by(listing_id=listing.id).count() == 1
+    assert saved_search_percolator.percolate(db.session, [db.session.get(Listing, listing.id)]) == 0 # Queued once per search
@@ -0,0 +1,50 @@
+# Frontend serving from the startup manifest: precompressed variants, ETags, cache lifetimes and SPA fallback
+import gzip
+
+import pytest
+
+from src.services.static_assets import IMMUTABLE_CACHE_CONTROL, static_assets
+
+BUNDLE = "assets/index-BQ7vT8x1.js"
+
+
+@pytest.fixture
+def frontend(app, tmp_path):
+    root = tmp_path / "static"
+    (root / "assets").mkdir(parents=True)
+    (root / "index.html").write_text("<!doctype html><div id=root></div>", encoding="utf-8")
+    (root / BUNDLE).write_text("export const listings = [];\n" * 200, encoding="utf-8")
+    (root / "robots.txt").write_text("User-agent: *\n", encoding="utf-8")
+    app.static_folder = str(root)
+    result = app.test_cli_runner().invoke(args=["build-static", "--no-brotli"])
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith("Compressed 1 files")
+    static_assets.init_app(app)
+    return root
+
+
+def test_assets_are_served_precompressed_with_validators(client, frontend):
+    response = client.get(f"/{BUNDLE}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert gzip.decompress(response.get_data()) == (frontend / BUNDLE).read_bytes() # Sent as built, not compressed again
+    assert client.get(f"/{BUNDLE}", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    identity = client.get(f"/{BUNDLE}")
+    assert "Content-Encoding" not in identity.headers
+    assert identity.headers["ETag"] != response.headers["ETag"]
+    assert client.get("/robots.txt").headers["Cache-Control"] == "public, max-age=3600"
+
+    for path in ("/", "/listings/42"): # Client-side routes get the app shell
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == "no-cache"
+        assert b'<div id=root>' in response.get_data()
+
+
+def test_missing_files_are_not_answered_with_the_app_shell(client, frontend):
+    assert client.get("/assets/index-missing1.js").status_code == 404
+    response = client.get("/api/nothing-here")
+    assert response.status_code == 404
+    assert response.get_json()["message"] == "API endpoint not found. Please check the URL."
@@ -0,0 +1,45 @@
+# Expired paid tiers downgraded by the sweep-tier-expiry command
+from datetime import datetime, timedelta
+
+from src.models.user import db
+from src.models.listing import Listing
+
+
+def _paid(owner_id, title, tier, expiry):
+    listing = Listing(title=title, price=2500000, address="5 Ocean View Drive", city="Cape Town", user_id=owner_id, status="active",
+                      is_charged_listing=True, listing_tier=tier, payment_status="completed", tier_expiry_date=expiry)
+    db.session.add(listing)
+    return listing
+
+
+def _status(client, headers, listing_id):
+    response = client.get(f"/api/payments/listings/{listing_id}/payment-status", headers=headers)
+    assert response.status_code == 200
+    info = response.get_json()["payment_info"]
+    return info["listing_tier"], info["payment_status"], info["is_charged_listing"]
+
+
+def test_expired_tiers_are_downgraded_in_chunks(app, client, listing, auth_headers):
+    now = datetime.now()
+    expired = [_paid(listing.user_id, "Expired premium", "premium", now - timedelta(days=2)),
+               _paid(listing.user_id, "Expired featured", "featured", now - timedelta(hours=1))]
+    current = _paid(listing.user_id, "Current featured", "featured", now + timedelta(days=5))
+    unlimited = _paid(listing.user_id, "No expiry", "premium", None)
+    db.session.commit()
+    headers = auth_headers(listing.user_id)
+
+    result = app.test_cli_runner().invoke(args=["sweep-tier-expiry", "--chunk-size", "1"])
+    assert result.exit_code == 0, result.output
+    assert "{'downgraded': 2, 'chunks': 2}" in result.output
+    for paid in expired:
+        assert _status(client, headers, paid.id) == ("standard", "expired", False)
+    assert _status(client, headers, current.id) == ("featured", "completed", True)
+    assert _status(client, headers, unlimited.id) == ("premium", "completed", True)
+
+    result = app.test_cli_runner().invoke(args=["sweep-tier-expiry"])
+    assert "{'downgraded': 0, 'chunks': 0}" in result.output # Nothing left to claim
+
+
+def test_sweeper_rejects_bad_options(app):
+    assert app.test_cli_runner().invoke(args=["sweep-tier-expiry", "--chunk-size", "many"]).exit_code == 2
+    assert app.test_cli_runner().invoke(args=["sweep-tier-expiry", "--chunk-size", "0"]).exit_code == 2
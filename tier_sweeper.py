@@ -0,0 +1,54 @@
+# Periodic downgrade of paid listing tiers whose tier_expiry_date has passed
+import logging
+from datetime import datetime
+
+from sqlalchemy import update
+
+from src.models.listing import Listing
+from src.models.listing_tiers import LISTING_TIERS
+from src.services import listing_events
+
+logger = logging.getLogger(__name__)
+
+PAID_TIERS = [name for name, tier in LISTING_TIERS.items() if tier["price"] > 0]
+DOWNGRADE_TIER = "standard"
+
+
+def sweep_expired_tiers(session, now=None, chunk_size=500):
+    """Downgrade expired paid listings in chunks; returns counts.
+
+    Each chunk selects ids through the tier_expiry_date range predicate with
+    FOR UPDATE SKIP LOCKED (where the database supports it), so concurrent
+    sweepers claim disjoint rows instead of blocking on each other, then
+    downgrades them with one set-based UPDATE that re-checks the expiry
+    predicate. Running it twice, or from several workers, is harmless.
+    """
+    now = now or datetime.now() # upgrade_listing stores expiry dates in server local time
+    downgraded = 0
+    chunks = 0
+    expired = (Listing.tier_expiry_date <= now, Listing.listing_tier.in_(PAID_TIERS))
+    while True:
+        ids = [row.id for row in session.query(Listing.id)
+               .filter(*expired)
+               .order_by(Listing.tier_expiry_date)
+               .limit(chunk_size)
+               .with_for_update(skip_locked=True)]
+        if not ids:
+            session.rollback()
+            break
+        result = session.execute(
+            update(Listing)
+            .where(Listing.id.in_(ids), *expired)
+            .values(listing_tier=DOWNGRADE_TIER, is_charged_listing=False, payment_status="expired")
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        chunks += 1
+        downgraded += result.rowcount
+        listing_events.listings_changed(ids)
+        if len(ids) < chunk_size:
+            break
+
+    if downgraded:
+        logger.info("Downgraded %d expired paid listings in %d chunks", downgraded, chunks)
+    return {"downgraded": downgraded, "chunks": chunks}
@@ -13,7 +13,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Check if db is already defined (e.g. by a test runner or another import)
 if 'db' not in globals():
-    db = SQLAlchemy()
+    from src.services.db_routing import RoutingSession # Sends read_only views' SELECTs to replicas
+    db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -28,9 +29,12 @@ class User(db.Model):
     # Relationships (example)
     # listings = db.relationship('Listing', backref='agent', lazy=True)
 
-    def __init__(self, email, password, full_name=None):
+    def __init__(self, email, password=None, full_name=None, password_hash=None):
         self.email = email.lower()
-        self.set_password(password)
+        if password_hash is not None:
+            self.password_hash = password_hash # Already hashed, e.g. by the password hashing pool
+        else:
+            self.set_password(password)
         self.full_name = full_name
 
     def set_password(self, password):